@@ -11,7 +11,7 @@ class TestCheckMobileSmartRecommenderDetails(TestBaseWeb):
         self.driver.get("https://www.google.com/")
 
     def tearDown(self):
-        self.driver.close()
+        """Driver is given back to the pool after tearDown"""
 
 
 if __name__ == "__main__":
@@ -0,0 +1,177 @@
+import json
+import shutil
+import subprocess
+import unittest
+
+from selenium.common.exceptions import JavascriptException, TimeoutException
+
+from base.base_functions import Base
+from base.wait_engine import ABSENCE_JS
+
+# Runs ABSENCE_JS on a virtual clock: frames every 16 ms, timeline events toggle the element and mutate the DOM
+HARNESS_JS = """
+var now = 0, queue = [], observers = [], result, shownState = %(shown)s;
+function schedule(at, fn) { queue.push({at: at, fn: fn}); }
+var performance = {now: function () { return now; }};
+function requestAnimationFrame(fn) { schedule(now + 16, fn); return 1; }
+function setTimeout(fn, ms) { schedule(now + (ms || 0), fn); return 1; }
+function MutationObserver(cb) {
+    var self = this;
+    this.observe = function () { observers.push(self); };
+    this.disconnect = function () { observers = observers.filter(function (o) { return o !== self; }); };
+    this.cb = cb;
+}
+var document = {hidden: false};
+%(events)s.forEach(function (e) {
+    schedule(e.at, function () {
+        if ('shown' in e) { shownState = e.shown; }
+        observers.slice().forEach(function (o) { o.cb([]); });
+    });
+});
+(function () {
+%(script)s
+    function castappFind(by, value, root, all) { return all ? (shownState ? [{}] : []) : (shownState ? {} : null); }
+    function castappIsVisible(el) { return !!el; }
+}).apply(null, %(args)s.concat([function (r) { result = r; }]));
+while (result === undefined && queue.length) {
+    queue.sort(function (a, b) { return a.at - b.at; });
+    var next = queue.shift();
+    now = next.at;
+    next.fn();
+}
+console.log(JSON.stringify(result));
+"""
+
+
+def run_absence_js(mode="check", shown=False, events=(), grace=0, quiet=0.3, frames=3, timeout=5):
+    args = ["css selector", ".banner", "absent", mode, int(grace * 1000), int(quiet * 1000), frames,
+            int(timeout * 1000)]
+    source = HARNESS_JS % {"shown": json.dumps(shown), "events": json.dumps(list(events)), "script": ABSENCE_JS,
+                           "args": json.dumps(args)}
+    output = subprocess.run(["node", "-e", source], capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+@unittest.skipUnless(shutil.which("node"), "node is needed to run the browser script")
+class TestAbsenceScript(unittest.TestCase):
+
+    def test_check_fails_once_element_shows(self):
+        result = run_absence_js("check", events=[{"at": 100, "shown": True}], grace=0.5)
+        self.assertFalse(result["absent"])
+        self.assertEqual(result["appeared"], 1)
+        self.assertLess(result["elapsed"], 0.5)
+
+    def test_wait_outlasts_a_shown_element(self):
+        result = run_absence_js("wait", shown=True, events=[{"at": 200, "shown": False}], quiet=0.1)
+        self.assertTrue(result["absent"])
+        self.assertGreater(result["appeared"], 1)
+        self.assertGreaterEqual(result["elapsed"], 0.3)
+
+    def test_grace_delays_the_verdict(self):
+        result = run_absence_js("check", grace=0.5, quiet=0)
+        self.assertTrue(result["absent"])
+        self.assertGreaterEqual(result["elapsed"], 0.5)
+
+    def test_element_must_miss_several_frames(self):
+        result = run_absence_js("check", quiet=0, frames=5)
+        self.assertTrue(result["absent"])
+        self.assertEqual(result["checks"], 5)
+
+    def test_needs_quiet_dom(self):
+        result = run_absence_js("check", events=[{"at": 150}], quiet=0.2)
+        self.assertTrue(result["absent"])
+        self.assertGreaterEqual(result["elapsed"], 0.35)
+
+    def test_busy_dom_is_decided_at_timeout(self):
+        mutations = [{"at": at} for at in range(0, 2000, 50)]
+        result = run_absence_js("check", events=mutations, quiet=0.3, timeout=1)
+        self.assertTrue(result["absent"])
+        self.assertAlmostEqual(result["elapsed"], 1, delta=0.05)
+        self.assertLess(result["quiet"], 0.3)
+
+    def test_busy_dom_with_element_shown_is_not_absent(self):
+        mutations = [{"at": at} for at in range(0, 2000, 50)]
+        result = run_absence_js("wait", shown=True, events=mutations, timeout=1)
+        self.assertFalse(result["absent"])
+
+
+class FakeDriver(object):
+    """Driver answering absence scripts with a result, or failing them, and find_elements with queued lists"""
+
+    def __init__(self, result=None, error=None, found=()):
+        self.result = result
+        self.error = error
+        self.found = list(found)
+        self.script_args = None
+        self.finds = 0
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_async_script(self, script, *args):
+        self.script_args = args
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def find_elements(self, by, value):
+        self.finds += 1
+        return self.found.pop(0) if self.found else []
+
+
+def report(absent, **values):
+    result = {"absent": absent, "elapsed": 0.1, "checks": 6, "appeared": 0, "quiet": 0.3}
+    result.update(values)
+    return result
+
+
+class TestBaseAbsence(unittest.TestCase):
+    locator = ("css selector", ".banner")
+
+    def test_is_element_absent_passes_parameters_in_milliseconds(self):
+        driver = FakeDriver(report(True))
+        self.assertTrue(Base(driver).is_element_absent(self.locator, grace=0.5, quiet=0.2, frames=4, timeout=2))
+        self.assertEqual(driver.script_args, ("css selector", ".banner", "absent", "check", 500, 200, 4, 2000))
+        self.assertTrue(Base.last_absence_report.in_browser)
+
+    def test_is_element_absent_false_when_shown(self):
+        self.assertFalse(Base(FakeDriver(report(False, appeared=1))).is_element_absent(self.locator))
+
+    def test_wait_for_element_absent_raises_when_still_shown(self):
+        driver = FakeDriver(report(False, appeared=40))
+        with self.assertRaises(TimeoutException):
+            Base(driver).wait_for_element_absent(self.locator, timeout=1, hidden=True)
+        self.assertEqual(driver.script_args[2:4], ("hidden", "wait"))
+
+    def test_wait_for_element_absent_returns_report(self):
+        result = Base(FakeDriver(report(True, appeared=3))).wait_for_element_absent(self.locator, timeout=1)
+        self.assertEqual((result.absent, result.appeared), (True, 3))
+
+    def test_unsupported_locator_is_polled(self):
+        driver = FakeDriver(found=[["banner"], []])
+        base = Base(driver)
+        self.assertTrue(base.wait_for_element_absent(("accessibility id", "banner"), timeout=2, quiet=0.1)
+                        .absent)
+        self.assertIsNone(driver.script_args)
+        self.assertFalse(Base.last_absence_report.in_browser)
+        self.assertGreaterEqual(driver.finds, 3)
+
+    def test_polling_check_fails_at_once(self):
+        driver = FakeDriver(found=[["banner"]])
+        self.assertFalse(Base(driver).is_element_absent(("accessibility id", "banner"), timeout=2))
+        self.assertEqual(driver.finds, 1)
+
+    def test_script_error_falls_back_to_polling(self):
+        driver = FakeDriver(error=JavascriptException("SyntaxError"))
+        self.assertTrue(Base(driver).is_element_absent(self.locator, quiet=0.1, timeout=2))
+        self.assertFalse(Base.last_absence_report.in_browser)
+
+    def test_polling_stays_stable_only_after_grace(self):
+        driver = FakeDriver()
+        result = Base(driver).wait_engine.until_absent(("accessibility id", "banner"), grace=0.2, quiet=0, timeout=2)
+        self.assertTrue(result.absent)
+        self.assertGreaterEqual(result.elapsed, 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import unittest
+
+from base.async_base import AsyncCommandExecutor, AsyncSession
+
+
+class KeepAliveServer(object):
+    """WebDriver endpoint that answers one request per connection and then closes it without saying so"""
+
+    def __init__(self):
+        self.bodies = []
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return "http://127.0.0.1:{}".format(self.server.sockets[0].getsockname()[1])
+
+    async def handle(self, reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = int([line.split(b":")[1] for line in head.split(b"\r\n") if line.lower().startswith(
+            b"content-length")][0])
+        self.bodies.append(json.loads(await reader.readexactly(length) or b"null"))
+        payload = json.dumps({"value": len(self.bodies)}).encode()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: " +
+                     str(len(payload)).encode() + b"\r\n\r\n" + payload)
+        await writer.drain()
+        writer.close()
+
+    def close(self):
+        self.server.close()
+
+
+class DroppingServer(KeepAliveServer):
+    """WebDriver endpoint that keeps connections open, but drops the second request of a connection unanswered"""
+
+    async def handle(self, reader, writer):
+        for served in range(2):
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            length = int([line.split(b":")[1] for line in head.split(b"\r\n") if line.lower().startswith(
+                b"content-length")][0])
+            self.bodies.append((head.split(b" ")[0].decode(), json.loads(await reader.readexactly(length) or b"null")))
+            if served:
+                break
+            payload = json.dumps({"value": len(self.bodies)}).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: " + str(len(payload)).encode() + b"\r\n\r\n" +
+                         payload)
+            await writer.drain()
+        writer.close()
+
+
+class TestAsyncCommandExecutor(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        return asyncio.run(asyncio.wait_for(coroutine, 10))
+
+    def test_post_after_the_endpoint_closed_the_idle_connection(self):
+        async def scenario():
+            server = KeepAliveServer()
+            executor = AsyncCommandExecutor(await server.start())
+            try:
+                first = await executor.request("POST", "/session/1/url", {"url": "about:blank"})
+                await asyncio.sleep(0.05)
+                second = await executor.request("POST", "/session/1/element/1/click", {})
+                return first, second, executor.stats(), server.bodies
+            finally:
+                await executor.close()
+                server.close()
+
+        first, second, stats, bodies = self.run_async(scenario())
+        self.assertEqual((first, second), (1, 2))
+        self.assertEqual(bodies, [{"url": "about:blank"}, {}])
+        self.assertEqual((stats["opened"], stats["reused"], stats["retried"]), (2, 0, 0))
+
+    def drop_second_request(self, method):
+        async def scenario():
+            server = DroppingServer()
+            executor = AsyncCommandExecutor(await server.start())
+            try:
+                await executor.request("GET", "/session/1/url")
+                try:
+                    return await executor.request(method, "/session/1/element/1/click", None), server.bodies
+                except ConnectionError as e:
+                    return e, server.bodies
+            finally:
+                await executor.close()
+                server.close()
+
+        return self.run_async(scenario())
+
+    def test_lost_post_is_not_sent_again(self):
+        result, requests = self.drop_second_request("POST")
+        self.assertIsInstance(result, ConnectionError)
+        self.assertEqual(requests, [("GET", None), ("POST", {})])
+
+    def test_lost_get_is_retried(self):
+        result, requests = self.drop_second_request("GET")
+        self.assertEqual(result, 3)
+        self.assertEqual([method for method, _ in requests], ["GET", "GET", "GET"])
+
+    def test_cdp_commands_use_the_http_endpoint(self):
+        async def scenario():
+            server = KeepAliveServer()
+            executor = AsyncCommandExecutor(await server.start())
+            try:
+                await AsyncSession(executor, "1").execute_cdp_cmd("Network.clearBrowserCookies")
+                return server.bodies
+            finally:
+                await executor.close()
+                server.close()
+
+        self.assertEqual(self.run_async(scenario()), [{"cmd": "Network.clearBrowserCookies", "params": {}}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from base import browser_profiles
+from base.browser_profiles import (TRIMMED_ARGUMENTS, BrowserProfile, build_template, copy_template,
+                                   remove_user_data_dir, template_directory)
+
+
+class FakeChrome(object):
+    """Chrome that writes a preferences file into its user data dir"""
+    started = []
+
+    def __init__(self, options):
+        self.options = options
+        FakeChrome.started.append(self)
+        for argument in options.arguments:
+            if argument.startswith("--user-data-dir="):
+                with open(os.path.join(argument.split("=", 1)[1], "Preferences"), "w") as preferences:
+                    preferences.write("{}")
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        pass
+
+    def maximize_window(self):
+        pass
+
+
+class TestBrowserProfiles(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache, ignore_errors=True)
+        patchers = [mock.patch.dict(os.environ, {"CASTAPP_PROFILE_CACHE": self.cache}),
+                    mock.patch.object(browser_profiles.webdriver, "Chrome", FakeChrome)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        FakeChrome.started = []
+        self.profile = BrowserProfile("test-headless", headless=True, window_size=(800, 600), images=False,
+                                      trimmed=True, template=True)
+
+    def test_options(self):
+        arguments = self.profile.options("/tmp/profile").arguments
+        self.assertIn("--headless=new", arguments)
+        self.assertIn("--window-size=800,600", arguments)
+        self.assertIn("--user-data-dir=/tmp/profile", arguments)
+        self.assertTrue(set(TRIMMED_ARGUMENTS) <= set(arguments))
+        self.assertEqual(BrowserProfile("plain").options().arguments, [])
+
+    def test_template_is_built_once(self):
+        template = build_template(self.profile)
+        self.assertEqual(template, template_directory(self.profile))
+        self.assertTrue(os.path.isfile(os.path.join(template, "Preferences")))
+        build_template(self.profile)
+        self.assertEqual(len(FakeChrome.started), 1)
+
+    def test_copy_leaves_out_locks(self):
+        template = template_directory(self.profile)
+        os.makedirs(os.path.join(template, "Default"))
+        for name in ("Local State", "SingletonLock", os.path.join("Default", "Cookies")):
+            open(os.path.join(template, name), "w").close()
+        user_data_dir = copy_template(self.profile)
+        self.addCleanup(shutil.rmtree, user_data_dir, ignore_errors=True)
+        self.assertEqual(sorted(os.listdir(user_data_dir)), ["Default", "Local State"])
+        self.assertEqual(os.listdir(os.path.join(user_data_dir, "Default")), ["Cookies"])
+        self.assertEqual(FakeChrome.started, [])
+
+    def test_user_data_dir_removed_after_quit(self):
+        driver = self.profile.create_driver()
+        user_data_dir, = [argument.split("=", 1)[1] for argument in driver.options.arguments
+                          if argument.startswith("--user-data-dir=")]
+        self.assertNotEqual(user_data_dir, template_directory(self.profile))
+        self.assertTrue(os.path.isfile(os.path.join(user_data_dir, "Preferences")))
+        remove_user_data_dir(driver)
+        self.assertFalse(os.path.exists(user_data_dir))
+        # Removing twice, or for drivers without a copied dir, does nothing
+        remove_user_data_dir(driver)
+        remove_user_data_dir(BrowserProfile("plain").create_driver())
+
+
+if __name__ == "__main__":
+    unittest.main()
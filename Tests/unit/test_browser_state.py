@@ -0,0 +1,97 @@
+import unittest
+
+from base.base_functions import Base
+from base.browser_state import reset_browser_state, supports_cdp, visited_origins
+
+FRAME_TREE = {"frameTree": {"frame": {"securityOrigin": "https://shop.example"},
+                            "childFrames": [{"frame": {"securityOrigin": "https://pay.example"}},
+                                            {"frame": {"securityOrigin": "null"},
+                                             "childFrames": [{"frame": {"securityOrigin": "http://ads.example"}}]}]}}
+HISTORY = {"entries": [{"url": "about:blank"}, {"url": "https://login.example/form?next=1"},
+                       {"url": "https://shop.example/cart"}, {"url": "data:text/html,hi"}]}
+
+
+class FakeDriver(object):
+    """Driver recording DevTools commands and scripts"""
+
+    def __init__(self, browser="chrome"):
+        self.capabilities = {"browserName": browser}
+        self.commands = []
+        self.scripts = []
+        self.cookies_deleted = False
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.commands.append((cmd, params))
+        return {"Page.getFrameTree": FRAME_TREE, "Page.getNavigationHistory": HISTORY,
+                "Network.getCookies": {"cookies": [{"name": "sid", "domain": "shop.example", "path": "/"}]}
+                }.get(cmd, {})
+
+    def execute_script(self, script, *args):
+        self.scripts.append(script)
+
+    def delete_all_cookies(self):
+        self.cookies_deleted = True
+
+    def names(self):
+        return [cmd for cmd, _ in self.commands]
+
+    def cleared_origins(self):
+        return {params["origin"] for cmd, params in self.commands if cmd == "Storage.clearDataForOrigin"}
+
+
+class TestBrowserState(unittest.TestCase):
+
+    def test_supports_cdp(self):
+        self.assertTrue(supports_cdp(FakeDriver("chrome")))
+        self.assertTrue(supports_cdp(FakeDriver("MicrosoftEdge")))
+        self.assertFalse(supports_cdp(FakeDriver("firefox")))
+
+    def test_visited_origins_from_frames_and_history(self):
+        self.assertEqual(visited_origins(FakeDriver()), {"https://shop.example", "https://pay.example",
+                                                         "http://ads.example", "https://login.example"})
+
+    def test_reset_clears_all_cookies_and_visited_origins(self):
+        driver = FakeDriver()
+        reset_browser_state(driver, known_origins=["https://closed.example"])
+        self.assertEqual(driver.names()[:2], ["Network.clearBrowserCache", "Network.clearBrowserCookies"])
+        self.assertEqual(driver.cleared_origins(), {"https://shop.example", "https://pay.example",
+                                                    "http://ads.example", "https://login.example",
+                                                    "https://closed.example"})
+        self.assertNotIn("Page.resetNavigationHistory", driver.names())
+
+    def test_reset_of_given_origins_keeps_other_cookies(self):
+        driver = FakeDriver()
+        reset_browser_state(driver, origins=["https://shop.example"], cache=False)
+        self.assertEqual(driver.names(), ["Network.getCookies", "Network.deleteCookies",
+                                          "Storage.clearDataForOrigin"])
+        self.assertEqual(driver.commands[1][1], {"name": "sid", "domain": "shop.example", "path": "/"})
+
+    def test_history_is_reset_after_reading_it(self):
+        driver = FakeDriver()
+        reset_browser_state(driver, history=True)
+        names = driver.names()
+        self.assertEqual(names[-1], "Page.resetNavigationHistory")
+        self.assertLess(names.index("Page.getNavigationHistory"), names.index("Page.resetNavigationHistory"))
+
+    def test_clear_browser_data_through_cdp(self):
+        driver = FakeDriver()
+        Base(driver).clear_browser_data()
+        self.assertIn("Page.resetNavigationHistory", driver.names())
+        self.assertIn("https://login.example", driver.cleared_origins())
+        self.assertEqual(len(driver.scripts), 1)
+        self.assertIn("sessionStorage.clear", driver.scripts[0])
+        self.assertFalse(driver.cookies_deleted)
+
+    def test_clear_browser_data_falls_back_to_page_storage(self):
+        driver = FakeDriver("firefox")
+        Base(driver).clear_browser_data()
+        self.assertEqual(driver.commands, [])
+        self.assertTrue(driver.cookies_deleted)
+        self.assertIn("localStorage.clear", driver.scripts[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+from selenium import webdriver
+
+from base.base_functions import Base
+from base.command_executor import PooledRemoteConnection, close_executors, executor_url, shared_executor
+from benchmarks.fake_webdriver import FakeWebDriverServer
+
+
+class TestPooledRemoteConnection(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebDriverServer(latency=0).start()
+        self.addCleanup(self.server.stop)
+
+    def new_driver(self, command_executor=None):
+        driver = webdriver.Remote(command_executor=command_executor or self.server.url,
+                                  options=webdriver.ChromeOptions())
+        self.addCleanup(driver.quit)
+        return driver
+
+    def test_connection_is_reused(self):
+        executor = PooledRemoteConnection(self.server.url)
+        driver = self.new_driver(executor)
+        for _ in range(5):
+            self.assertEqual(driver.title, "Fake")
+        stats = executor.stats()
+        self.assertEqual((stats["requests"], stats["opened"], stats["reused"]), (6, 1, 5))
+        self.assertIsNotNone(stats["p99_ms"])
+
+    def test_attach_keeps_running_session(self):
+        driver = self.new_driver()
+        previous = driver.command_executor
+        executor = PooledRemoteConnection(self.server.url)
+        self.assertIs(executor.attach(driver), driver)
+        self.assertIs(driver.command_executor, executor)
+        # Chrome's own commands, e.g. CDP, are still known
+        self.assertEqual(executor._commands.keys() & previous._commands.keys(), previous._commands.keys())
+        driver.title
+        self.assertEqual(executor.stats()["requests"], 1)
+
+    def test_executor_url(self):
+        self.assertEqual(executor_url(self.new_driver()), self.server.url)
+        self.assertEqual(executor_url(self.new_driver(PooledRemoteConnection(self.server.url))), self.server.url)
+
+    def test_shared_executor_outlives_drivers(self):
+        self.addCleanup(close_executors)
+        executor = shared_executor(self.server.url)
+        self.assertIs(shared_executor(self.server.url), executor)
+        first = Base(self.new_driver(), command_executor=self.server.url).driver
+        second = Base(self.new_driver(), command_executor=self.server.url).driver
+        first.quit()
+        self.assertEqual(second.title, "Fake")
+        self.assertIs(second.command_executor, executor)
+        self.assertEqual(executor.stats()["opened"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
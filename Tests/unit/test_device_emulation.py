@@ -0,0 +1,95 @@
+import unittest
+
+from base.device_emulation import DeviceEmulation, get_device
+
+
+class SwitchTo(object):
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver(object):
+    """Chrome driver recording DevTools commands with the window they were sent to"""
+
+    def __init__(self, browser="chrome"):
+        self.capabilities = {"browserName": browser}
+        self.window_handles = ["tab-1"]
+        self.current_window_handle = "tab-1"
+        self.switch_to = SwitchTo(self)
+        self.commands = []
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.commands.append((self.current_window_handle, cmd, params))
+        return {}
+
+    def sent(self, cmd):
+        return [(handle, params) for handle, name, params in self.commands if name == cmd]
+
+
+class TestDeviceEmulation(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = FakeDriver()
+        self.emulation = DeviceEmulation.for_driver(self.driver)
+
+    def test_apply_overrides_metrics_user_agent_and_touch(self):
+        device = self.emulation.apply("Nexus 5")
+        self.assertIs(device, get_device("Nexus 5"))
+        self.assertEqual(self.driver.sent("Emulation.setDeviceMetricsOverride")[0][1]["width"], 360)
+        self.assertEqual(self.driver.sent("Emulation.setUserAgentOverride"),
+                         [("tab-1", {"userAgent": device.user_agent, "platform": "Linux armv8l"})])
+        self.assertEqual(self.driver.sent("Emulation.setTouchEmulationEnabled")[0][1]["enabled"], True)
+        self.assertNotIn("Browser.getVersion", [cmd for _, cmd, _ in self.driver.commands])
+
+    def test_same_device_is_not_sent_again(self):
+        self.emulation.apply("Nexus 5")
+        self.emulation.apply(get_device("Nexus 5"))
+        self.assertEqual(len(self.driver.commands), 3)
+        self.assertEqual(self.emulation.switches, 1)
+
+    def test_device_without_user_agent_keeps_the_browsers(self):
+        self.emulation.apply("Desktop HD")
+        self.assertEqual(self.driver.sent("Emulation.setUserAgentOverride"), [("tab-1", {"userAgent": ""})])
+
+    def test_restore_clears_overrides_in_every_window(self):
+        self.emulation.apply("iPhone 12 Pro")
+        self.driver.window_handles.append("tab-2")
+        self.driver.current_window_handle = "tab-2"
+        self.emulation.follow_window()
+        self.emulation.follow_window()
+        self.driver.commands = []
+        self.emulation.restore()
+        self.assertEqual(sorted(self.driver.sent("Emulation.clearDeviceMetricsOverride")),
+                         [("tab-1", {}), ("tab-2", {})])
+        # The override is dropped, not replaced by a captured user agent
+        self.assertEqual(self.driver.sent("Emulation.setUserAgentOverride"),
+                         [("tab-1", {"userAgent": ""}), ("tab-2", {"userAgent": ""})])
+        self.assertEqual(self.driver.current_window_handle, "tab-2")
+        self.assertIsNone(self.emulation.device)
+
+    def test_restore_skips_closed_windows(self):
+        self.emulation.apply("Pixel 7")
+        self.driver.window_handles = ["tab-2"]
+        self.driver.current_window_handle = "tab-2"
+        self.driver.commands = []
+        self.emulation.restore()
+        self.assertEqual(self.driver.commands, [])
+
+    def test_discard_sends_nothing(self):
+        self.emulation.apply("Pixel 7")
+        self.driver.commands = []
+        self.emulation.discard()
+        self.emulation.restore()
+        self.assertEqual(self.driver.commands, [])
+
+    def test_browser_without_cdp_is_refused(self):
+        with self.assertRaises(Exception):
+            DeviceEmulation(FakeDriver("firefox")).apply("Nexus 5")
+
+
+if __name__ == "__main__":
+    unittest.main()
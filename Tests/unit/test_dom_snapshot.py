@@ -0,0 +1,108 @@
+import unittest
+from unittest import mock
+
+from selenium.common.exceptions import NoSuchElementException
+
+from base import dom_snapshot
+from base.dom_snapshot import DomSnapshot, UnsupportedLocator
+
+RECT = [0, 0, 10, 10]
+
+
+def node(tag, parent, attributes=(), runs=("",), visible=True, block=True):
+    """Record in the format of SERIALIZE_JS"""
+    return [tag, parent, list(attributes), list(runs), 1 if visible else 0, RECT, 1 if block else 0]
+
+
+# <html>
+#   <body>
+#     <div id="main" class="list wide" data-role="grid-main" lang="en-US">
+#       <ul><li class="item" data-id="1">One</li><li class="item done" data-id="2">Two</li></ul>
+#       <p>Hello <b>bold</b><span hidden>secret</span> world<br>next</p>
+#     </div>
+#     <a href="/help">Help <i>me</i></a>
+#   </body>
+# </html>
+NODES = [
+    node("html", -1, runs=("", "")),
+    node("body", 0, runs=("", "", "")),
+    node("div", 1, ("id", "main", "class", "list wide", "data-role", "grid-main", "lang", "en-US"), ("", "", "")),
+    node("ul", 2, runs=("", "", "")),
+    node("li", 3, ("class", "item", "data-id", "1"), ("One",)),
+    node("li", 3, ("class", "item done", "data-id", "2"), ("Two",)),
+    node("p", 2, runs=("Hello ", "", " world", "next")),
+    node("b", 6, runs=("bold",), block=False),
+    node("span", 6, ("hidden", ""), ("secret",), visible=False, block=False),
+    node("br", 6),
+    node("a", 1, ("href", "/help"), ("Help ", ""), block=False),
+    node("i", 10, runs=("me",), block=False),
+]
+
+
+class TestDomSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot = DomSnapshot({"url": "http://app.test/", "nodes": NODES})
+
+    def indexes(self, selector, by="css selector"):
+        return [found.index for found in self.snapshot.find_elements((by, selector))]
+
+    def test_combinators(self):
+        self.assertEqual(self.indexes("div li"), [4, 5])
+        self.assertEqual(self.indexes("div > li"), [])
+        self.assertEqual(self.indexes("div>ul > li.done"), [5])
+        self.assertEqual(self.indexes("body > * > p b"), [7])
+
+    def test_attribute_operators(self):
+        self.assertEqual(self.indexes("[data-id]"), [4, 5])
+        self.assertEqual(self.indexes("li[data-id='2']"), [5])
+        self.assertEqual(self.indexes('[class~="wide"]'), [2])
+        self.assertEqual(self.indexes("[data-role^=grid]"), [2])
+        self.assertEqual(self.indexes("[data-role$=main]"), [2])
+        self.assertEqual(self.indexes("[data-role*=d-m]"), [2])
+        self.assertEqual(self.indexes("[lang|=en]"), [2])
+        self.assertEqual(self.indexes("[data-role^='']"), [])
+
+    def test_selector_lists_are_in_document_order(self):
+        self.assertEqual(self.indexes("a, #main, li.item"), [2, 4, 5, 10])
+
+    def test_simple_strategies(self):
+        self.assertEqual(self.indexes("main", "id"), [2])
+        self.assertEqual(self.indexes("item", "class name"), [4, 5])
+        self.assertEqual(self.indexes("LI", "tag name"), [4, 5])
+        self.assertEqual(self.indexes("Help me", "link text"), [10])
+        self.assertEqual(self.indexes("me", "partial link text"), [10])
+        with self.assertRaises(NoSuchElementException):
+            self.snapshot.find_element(("id", "missing"))
+
+    @unittest.skipIf(dom_snapshot.etree is None or dom_snapshot.GenericTranslator is None, "needs lxml and cssselect")
+    def test_complex_selectors_and_xpath_use_lxml(self):
+        self.assertEqual(self.indexes("li:nth-child(2)"), [5])
+        self.assertEqual(self.indexes("//p/b", "xpath"), [7])
+        self.assertEqual(self.indexes("//li[text()='Two']", "xpath"), [5])
+
+    def test_unsupported_locators(self):
+        with mock.patch.object(dom_snapshot, "GenericTranslator", None):
+            with self.assertRaises(UnsupportedLocator):
+                self.snapshot.find_elements(("css selector", "li:first-child"))
+            self.assertEqual(self.indexes("li.item"), [4, 5])
+        with mock.patch.object(dom_snapshot, "etree", None):
+            with self.assertRaises(UnsupportedLocator):
+                self.snapshot.find_elements(("xpath", "//li"))
+        with self.assertRaises(UnsupportedLocator):
+            self.snapshot.find_elements(("-android uiautomator", "new UiSelector()"))
+
+    def test_text_separates_blocks_and_skips_hidden_descendants(self):
+        self.assertEqual(self.snapshot.nodes[6].text, "Hello bold world next")
+        self.assertEqual(self.snapshot.nodes[3].text, "One Two")
+        self.assertEqual(self.snapshot.nodes[10].text, "Help me")
+        self.assertEqual(self.snapshot.nodes[1].text, "One Two Hello bold world next Help me")
+
+    def test_hidden_element_keeps_its_own_text(self):
+        self.assertEqual(self.snapshot.nodes[8].text, "secret")
+        self.assertFalse(self.snapshot.is_visible(("css selector", "span")))
+        self.assertTrue(self.snapshot.is_present(("css selector", "span")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import json
+import unittest
+
+from selenium.common.exceptions import WebDriverException
+
+from base.driver_pool import DriverPool, reset_session
+from base.network_capture import NetworkCapture
+
+
+class FakeSwitchTo(object):
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+    def new_window(self, type_hint):
+        handle = "tab{}".format(len(self.driver.handles))
+        self.driver.handles.append(handle)
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver(object):
+    """Driver without DevTools support and without a log, like webdriver.Remote, with one tab"""
+
+    def __init__(self):
+        self.handles = ["tab0"]
+        self.current_window_handle = "tab0"
+        self.switch_to = FakeSwitchTo(self)
+        self.log = []
+        self.quit_count = 0
+
+    @property
+    def window_handles(self):
+        return list(self.handles)
+
+    def close(self):
+        self.handles.remove(self.current_window_handle)
+
+    def delete_all_cookies(self):
+        pass
+
+    def execute_script(self, script, *args):
+        return None
+
+    def quit(self):
+        self.quit_count += 1
+
+
+class FakeChromeDriver(FakeDriver):
+    """Driver with a performance log"""
+
+    def get_log(self, log_type):
+        entries, self.log = self.log, []
+        return entries
+
+
+def request_entry(url):
+    message = {"method": "Network.requestWillBeSent",
+               "params": {"requestId": url, "request": {"url": url, "method": "GET"}}}
+    return {"message": json.dumps({"message": message})}
+
+
+class TestDriverPool(unittest.TestCase):
+
+    def test_reset_empties_network_capture(self):
+        driver = FakeChromeDriver()
+        NetworkCapture.for_driver(driver).poll()
+        driver.log = [request_entry("http://app.test/old")]
+        NetworkCapture.for_driver(driver).find()
+        driver.log = [request_entry("http://app.test/unread")]
+        reset_session(driver)
+        self.assertEqual(NetworkCapture.for_driver(driver).find(), [])
+        self.assertEqual(list(NetworkCapture.for_driver(driver).messages()), [])
+        self.assertEqual(driver.window_handles, ["tab1"])
+
+    def test_reset_without_performance_log(self):
+        driver = FakeChromeDriver()
+
+        def get_log(log_type):
+            raise WebDriverException("invalid argument: log type 'performance' not found")
+
+        driver.get_log = get_log
+        reset_session(driver)
+        self.assertEqual(driver.window_handles, ["tab1"])
+
+    def test_drivers_without_log_are_reused(self):
+        pool = DriverPool(FakeDriver, size=1)
+        driver = pool.acquire()
+        self.assertFalse(hasattr(driver, "get_log"))
+        pool.release(driver)
+        self.assertIs(pool.acquire(), driver)
+        stats = pool.stats()
+        self.assertEqual((stats["created"], stats["reused"], stats["discarded"]), (1, 1, 0))
+
+    def test_failed_reset_discards_driver(self):
+        def reset(driver):
+            raise Exception("DevTools connection closed")
+
+        pool = DriverPool(FakeDriver, size=1, reset=reset)
+        driver = pool.acquire()
+        pool.release(driver)
+        self.assertEqual(driver.quit_count, 1)
+        self.assertEqual(pool.stats()["discarded"], 1)
+        self.assertEqual(pool.stats()["in_use"], 0)
+        self.assertIsNot(pool.acquire(timeout=1), driver)
+
+    def test_released_driver_is_reused(self):
+        pool = DriverPool(FakeDriver, size=1, reset=lambda driver: None)
+        driver = pool.acquire(worker="w1")
+        pool.release(driver)
+        self.assertIs(pool.acquire(worker="w1"), driver)
+        self.assertEqual(pool.stats()["affinity_hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
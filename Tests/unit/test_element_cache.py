@@ -0,0 +1,60 @@
+import unittest
+
+from base.element_cache import ElementCache
+
+
+class FakeElement(object):
+
+    def __init__(self, name):
+        self.element = name
+
+
+class FakeDriver(object):
+    """Driver whose locator checks return the queued verdicts"""
+
+    def __init__(self, *verdicts):
+        self.verdicts = list(verdicts)
+        self.scripts = 0
+
+    def execute_script(self, script, *args):
+        self.scripts += 1
+        return self.verdicts.pop(0)
+
+    def find_element(self, by, value):
+        return FakeElement(value)
+
+
+class TestElementCache(unittest.TestCase):
+    locator = ("css selector", "#login")
+
+    def test_probed_hits_save_no_commands(self):
+        driver = FakeDriver(True, False)
+        cache = ElementCache(driver, probe=True)
+        cache.put(self.locator, FakeElement("login"))
+        self.assertIsNotNone(cache.get(self.locator))
+        self.assertIsNone(cache.get(self.locator))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["probes"], stats["stale"]), (1, 2, 1))
+        self.assertEqual(stats["commands_saved"], -1)
+        self.assertEqual(driver.scripts, 2)
+
+    def test_hits_are_free_by_default(self):
+        driver = FakeDriver()
+        cache = ElementCache(driver)
+        element = cache.put(self.locator, FakeElement("login"))
+        self.assertIs(cache.get(self.locator), element)
+        self.assertIs(cache.get(self.locator), element)
+        element.refind()
+        self.assertEqual(driver.scripts, 0)
+        self.assertEqual(cache.stats()["commands_saved"], 1)
+
+    def test_invalidate_drops_elements(self):
+        cache = ElementCache(FakeDriver(), probe=False)
+        cache.put(self.locator, FakeElement("login"))
+        cache.switch_window("tab1")
+        self.assertIsNone(cache.get(self.locator))
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import json
+import shutil
+import subprocess
+import unittest
+
+from base.base_functions import Base, WrapWebElement
+from base.element_snapshot import READ_FIELD_JS, snapshot_elements
+
+# Reads fields of a plain object standing in for an element, visibility is its "visible" flag
+READ_FIELDS_JS = """
+var window = {scrollX: 0, scrollY: 100, getComputedStyle: function (el) {
+    return {getPropertyValue: function (name) { return el.style[name] || ''; }};
+}};
+%(script)s
+function castappIsVisible(el) { return el.visible; }
+var el = %(element)s;
+el.getAttribute = function (name) { return name in el.attributes ? el.attributes[name] : null; };
+el.matches = function () { return el.disabled; };
+el.getBoundingClientRect = function () { return {x: 5, y: 10, width: 20, height: 30}; };
+console.log(JSON.stringify(%(fields)s.map(function (field) { return castappReadField(el, field); })));
+"""
+
+
+def read_fields(element, fields):
+    source = READ_FIELDS_JS % {"script": READ_FIELD_JS, "element": json.dumps(element), "fields": json.dumps(fields)}
+    return json.loads(subprocess.run(["node", "-e", source], capture_output=True, text=True, check=True).stdout)
+
+
+@unittest.skipUnless(shutil.which("node"), "node is needed to run the browser script")
+class TestReadField(unittest.TestCase):
+    element = {"tagName": "INPUT", "visible": True, "innerText": "  Total  ", "disabled": False, "checked": True,
+               "value": "42", "required": False, "dataset": {"id": "7"}, "style": {"color": "red"},
+               "attributes": {"data-id": "7", "class": "price", "dataset": "attribute"}}
+
+    def test_element_fields(self):
+        self.assertEqual(read_fields(self.element, ["text", "tag_name", "displayed", "enabled", "selected"]),
+                         ["Total", "input", True, True, True])
+
+    def test_hidden_element_has_no_text(self):
+        self.assertEqual(read_fields(dict(self.element, visible=False), ["text", "displayed"]), ["", False])
+
+    def test_rect_is_relative_to_the_document(self):
+        self.assertEqual(read_fields(self.element, ["rect"]), [{"x": 5, "y": 110, "width": 20, "height": 30}])
+
+    def test_prefixed_fields(self):
+        self.assertEqual(read_fields(self.element, ["attribute:data-id", "attribute:title", "property:value",
+                                                    "property:missing", "css:color"]),
+                         ["7", None, "42", None, "red"])
+
+    def test_plain_names_read_like_get_attribute(self):
+        # Properties first, booleans as "true" or None, objects and missing properties from the attribute
+        self.assertEqual(read_fields(self.element, ["value", "checked", "required", "dataset", "class"]),
+                         ["42", "true", None, "attribute", "price"])
+
+
+class FakeElement(object):
+
+    def __init__(self, name):
+        self.parent = None
+        self._id = name
+
+
+class FakeDriver(object):
+    """Driver answering snapshot scripts with the given records"""
+
+    def __init__(self, records=()):
+        self.records = records
+        self.calls = []
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_script(self, script, *args):
+        self.calls.append(args)
+        return [dict(record) for record in self.records]
+
+
+class TestSnapshotElements(unittest.TestCase):
+    locator = ("css selector", ".row")
+
+    def test_reads_located_elements_with_one_script(self):
+        driver = FakeDriver([{"text": "a"}, {"text": "b"}])
+        self.assertEqual(snapshot_elements(driver, ("text",), locator=self.locator), [{"text": "a"}, {"text": "b"}])
+        self.assertEqual(driver.calls, [("css selector", ".row", None, None, ["text"])])
+
+    def test_reads_given_elements(self):
+        driver = FakeDriver([{"text": "a"}])
+        elements = [FakeElement("e1")]
+        snapshot_elements(driver, ("text", "href"), elements=elements)
+        self.assertEqual(driver.calls, [(None, None, elements, None, ["text", "href"])])
+
+    def test_no_elements_need_no_script(self):
+        driver = FakeDriver()
+        self.assertEqual(snapshot_elements(driver, elements=[]), [])
+        self.assertEqual(driver.calls, [])
+
+    def test_locator_or_elements_required(self):
+        with self.assertRaises(Exception):
+            snapshot_elements(FakeDriver())
+
+    def test_base_wraps_elements(self):
+        driver = FakeDriver([{"element": FakeElement("e1"), "text": "a"}])
+        records = Base(driver).snapshot_elements(self.locator, ("element", "text"))
+        self.assertIsInstance(records[0]["element"], WrapWebElement)
+        self.assertEqual(records[0]["element"].locator, self.locator)
+        self.assertEqual(records[0]["text"], "a")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from base.element_stream import iter_element_batches
+from base.wait_engine import WAIT_JS
+
+
+class FakeDriver(object):
+    """Driver whose list renders after a number of presence waits, streams are empty before"""
+
+    def __init__(self, renders_after, rows=("a", "b")):
+        self.renders_after = renders_after
+        self.rows = list(rows)
+        self.scripts = []
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_async_script(self, script, *args):
+        if script == WAIT_JS:
+            self.scripts.append("wait")
+            self.renders_after -= 1
+            return "first row" if self.renders_after <= 0 else None
+        self.scripts.append("stream")
+        if self.renders_after > 0:
+            return {"records": [], "scrolled": False}
+        records = [{"key": row, "element": row} for row in self.rows]
+        self.rows = []
+        return {"records": records, "scrolled": False}
+
+    def execute_script(self, script, *args):
+        pass
+
+
+class TestElementStream(unittest.TestCase):
+
+    def test_waits_for_the_first_item(self):
+        driver = FakeDriver(renders_after=1)
+        batches = list(iter_element_batches(driver, ("css selector", ".row"), timeout=5))
+        self.assertEqual([[record["key"] for record in batch] for batch in batches], [["a", "b"]])
+        self.assertEqual(driver.scripts, ["stream", "wait", "stream", "stream"])
+
+    def test_rendered_list_is_not_waited_for(self):
+        driver = FakeDriver(renders_after=0)
+        self.assertEqual(len(list(iter_element_batches(driver, ("css selector", ".row"), timeout=5))), 1)
+        self.assertNotIn("wait", driver.scripts)
+
+    def test_empty_when_nothing_renders(self):
+        driver = FakeDriver(renders_after=2)
+        self.assertEqual(list(iter_element_batches(driver, ("css selector", ".row"), timeout=0.1)), [])
+        self.assertEqual(driver.scripts, ["stream", "wait"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from selenium.webdriver import ActionChains
+from selenium.webdriver.remote.command import Command
+
+from base.gestures import GestureRecorder, gesture
+from base.instrumentation import CommandTracer
+
+
+class FakeDriver(object):
+    """Driver that records the commands it is sent"""
+
+    def __init__(self):
+        self.commands = []
+
+    def execute(self, driver_command, params=None):
+        self.commands.append((driver_command, params))
+        return {"value": None}
+
+
+class TestGestureRecorder(unittest.TestCase):
+
+    def test_gestures_are_sent_in_one_request(self):
+        driver = FakeDriver()
+        with GestureRecorder(driver):
+            with gesture(driver) as actions:
+                actions.key_down("a")
+            with gesture(driver) as actions:
+                actions.key_up("a")
+        self.assertEqual([command for command, _ in driver.commands], [Command.W3C_ACTIONS])
+
+    def test_other_actions_run_after_queued_gestures(self):
+        driver = FakeDriver()
+        with GestureRecorder(driver):
+            with gesture(driver) as actions:
+                actions.key_down("a")
+            ActionChains(driver).key_down("b").perform()
+        keys = [[action.get("value") for source in params["actions"] for action in source["actions"]
+                 if action["type"] == "keyDown"] for _, params in driver.commands]
+        self.assertEqual(keys, [["a"], ["b"]])
+
+    def test_stop_restores_execute(self):
+        driver = FakeDriver()
+        GestureRecorder(driver).start().stop()
+        self.assertNotIn("execute", vars(driver))
+        self.assertIsNone(GestureRecorder.for_driver(driver))
+
+    def test_recorder_and_tracer_in_any_order(self):
+        driver = FakeDriver()
+        recorder = GestureRecorder(driver).start()
+        tracer = CommandTracer(driver).install()
+        with gesture(driver) as actions:
+            actions.key_down("a")
+        recorder.stop()
+        driver.execute(Command.GET_TITLE)
+        # The recorder stopped first, the tracer keeps tracing
+        self.assertEqual([record.command for record in tracer.records], [Command.W3C_ACTIONS, Command.GET_TITLE])
+        recorder = GestureRecorder(driver).start()
+        tracer.uninstall()
+        with gesture(driver) as actions:
+            actions.key_down("b")
+        driver.execute(Command.GET_TITLE)
+        # The tracer went first, the recorder still flushes before the next command
+        self.assertEqual([command for command, _ in driver.commands][-2:], [Command.W3C_ACTIONS, Command.GET_TITLE])
+        self.assertEqual(len(tracer.records), 2)
+        recorder.stop()
+        self.assertNotIn("execute", vars(driver))
+
+
+if __name__ == "__main__":
+    unittest.main()
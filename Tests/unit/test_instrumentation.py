@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.remote.command import Command
+
+from base.base_functions import Base
+from base.instrumentation import CommandTracer
+
+# Milliseconds every command takes on the fake clock
+COSTS = {Command.FIND_ELEMENT: 30, Command.IS_ELEMENT_ENABLED: 5, Command.GET_TITLE: 2}
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+
+class FakeElement(object):
+
+    def __init__(self, driver):
+        self.parent = driver
+        self._id = "element-1"
+        self.driver = driver
+
+    def is_enabled(self):
+        return self.driver.execute(Command.IS_ELEMENT_ENABLED, {"id": self._id})["value"]
+
+
+class FakeDriver(object):
+    """Driver whose commands take their COSTS on the fake clock, finds fail for the missing ids"""
+
+    def __init__(self, clock, missing=()):
+        self.clock = clock
+        self.missing = set(missing)
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute(self, driver_command, params=None):
+        self.clock.now += COSTS[driver_command] / 1000.0
+        if driver_command == Command.FIND_ELEMENT and params["value"] in self.missing:
+            raise NoSuchElementException(params["value"])
+        return {"value": True}
+
+    def find_element(self, by, value):
+        self.execute(Command.FIND_ELEMENT, {"using": by, "value": value})
+        return FakeElement(self)
+
+
+class LoginPage(Base):
+    login_button = ("css selector", "#login")
+
+    def can_login(self):
+        return self.get_element(self.login_button).is_enabled()
+
+
+class TestCommandTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("base.instrumentation.time.perf_counter", self.clock.perf_counter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.driver = FakeDriver(self.clock, missing=["#gone"])
+        self.tracer = CommandTracer(self.driver, name="test_login").install()
+        self.addCleanup(self.tracer.uninstall)
+
+    def test_records_page_methods_and_locators(self):
+        LoginPage(self.driver).can_login()
+        find, enabled = self.tracer.records
+        self.assertEqual((find.command, find.locator, find.stack),
+                         (Command.FIND_ELEMENT, LoginPage.login_button, ("LoginPage.can_login", "LoginPage.get_element")))
+        self.assertAlmostEqual(find.duration, 0.03)
+        # Delegated WebElement members are named after the member
+        self.assertEqual((enabled.locator, enabled.stack),
+                         (LoginPage.login_button, ("LoginPage.can_login", "WrapWebElement.is_enabled")))
+        self.assertEqual(enabled.caller, "LoginPage.can_login")
+
+    def test_retries_and_errors(self):
+        page = LoginPage(self.driver)
+        for _ in range(3):
+            with self.assertRaises(Exception):
+                page.get_element(("css selector", "#gone"))
+        self.assertEqual([record.retries for record in self.tracer.records], [0, 1, 2])
+        self.assertEqual({record.error for record in self.tracer.records}, {"NoSuchElementException"})
+        self.assertEqual(self.tracer.summary()["retries"], 2)
+
+    def test_folded_stacks(self):
+        page = LoginPage(self.driver)
+        page.can_login()
+        # The element cache answers the second lookup
+        page.can_login()
+        self.driver.execute(Command.GET_TITLE)
+        self.assertEqual(self.tracer.folded_stacks(), [
+            "test_login;LoginPage.can_login;LoginPage.get_element;findElement 30.0",
+            "test_login;LoginPage.can_login;WrapWebElement.is_enabled;isElementEnabled 10.0",
+            "test_login;getTitle 2.0"])
+        summary = self.tracer.summary()
+        self.assertEqual(summary["commands"], 4)
+        self.assertEqual(summary["by_caller"]["<test>"][0], 1)
+        self.assertAlmostEqual(summary["by_command"][Command.IS_ELEMENT_ENABLED][1], 0.01)
+
+    def test_chrome_trace(self):
+        LoginPage(self.driver).can_login()
+        path = os.path.join(tempfile.mkdtemp(), "trace.json")
+        self.tracer.write_chrome_trace(path)
+        with open(path) as trace_file:
+            trace = json.load(trace_file)
+        os.remove(path)
+        self.assertEqual(trace["otherData"], {"name": "test_login"})
+        find, enabled = trace["traceEvents"]
+        self.assertEqual((find["ph"], find["name"], find["cat"]), ("X", Command.FIND_ELEMENT, "LoginPage.can_login"))
+        self.assertAlmostEqual(find["dur"], 30000)
+        self.assertAlmostEqual(enabled["ts"], 30000)
+        self.assertEqual(enabled["args"]["stack"], "LoginPage.can_login > WrapWebElement.is_enabled")
+
+    def test_uninstall_restores_execute(self):
+        self.tracer.uninstall()
+        self.assertNotIn("execute", vars(self.driver))
+        self.driver.execute(Command.GET_TITLE)
+        self.assertEqual(self.tracer.records, [])
+
+    def test_second_tracer_is_refused(self):
+        with self.assertRaises(Exception):
+            CommandTracer(self.driver).install()
+
+
+if __name__ == "__main__":
+    unittest.main()
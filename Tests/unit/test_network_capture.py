@@ -0,0 +1,112 @@
+import json
+import re
+import unittest
+
+from base.network_capture import NetworkCapture
+
+
+def entry(method, **params):
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+def request(request_id, url, loader_id, frame_id="main", resource_type="XHR", timestamp=1.0):
+    return entry("Network.requestWillBeSent", requestId=request_id, loaderId=loader_id, frameId=frame_id,
+                 type=resource_type, timestamp=timestamp, request={"url": url, "method": "GET"})
+
+
+def finished(request_id, timestamp=2.0):
+    return entry("Network.loadingFinished", requestId=request_id, timestamp=timestamp, encodedDataLength=10)
+
+
+class FakeDriver(object):
+
+    def __init__(self):
+        self.log = []
+
+    def get_log(self, log_type):
+        entries, self.log = self.log, []
+        return entries
+
+
+class TestNetworkCapture(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = FakeDriver()
+        self.capture = NetworkCapture(self.driver)
+
+    def test_in_flight_only_counts_current_documents(self):
+        self.driver.log = [request("1", "http://app.test/", "a", resource_type="Document"),
+                           request("2", "http://app.test/poll", "a"),
+                           request("3", "http://app.test/events", "a", resource_type="EventSource"),
+                           request("4", "http://app.test/next", "b", resource_type="Document"),
+                           finished("4"),
+                           request("5", "http://app.test/api", "b")]
+        self.assertEqual(self.capture.in_flight(), 4)
+        self.assertEqual(self.capture.in_flight(current_only=True), 1)
+
+    def test_in_flight_ages_out_long_requests(self):
+        self.driver.log = [request("1", "http://app.test/long-poll", "a", timestamp=1.0),
+                           request("2", "http://app.test/api", "a", timestamp=20.0)]
+        self.assertEqual(self.capture.in_flight(max_age=10), 1)
+
+    def test_drained_messages_stay_for_messages(self):
+        self.driver.log = [request("1", "http://app.test/", "a"), finished("1")]
+        self.capture.in_flight()
+        self.driver.log = [request("2", "http://app.test/api", "a")]
+        urls = [message["params"]["request"]["url"]
+                for message in self.capture.messages(("Network.requestWillBeSent",))]
+        self.assertEqual(urls, ["http://app.test/", "http://app.test/api"])
+        self.assertEqual(list(self.capture.messages()), [])
+
+    def test_clear_drops_everything(self):
+        self.driver.log = [request("1", "http://app.test/", "a")]
+        self.capture.poll()
+        self.driver.log = [request("2", "http://app.test/api", "a")]
+        self.capture.clear()
+        self.assertEqual(self.capture.find(), [])
+        self.assertEqual(list(self.capture.messages()), [])
+
+    def test_prefilter_skips_other_entries_unparsed(self):
+        page_event = entry("Page.frameNavigated", frame={"url": "http://app.test/?q=\"Network.x"})
+        self.driver.log = [{"message": "not json"}, page_event, request("1", "http://app.test/api", "a")]
+        self.assertEqual([message["method"] for message in self.capture.messages()], ["Network.requestWillBeSent"])
+
+    def test_failed_requests_are_not_in_flight(self):
+        self.driver.log = [request("1", "http://app.test/api", "a"),
+                           entry("Network.loadingFailed", requestId="1", timestamp=3.0, errorText="net::ERR_FAILED")]
+        self.assertEqual(self.capture.in_flight(), 0)
+        self.assertEqual(self.capture.find("/api")[0].error, "net::ERR_FAILED")
+
+    def test_age_follows_the_devtools_clock(self):
+        self.driver.log = [request("1", "http://app.test/long-poll", "a", timestamp=1.0)]
+        self.assertEqual(self.capture.in_flight(max_age=5), 1)
+        # Any later event moves the clock, also without new requests
+        self.driver.log = [entry("Network.dataReceived", requestId="1", timestamp=9.0, dataLength=5)]
+        self.assertEqual(self.capture.in_flight(max_age=5), 0)
+        self.assertEqual(self.capture.in_flight(), 1)
+
+    def test_find_filters_and_redirects(self):
+        self.driver.log = [request("1", "http://app.test/old", "a"),
+                           entry("Network.requestWillBeSent", requestId="1", loaderId="a", timestamp=1.5,
+                                 request={"url": "http://app.test/new", "method": "GET"},
+                                 redirectResponse={"status": 301}),
+                           entry("Network.responseReceived", requestId="1", timestamp=1.8,
+                                 response={"status": 200, "url": "http://app.test/new"}),
+                           finished("1"),
+                           request("2", "http://app.test/api/items", "a")]
+        exchange, = self.capture.find(status=200)
+        self.assertEqual((exchange.url, exchange.redirects, exchange.duration), ("http://app.test/new",
+                                                                                 [("http://app.test/old", 301)], 1.0))
+        self.assertEqual([e.request_id for e in self.capture.find(re.compile(r"/api/\w+$"), finished=False)], ["2"])
+        self.assertIs(self.capture.wait_for_request("/new", timeout=0), exchange)
+        self.assertIsNone(self.capture.wait_for_request("/api/items", timeout=0))
+
+    def test_store_is_bounded(self):
+        capture = NetworkCapture(self.driver, max_exchanges=2)
+        self.driver.log = [request(str(i), "http://app.test/{}".format(i), "a") for i in range(5)]
+        self.assertEqual([exchange.request_id for exchange in capture.find()], ["3", "4"])
+        self.assertEqual(capture.evicted, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
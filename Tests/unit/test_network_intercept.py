@@ -0,0 +1,168 @@
+import base64
+import unittest
+from unittest import mock
+
+from base import network_intercept
+from base.network_intercept import NetworkInterceptor, NetworkRule
+
+
+class FakeDevTools(object):
+    """
+    DevToolsConnection that records commands and answers Target commands like the browser, handling the
+    attachedToTarget event of an attach before the attach returns
+
+    """
+
+    def __init__(self, targets=("T1",)):
+        self.targets = list(targets)
+        self.listeners = {}
+        self.sent = []
+        self.sessions = 0
+
+    def on(self, method, listener):
+        self.listeners.setdefault(method, []).append(listener)
+
+    def emit(self, method, params, session_id=None):
+        for listener in self.listeners.get(method, ()):
+            listener(params, session_id)
+
+    def send(self, method, params=None, session_id=None, wait=True):
+        self.sent.append((method, params or {}, session_id))
+        if method == "Target.getTargets":
+            return {"targetInfos": [{"targetId": target, "type": "page"} for target in self.targets]}
+        if method == "Target.attachToTarget":
+            session_id = self.new_session()
+            self.emit("Target.attachedToTarget", {"targetInfo": {"targetId": params["targetId"], "type": "page"},
+                                                  "sessionId": session_id, "waitingForDebugger": False})
+            return {"sessionId": session_id}
+        return {}
+
+    def new_session(self):
+        self.sessions += 1
+        return "S{}".format(self.sessions)
+
+    def commands(self, method):
+        return [(params, session_id) for name, params, session_id in self.sent if name == method]
+
+    def close(self):
+        pass
+
+
+class SyncThread(object):
+    """Runs the target on start, so events are handled in a fixed order"""
+
+    def __init__(self, target, args=(), daemon=None, **kwargs):
+        self.target = target
+        self.args = args
+
+    def start(self):
+        self.target(*self.args)
+
+
+class FakeDriver(object):
+    capabilities = {"browserName": "chrome"}
+
+    def execute_cdp_cmd(self, cmd, params):
+        return {}
+
+
+class TestNetworkRule(unittest.TestCase):
+
+    def test_wildcards(self):
+        rule = NetworkRule.blocked("*analytics.com/?.js")
+        self.assertTrue(rule.matches("https://www.analytics.com/a.js"))
+        self.assertFalse(rule.matches("https://www.analytics.com/ab.js"))
+        self.assertFalse(rule.matches("https://www.analytics.com/a.js?v=1"))
+        self.assertTrue(NetworkRule.blocked("*.woff2*").matches("https://cdn.test/font.woff2?v=1"))
+        self.assertFalse(NetworkRule.blocked("https://app.test/api*").matches("https://app.test/static/api.js"))
+
+    def test_stub_response(self):
+        params = NetworkRule.stub("*api/user*", {"name": "test"}, status=201).fulfill_params("R1")
+        headers = {header["name"]: header["value"] for header in params["responseHeaders"]}
+        self.assertEqual((params["requestId"], params["responseCode"]), ("R1", 201))
+        self.assertEqual(base64.b64decode(params["body"]), b'{"name": "test"}')
+        self.assertEqual(headers, {"Content-Type": "application/json", "Content-Length": "16"})
+
+
+class TestNetworkInterceptor(unittest.TestCase):
+
+    def setUp(self):
+        self.devtools = FakeDevTools()
+        for patcher in (mock.patch.object(network_intercept.DevToolsConnection, "for_driver",
+                                          return_value=self.devtools),
+                        mock.patch.object(network_intercept.threading, "Thread", SyncThread)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.driver = FakeDriver()
+        self.interceptor = NetworkInterceptor(self.driver)
+
+    def paused(self, url, session_id="S1"):
+        self.devtools.sent = []
+        self.devtools.emit("Fetch.requestPaused", {"requestId": "R1", "request": {"url": url}}, session_id)
+        return self.devtools.sent
+
+    def test_open_tabs_keep_their_session(self):
+        self.interceptor.add(NetworkRule.blocked("*ads*"))
+        self.assertEqual(self.interceptor._sessions, {"T1": "S1"})
+        self.assertEqual(self.devtools.commands("Target.detachFromTarget"), [])
+        self.assertIn(({"patterns": [{"urlPattern": "*ads*", "requestStage": "Request"}]}, "S1"),
+                      self.devtools.commands("Fetch.enable"))
+
+    def test_late_event_of_the_attached_session_keeps_it(self):
+        self.interceptor.add(NetworkRule.blocked("*ads*"))
+        self.devtools.emit("Target.attachedToTarget", {"targetInfo": {"targetId": "T1", "type": "page"},
+                                                       "sessionId": "S1", "waitingForDebugger": False})
+        self.assertEqual(self.interceptor._sessions, {"T1": "S1"})
+        self.assertEqual(self.devtools.commands("Target.detachFromTarget"), [])
+
+    def test_second_session_of_an_open_tab_is_detached(self):
+        self.interceptor.add(NetworkRule.blocked("*ads*"))
+        self.devtools.emit("Target.attachedToTarget", {"targetInfo": {"targetId": "T1", "type": "page"},
+                                                       "sessionId": "S9", "waitingForDebugger": False})
+        self.assertEqual(self.interceptor._sessions, {"T1": "S1"})
+        self.assertEqual(self.devtools.commands("Target.detachFromTarget"), [({"sessionId": "S9"}, None)])
+
+    def test_new_tabs_resume_after_fetch_is_enabled(self):
+        self.interceptor.add(NetworkRule.blocked("*ads*"))
+        self.devtools.sent = []
+        self.devtools.emit("Target.attachedToTarget", {"targetInfo": {"targetId": "T2", "type": "page"},
+                                                       "sessionId": "S2", "waitingForDebugger": True})
+        self.assertEqual([(method, session_id) for method, _, session_id in self.devtools.sent],
+                         [("Fetch.enable", "S2"), ("Runtime.runIfWaitingForDebugger", "S2")])
+        self.assertEqual(self.interceptor._sessions["T2"], "S2")
+
+    def test_workers_are_resumed_and_detached(self):
+        self.interceptor.add(NetworkRule.blocked("*ads*"))
+        self.devtools.sent = []
+        self.devtools.emit("Target.attachedToTarget", {"targetInfo": {"targetId": "W1", "type": "service_worker"},
+                                                       "sessionId": "S3", "waitingForDebugger": True})
+        self.assertEqual([(method, session_id) for method, _, session_id in self.devtools.sent],
+                         [("Runtime.runIfWaitingForDebugger", "S3"), ("Target.detachFromTarget", None)])
+
+    def test_paused_requests_are_dispatched_by_rule(self):
+        self.interceptor.add(NetworkRule.blocked("*ads*"), NetworkRule.stub("*api*", {"ok": True}))
+        blocked = self.paused("https://ads.test/banner.js")
+        self.assertEqual(blocked, [("Fetch.failRequest", {"requestId": "R1", "errorReason": "BlockedByClient"}, "S1")])
+        stubbed = self.paused("https://app.test/api/user")
+        self.assertEqual(stubbed[0][0], "Fetch.fulfillRequest")
+        passed = self.paused("https://app.test/")
+        self.assertEqual(passed, [("Fetch.continueRequest", {"requestId": "R1"}, "S1")])
+        self.assertEqual((self.interceptor.blocked, self.interceptor.stubbed), (1, 1))
+
+    def test_offline_fails_unmatched_requests(self):
+        self.interceptor.add(NetworkRule.stub("*api*", []), offline=True)
+        self.assertEqual(self.paused("https://cdn.test/app.js")[0][1]["errorReason"], "InternetDisconnected")
+        self.assertEqual(self.paused("data:image/png;base64,AA==")[0][0], "Fetch.continueRequest")
+        self.assertEqual(self.interceptor.failed, 1)
+
+    def test_clear_disables_fetch(self):
+        self.interceptor.add(NetworkRule.blocked("*ads*"))
+        self.devtools.sent = []
+        self.interceptor.clear()
+        self.assertEqual(self.devtools.commands("Fetch.disable"), [({}, "S1")])
+        self.interceptor.clear()
+        self.assertEqual(len(self.devtools.commands("Fetch.disable")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from selenium.common.exceptions import JavascriptException, UnexpectedAlertPresentException
+
+from base.page_readiness import PageReadiness
+
+
+class FakeDriver(object):
+    """Driver whose async scripts fail with the queued errors before they succeed"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.scripts = 0
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_async_script(self, script, *args):
+        self.scripts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return True
+
+
+class TestPageReadiness(unittest.TestCase):
+
+    def test_retries_while_documents_are_replaced(self):
+        unloaded = "javascript error: document unloaded while waiting for result"
+        driver = FakeDriver(*[JavascriptException(unloaded) for _ in range(3)])
+        PageReadiness(driver).wait(timeout=5)
+        self.assertEqual(driver.scripts, 4)
+
+    def test_syntax_error_fails_at_once(self):
+        driver = FakeDriver(JavascriptException("SyntaxError: Unexpected token"))
+        with self.assertRaises(JavascriptException):
+            PageReadiness(driver, hooks=["window.app &&"]).wait(timeout=5)
+        self.assertEqual(driver.scripts, 1)
+
+    def test_alert_counts_as_ready(self):
+        driver = FakeDriver(UnexpectedAlertPresentException("alert open"))
+        PageReadiness(driver).wait(timeout=5)
+        self.assertEqual(driver.scripts, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
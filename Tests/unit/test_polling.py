@@ -0,0 +1,85 @@
+import itertools
+import unittest
+from unittest import mock
+
+from base import polling
+from base.polling import POLL_HISTORY, Poller, poll_summary
+
+
+class FakeClock(object):
+    """Monotonic clock advanced by sleeps only"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestPoller(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.multiple(polling.time, monotonic=self.clock.monotonic, sleep=self.clock.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        POLL_HISTORY.clear()
+        self.addCleanup(POLL_HISTORY.clear)
+
+    def test_backoff_grows_up_to_max_interval(self):
+        poller = Poller(10, first_interval=0.1, max_interval=0.5, factor=2, jitter=0)
+        self.assertEqual(list(itertools.islice(poller.intervals(), 6)), [0.1, 0.2, 0.4, 0.5, 0.5, 0.5])
+
+    def test_first_interval_capped_by_max_interval(self):
+        self.assertEqual(next(Poller(10, first_interval=2, max_interval=0.5, jitter=0).intervals()), 0.5)
+
+    def test_jitter_bounds(self):
+        intervals = list(itertools.islice(Poller(10, first_interval=1, max_interval=1, jitter=0.2).intervals(), 200))
+        self.assertTrue(all(0.8 <= interval <= 1.2 for interval in intervals))
+        self.assertGreater(len(set(intervals)), 1)
+
+    def test_last_sleep_clamped_to_deadline(self):
+        value, stats = Poller(1, first_interval=0.3, max_interval=0.3, jitter=0).poll(lambda: None)
+        self.assertIsNone(value)
+        self.assertFalse(stats.succeeded)
+        self.assertAlmostEqual(sum(self.clock.sleeps), 1)
+        self.assertAlmostEqual(self.clock.sleeps[-1], 0.1)
+        self.assertAlmostEqual(stats.overshoot, 0)
+
+    def test_success_and_abort(self):
+        results = iter([None, None, "done"])
+        value, stats = Poller(5, jitter=0).poll(lambda: next(results))
+        self.assertEqual((value, stats.attempts, stats.succeeded), ("done", 3, True))
+        value, stats = Poller(5).poll(lambda: 0, abort=lambda value: value == 0)
+        self.assertEqual((stats.attempts, stats.aborted, stats.succeeded), (1, True, False))
+
+    def test_check_runs_once_without_time(self):
+        _, stats = Poller(0).poll(lambda: None)
+        self.assertEqual(stats.attempts, 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_history_is_bounded(self):
+        poller = Poller(0)
+        for _ in range(POLL_HISTORY.maxlen + 5):
+            poller.poll(lambda: True)
+        self.assertEqual(len(POLL_HISTORY), POLL_HISTORY.maxlen)
+
+    def test_poll_summary(self):
+        self.assertEqual(poll_summary(), {"polls": 0, "succeeded": 0, "attempts": 0, "mean_time_to_success": None,
+                                          "max_overshoot": 0.0})
+        results = iter([None, "done"])
+        Poller(5, first_interval=0.2, jitter=0).poll(lambda: next(results))
+        Poller(0.5, first_interval=0.5, jitter=0).poll(lambda: None)
+        summary = poll_summary()
+        self.assertEqual((summary["polls"], summary["succeeded"], summary["attempts"]), (2, 1, 4))
+        self.assertAlmostEqual(summary["mean_time_to_success"], 0.2)
+        self.assertEqual(summary["max_overshoot"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+from selenium.common.exceptions import TimeoutException
+
+from base.base_functions import Base
+from base.js_snippets import FETCH_PROBE_JS
+from base.wait_engine import SCRIPT_TIMEOUT_MARGIN
+
+
+class FakeDriver(object):
+    """Driver logging reloads and probe requests, probes answer with the queued responses"""
+
+    def __init__(self, *probes):
+        self.probes = list(probes)
+        self.events = []
+        self.script_timeouts = []
+        self.probe_args = None
+
+    @property
+    def refreshes(self):
+        return self.events.count("refresh")
+
+    def set_script_timeout(self, timeout):
+        self.script_timeouts.append(timeout)
+
+    def refresh(self):
+        self.events.append("refresh")
+
+    def execute_async_script(self, script, *args):
+        if script == FETCH_PROBE_JS:
+            self.probe_args = args
+            self.events.append("probe")
+            return self.probes.pop(0)
+        # Page readiness wait
+        return True
+
+
+def response(status):
+    return {"status": status, "ok": 200 <= status < 300, "text": ""}
+
+
+class TestRefreshUntil(unittest.TestCase):
+
+    def test_checks_before_reloading(self):
+        driver = FakeDriver()
+        stats = Base(driver).refresh_until(lambda d: True, timeout=5, first_interval=0.01)
+        self.assertEqual((driver.refreshes, stats.attempts), (0, 1))
+
+    def test_reloads_until_condition_holds(self):
+        driver = FakeDriver()
+        stats = Base(driver).refresh_until(lambda d: d.refreshes >= 2, timeout=5, first_interval=0.01)
+        self.assertEqual((driver.refreshes, stats.attempts, stats.succeeded), (2, 3, True))
+
+    def test_times_out(self):
+        driver = FakeDriver()
+        with self.assertRaises(TimeoutException):
+            Base(driver).refresh_until(lambda d: False, timeout=0.1, first_interval=0.01)
+        self.assertGreater(driver.refreshes, 0)
+
+    def test_reloads_at_once_after_probe_passes(self):
+        driver = FakeDriver(response(503), response(503), response(200))
+        stats = Base(driver).refresh_until(lambda d: d.refreshes >= 1, timeout=5, first_interval=0.01,
+                                           probe_url="/api/order/1")
+        self.assertEqual(driver.events, ["probe", "probe", "probe", "refresh"])
+        # The condition held at the first check, without a sleep before the reload
+        self.assertEqual(stats.attempts, 1)
+        self.assertEqual(driver.probe_args, ("/api/order/1", 10000))
+
+    def test_failing_probe_does_not_reload(self):
+        driver = FakeDriver(*[response(404)] * 50)
+        with self.assertRaises(TimeoutException):
+            Base(driver).refresh_until(lambda d: True, timeout=0.1, first_interval=0.01, probe_url="/api/order/1",
+                                       probe_check=lambda result: result["status"] != 404)
+        self.assertEqual(driver.refreshes, 0)
+
+    def test_fetch_probe_script_timeout(self):
+        driver = FakeDriver(response(200))
+        self.assertEqual(Base(driver).fetch_probe("/health", timeout=3), response(200))
+        self.assertEqual(driver.probe_args, ("/health", 3000))
+        self.assertIn(3 + SCRIPT_TIMEOUT_MARGIN, driver.script_timeouts)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import io
+import os
+import queue
+import tempfile
+import unittest
+from unittest import mock
+
+from base import runner
+from base.runner import StreamingResult, load_durations, make_shards, save_durations
+
+
+def sample_suite():
+    # Defined here so test collectors do not run the sample on its own
+    class Sample(unittest.TestCase):
+
+        def test_pass(self):
+            pass
+
+        def test_subtests(self):
+            for number in range(3):
+                with self.subTest(number=number):
+                    self.assertNotEqual(number, 1)
+
+        @unittest.skip("not today")
+        def test_skip(self):
+            pass
+
+    return unittest.TestLoader().loadTestsFromTestCase(Sample)
+
+
+class TestMakeShards(unittest.TestCase):
+
+    def test_balances_known_durations(self):
+        durations = {"a": 7, "b": 5, "c": 4, "d": 3, "e": 1}
+        shards = make_shards(sorted(durations), 2, durations)
+        loads = sorted(sum(durations[test_id] for test_id in shard) for shard in shards)
+        self.assertEqual(loads, [10, 10])
+        self.assertEqual(sorted(sum(shards, [])), sorted(durations))
+
+    def test_without_history_splits_by_count(self):
+        shards = make_shards(["t{}".format(index) for index in range(7)], 3, {})
+        self.assertEqual(sorted(len(shard) for shard in shards), [2, 2, 3])
+
+    def test_unknown_tests_take_the_average(self):
+        durations = {"slow": 10, "fast": 2, "other": 100}
+        shards = make_shards(["slow", "fast", "new1", "new2"], 2, durations)
+        self.assertEqual(sorted(map(sorted, shards)), [["fast", "slow"], ["new1", "new2"]])
+
+    def test_never_more_shards_than_tests(self):
+        self.assertEqual(make_shards(["a"], 4, {}), [["a"]])
+        self.assertEqual(make_shards([], 4, {}), [[]])
+
+
+class TestDurations(unittest.TestCase):
+
+    def test_missing_or_broken_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "durations.json")
+            self.assertEqual(load_durations(path), {})
+            with open(path, "w") as durations_file:
+                durations_file.write("{broken")
+            self.assertEqual(load_durations(path), {})
+
+    def test_save_merges_and_uses_test_ids(self):
+        results = [{"test": "m.T.test_a", "parent": "m.T.test_a", "duration": 1.23456},
+                   {"test": "m.T.test_b (n=1)", "parent": "m.T.test_b", "duration": 0.5},
+                   {"test": "m.T.test_b (n=2)", "parent": "m.T.test_b", "duration": 0.9}]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "durations.json")
+            save_durations(path, {"m.T.test_old": 3.0, "m.T.test_a": 9.0}, results)
+            self.assertEqual(load_durations(path), {"m.T.test_old": 3.0, "m.T.test_a": 1.235, "m.T.test_b": 0.9})
+
+    def test_records_without_test(self):
+        self.assertEqual(runner.test_durations([{"test": None, "duration": 0.0}]), {})
+
+
+class TestStreamingResult(unittest.TestCase):
+
+    def run_sample(self):
+        messages = queue.Queue()
+        sample_suite().run(StreamingResult(messages, 3))
+        records = []
+        while not messages.empty():
+            records.append(messages.get())
+        return records
+
+    def test_streams_every_outcome(self):
+        records = {record["test"].split(".")[-1]: record for record in self.run_sample()}
+        self.assertEqual(records["test_pass"]["outcome"], "passed")
+        self.assertEqual(records["test_skip"]["outcome"], "skipped")
+        self.assertEqual(records["test_skip"]["details"], "not today")
+        self.assertTrue(all(record["worker"] == 3 for record in records.values()))
+
+    def test_failed_subtests_are_reported_for_their_test(self):
+        subtests = [record for record in self.run_sample() if "test_subtests" in record["test"]]
+        self.assertEqual(len(subtests), 1)
+        self.assertEqual(subtests[0]["outcome"], "failed")
+        self.assertIn("number=1", subtests[0]["test"])
+        self.assertIn("AssertionError", subtests[0]["details"])
+        self.assertTrue(subtests[0]["parent"].endswith("Sample.test_subtests"))
+        self.assertIn(subtests[0]["parent"], runner.test_durations(subtests))
+
+
+class InlineProcess(object):
+    """Worker process run in this process on start, with an environment of its own"""
+    environments = []
+
+    def __init__(self, target, args):
+        self.target = target
+        self.args = args
+        self.exitcode = 0
+
+    def start(self):
+        with mock.patch.dict(os.environ):
+            self.target(*self.args)
+            InlineProcess.environments.append(dict(os.environ))
+
+    def is_alive(self):
+        return False
+
+    def join(self):
+        pass
+
+
+class InlineContext(object):
+
+    def Queue(self):
+        return queue.Queue()
+
+    def Process(self, target, args):
+        return InlineProcess(target, args)
+
+
+class TestRun(unittest.TestCase):
+    test_ids = ["test_runner.TestMakeShards.test_never_more_shards_than_tests",
+                "test_runner.TestMakeShards.test_without_history_splits_by_count"]
+
+    def test_workers_get_seed_and_count_without_touching_the_environment(self):
+        InlineProcess.environments = []
+        environment = dict(os.environ)
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(runner.multiprocessing, "get_context", lambda method: InlineContext()), \
+                mock.patch.object(runner, "run_seed", lambda: "1234"):
+            report = runner.run(self.test_ids, 2, os.path.join(directory, "durations.json"), stream=io.StringIO())
+        self.assertEqual(dict(os.environ), environment)
+        self.assertEqual((report["seed"], report["summary"]), ("1234", {"passed": 2}))
+        self.assertEqual(sorted((env["CASTAPP_WORKER_ID"], env["CASTAPP_WORKER_COUNT"], env["CASTAPP_SEED"])
+                                for env in InlineProcess.environments), [("0", "2", "1234"), ("1", "2", "1234")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+
+from base.session_store import SessionStore
+
+
+class FakeDriver(object):
+    """Driver without DevTools support that only tracks its url"""
+
+    def __init__(self):
+        self.current_url = "about:blank"
+
+    def get(self, url):
+        self.current_url = url
+
+    def get_cookies(self):
+        return [{"name": "token", "value": "1", "domain": "app.test"}]
+
+    def add_cookie(self, cookie):
+        pass
+
+    def execute_script(self, script, *args):
+        return None
+
+
+class TestSessionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.store = SessionStore("user", self.login, rejected=lambda driver: "/login" in driver.current_url,
+                                  directory=self.directory.name)
+        self.verdicts = []
+
+    def navigate_url(self, driver, url):
+        # Same flow as Base.navigate_url of a page object with session_store set
+        driver.get(url)
+        if not self.store.verify(driver):
+            self.store.ensure(driver)
+            driver.get(url)
+
+    def login(self, driver):
+        self.navigate_url(driver, "http://app.test/login")
+        self.verdicts.append(self.store.verify(driver))
+        driver.get("http://app.test/home")
+
+    def test_login_flow_pages_are_not_rejected(self):
+        driver = FakeDriver()
+        self.assertFalse(self.store.ensure(driver))
+        self.assertEqual(self.store.logins, 1)
+        self.assertEqual(self.verdicts, [True])
+        self.assertEqual(self.store.rejections, 0)
+
+    def test_rejected_session_logs_in_again(self):
+        driver = FakeDriver()
+        self.store.ensure(driver)
+        driver.get("http://app.test/login")
+        self.assertFalse(self.store.verify(driver))
+        self.assertEqual(self.store.rejections, 1)
+        self.assertIsNone(self.store.load())
+        self.assertFalse(self.store.ensure(driver))
+        self.assertEqual(self.store.logins, 2)
+
+    def test_saved_session_is_restored(self):
+        self.store.ensure(FakeDriver())
+        driver = FakeDriver()
+        self.assertTrue(self.store.ensure(driver))
+        self.assertEqual(self.store.restores, 1)
+        self.assertEqual(driver.current_url, "about:blank")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import datetime
+import unittest
+from unittest import mock
+
+from base import test_data
+from base.test_data import TestData
+
+
+class TestTestData(unittest.TestCase):
+
+    def workers(self, count, seed=7):
+        return [TestData(seed=seed, worker=(index, count)) for index in range(count)]
+
+    def test_unique_strings_are_disjoint_across_workers(self):
+        for count in (2, 3, 30):
+            generated = [set(generator.unique_strings(200, 4)) for generator in self.workers(count)]
+            self.assertTrue(all(len(values) == 200 for values in generated))
+            self.assertEqual(len(set().union(*generated)), 200 * count)
+
+    def test_unique_strings_stay_unique_within_a_generator(self):
+        generator = TestData(seed=1, worker=(0, 2))
+        first = generator.unique_strings(300, 3)
+        second = generator.unique_strings(300, 3)
+        self.assertFalse(set(first) & set(second))
+        self.assertTrue(all(value[0] in test_data.ALPHABET[0::2] for value in first + second))
+
+    def test_unique_strings_capacity(self):
+        generator = TestData(seed=1, worker=(1, 2))
+        self.assertEqual(len(set(generator.unique_strings(13 * 26, 2))), 13 * 26)
+        with self.assertRaises(Exception):
+            generator.unique_strings(1, 2)
+        with self.assertRaises(Exception):
+            TestData(seed=1, worker=(0, 30)).unique_strings(1, 1)
+
+    def test_unique_integers_are_disjoint_across_workers(self):
+        sparse = [set(generator.unique_integers(100, 0, 10 ** 6)) for generator in self.workers(4)]
+        self.assertEqual(len(set().union(*sparse)), 400)
+        for index, values in enumerate(sparse):
+            self.assertTrue(all(value % 4 == index for value in values))
+
+    def test_unique_integers_dense_sampling_exhausts_the_slice(self):
+        generator = TestData(seed=3, worker=(1, 3))
+        first = generator.unique_integers(20, 0, 99)
+        rest = generator.unique_integers(13, 0, 99)
+        self.assertEqual(sorted(first + rest), list(range(1, 100, 3)))
+        with self.assertRaises(Exception):
+            generator.unique_integers(1, 0, 99)
+
+    def test_unique_dates_cover_the_interval(self):
+        start = datetime.date(2024, 1, 31)
+        dates = TestData(seed=5, worker=(0, 1)).unique_dates(30, start, months=1)
+        self.assertEqual(sorted(dates), [start + datetime.timedelta(days=day) for day in range(30)])
+
+    def test_same_seed_gives_same_data(self):
+        def draw():
+            generator = TestData(seed=42, worker=(0, 2))
+            return (generator.string(8), generator.strings(5, 6), generator.unique_strings(50, 5),
+                    generator.integer(0, 100), generator.unique_integers(50, 0, 10 ** 9),
+                    generator.unique_integers(40, 0, 100), generator.date(datetime.date(2024, 1, 1)))
+
+        self.assertEqual(draw(), draw())
+        with mock.patch.object(test_data, "run_seed", lambda: "run-1"):
+            self.assertEqual(TestData.for_test("Tests.a.test_x").seed, TestData.for_test("Tests.a.test_x").seed)
+            self.assertNotEqual(TestData.for_test("Tests.a.test_x").seed, TestData.for_test("Tests.a.test_y").seed)
+
+    def test_test_replays_whatever_ran_before(self):
+        with mock.patch.object(test_data, "run_seed", lambda: "run-1"):
+            alone = TestData.for_test("Tests.a.test_y").unique_strings(20, 4)
+            for test_id in ("Tests.a.test_w", "Tests.a.test_x"):
+                TestData.for_test(test_id).unique_strings(500, 4)
+            self.assertEqual(TestData.for_test("Tests.a.test_y").unique_strings(20, 4), alone)
+
+    def test_issued_values_go_with_the_generator(self):
+        generator = TestData(seed=1, worker=(0, 1))
+        generator.unique_integers(100, 0, 10 ** 6)
+        self.assertEqual(len(TestData(seed=1, worker=(0, 1))._issued), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+from selenium.common.exceptions import JavascriptException, NoSuchElementException, TimeoutException
+from selenium.webdriver.support import expected_conditions as ec
+
+from base.wait_engine import SCRIPT_TIMEOUT_MARGIN, WaitEngine, ensure_script_timeout
+
+
+class FakeDriver(object):
+    """Driver answering WAIT_JS with the queued results, or errors, and finding elements after some lookups"""
+
+    def __init__(self, *results, found_after=0):
+        self.results = list(results)
+        self.found_after = found_after
+        self.script_timeouts = []
+        self.scripts = []
+        self.finds = 0
+
+    def set_script_timeout(self, timeout):
+        self.script_timeouts.append(timeout)
+
+    def execute_async_script(self, script, *args):
+        self.scripts.append(args)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def find_element(self, by, value):
+        self.finds += 1
+        if self.finds <= self.found_after:
+            raise NoSuchElementException(value)
+        return "polled element"
+
+    def find_elements(self, by, value):
+        return [self.find_element(by, value)]
+
+
+class TestWaitEngine(unittest.TestCase):
+    locator = ("css selector", "#login")
+
+    def test_script_timeout_exceeds_wait_by_margin(self):
+        driver = FakeDriver()
+        ensure_script_timeout(driver, 10)
+        ensure_script_timeout(driver, 3)
+        ensure_script_timeout(driver, 20)
+        self.assertEqual(driver.script_timeouts, [10 + SCRIPT_TIMEOUT_MARGIN, 20 + SCRIPT_TIMEOUT_MARGIN])
+
+    def test_waits_in_browser(self):
+        driver = FakeDriver("element")
+        self.assertEqual(WaitEngine(driver).until(ec.visibility_of_element_located, self.locator, 2), "element")
+        self.assertEqual(driver.scripts, [("css selector", "#login", "visible", 2000, None)])
+        self.assertEqual(driver.finds, 0)
+
+    def test_browser_timeout_raises(self):
+        driver = FakeDriver(None)
+        with self.assertRaises(TimeoutException):
+            WaitEngine(driver).until(ec.presence_of_element_located, self.locator, 1)
+        self.assertEqual(driver.finds, 0)
+
+    def test_falls_back_to_polling_when_script_fails(self):
+        driver = FakeDriver(JavascriptException("document unloaded"), found_after=2)
+        element = WaitEngine(driver).until(ec.presence_of_element_located, self.locator, 5)
+        self.assertEqual(element, "polled element")
+        self.assertEqual(driver.finds, 3)
+
+    def test_falls_back_to_polling_when_script_times_out(self):
+        driver = FakeDriver(TimeoutException("script timeout"))
+        element = WaitEngine(driver).until(ec.presence_of_element_located, self.locator, 5)
+        self.assertEqual(element, "polled element")
+
+    def test_polls_unsupported_locators_and_conditions(self):
+        driver = FakeDriver()
+        engine = WaitEngine(driver)
+        self.assertEqual(engine.until(ec.presence_of_element_located, ("accessibility id", "login"), 1),
+                         "polled element")
+        self.assertEqual(engine.until(ec.presence_of_all_elements_located, self.locator, 1)[0], "polled element")
+        self.assertEqual(driver.scripts, [])
+
+    def test_clickable_is_checked_in_browser(self):
+        driver = FakeDriver("element")
+        WaitEngine(driver).until(ec.element_to_be_clickable, self.locator, 1)
+        self.assertEqual(driver.scripts[0][2], "clickable")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webelement import WebElement
+
+from base.base_functions import WrapWebElement
+from base.element_cache import ElementCache
+
+
+class FakeElement(object):
+    """Element that records the keys sent to it"""
+
+    def __init__(self):
+        self.parent = None
+        self._id = "element-1"
+        self.typed = []
+
+    def send_keys(self, value):
+        self.typed.append(value)
+
+
+class FakeDriver(object):
+
+    def __init__(self, focused):
+        self.focused = focused
+        self.actions = []
+
+    def execute_script(self, script, *args):
+        return self.focused
+
+    def execute(self, driver_command, params=None):
+        if driver_command == Command.W3C_ACTIONS:
+            self.actions.extend(action["value"] for action in params["actions"][0]["actions"]
+                                if action["type"] == "keyDown")
+        return {"value": None}
+
+
+class TestWrapWebElementSendKeys(unittest.TestCase):
+
+    def test_delayed_typing_uses_key_actions(self):
+        driver, element = FakeDriver(focused=True), FakeElement()
+        WrapWebElement(driver, element).send_keys("1234", delay=0.001)
+        self.assertEqual(element.typed, ["1"])
+        self.assertEqual(driver.actions, ["2", "3", "4"])
+
+    def test_delayed_typing_stays_on_element_when_focus_moves(self):
+        driver, element = FakeDriver(focused=False), FakeElement()
+        WrapWebElement(driver, element).send_keys("1234", delay=0.001)
+        self.assertEqual(element.typed, ["1", "2", "3", "4"])
+        self.assertEqual(driver.actions, [])
+
+    def test_typing_without_delay(self):
+        driver, element = FakeDriver(focused=True), FakeElement()
+        WrapWebElement(driver, element).send_keys("1234")
+        self.assertEqual(element.typed, ["1234"])
+
+
+class FakeParent(object):
+    """WebDriver stand-in that answers element commands, failing the ones of stale element ids"""
+    session_id = "fake-session"
+
+    def __init__(self):
+        self.stale = set()
+        self.commands = []
+        self.locator_converter = self
+
+    @staticmethod
+    def convert(by, value):
+        return by, value
+
+    def execute(self, command, params=None):
+        self.commands.append((command, params))
+        if params and params.get("id") in self.stale:
+            raise StaleElementReferenceException("stale element reference")
+        if command == Command.FIND_CHILD_ELEMENT:
+            return {"value": WebElement(self, "child")}
+        return {"value": "text of {}".format(params.get("id")) if params else None}
+
+    def execute_script(self, script, *args):
+        self.commands.append((Command.W3C_EXECUTE_SCRIPT, args))
+        return None
+
+    def find_element(self, by, value):
+        return WebElement(self, "refound")
+
+
+class TestWrapWebElementDelegates(unittest.TestCase):
+
+    def setUp(self):
+        self.parent = FakeParent()
+        self.element = WebElement(self.parent, "first")
+        self.wrapped = WrapWebElement(self.parent, self.element, ("id", "login"))
+
+    def test_delegates_are_class_members(self):
+        self.assertIn("text", WrapWebElement.DELEGATED)
+        self.assertIn("is_enabled", WrapWebElement.DELEGATED)
+        self.assertNotIn("click", WrapWebElement.DELEGATED)
+        self.assertNotIn("find_element", WrapWebElement.DELEGATED)
+        self.assertIsInstance(WrapWebElement.__dict__["text"], property)
+        self.assertEqual(self.wrapped.text, "text of first")
+
+    def test_clear_and_submit_return_the_wrapper(self):
+        self.assertIs(self.wrapped.clear(), self.wrapped)
+        self.assertIs(self.wrapped.submit(), self.wrapped)
+        self.assertEqual(self.wrapped.is_enabled(), "text of first")
+
+    def test_stale_element_is_found_again_once(self):
+        self.parent.stale.add("first")
+        with self.assertRaises(StaleElementReferenceException):
+            self.wrapped.is_enabled()
+        self.wrapped.refind = lambda: self.parent.find_element(*self.wrapped.locator)
+        self.assertEqual(self.wrapped.text, "text of refound")
+        self.assertEqual((self.wrapped.element.id, self.wrapped.id), ("refound", "refound"))
+        self.parent.stale.add("refound")
+        with self.assertRaises(StaleElementReferenceException):
+            self.wrapped.is_enabled()
+
+    def test_cached_elements_refind_through_the_cache(self):
+        cache = ElementCache(self.parent)
+        cache.put(("id", "login"), self.wrapped)
+        self.parent.stale.add("first")
+        self.assertEqual(self.wrapped.get_dom_attribute("value"), "text of refound")
+        self.assertEqual(cache.stats()["refinds"], 1)
+
+    def test_found_children_are_wrapped(self):
+        child = self.wrapped.find_element(("css selector", ".child"))
+        self.assertIsInstance(child, WrapWebElement)
+        self.assertEqual(child.locator, ("css selector", ".child"))
+
+    def test_other_attributes_fall_back_to_the_element(self):
+        self.element.custom = "value"
+        self.assertEqual(self.wrapped.custom, "value")
+        with self.assertRaises(AttributeError):
+            self.wrapped.missing
+
+    def test_attributes_can_be_assigned(self):
+        self.wrapped.locator = ("id", "other")
+        self.wrapped.refind = None
+        self.wrapped.replace_element(WebElement(self.parent, "second"))
+        self.wrapped.extra = 1
+        self.assertEqual((self.wrapped.locator, self.wrapped.id, self.wrapped.extra), (("id", "other"), "second", 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
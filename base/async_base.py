@@ -0,0 +1,519 @@
+"""
+Asyncio counterpart of Base/WrapWebElement.
+Commands go straight to the WebDriver endpoint over a pool of keep-alive HTTP connections, so one test can drive
+many sessions, or many tabs of one session, at once with asyncio.gather. DevTools Protocol commands go through
+chromedriver's /goog/cdp/execute command on the same connections.
+
+"""
+import asyncio
+import json
+import ssl
+import time
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import JavascriptException, TimeoutException
+from selenium.webdriver.remote.errorhandler import ErrorHandler
+
+from base.element_snapshot import DEFAULT_FIELDS, SNAPSHOT_JS
+from base.wait_engine import SCRIPT_TIMEOUT_MARGIN, WAIT_JS
+
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+# Methods that are sent again when a reused connection was lost, POST commands like click are never repeated
+IDEMPOTENT_METHODS = frozenset(("GET", "DELETE"))
+
+# Start a navigation, returning the timeOrigin of the current document, which identifies it, and whether the target
+# is a fragment of the current URL, which keeps the document
+NAVIGATE_JS = """
+var target = new URL(arguments[0], window.location.href);
+var sameDocument = !!target.hash && target.href.split('#')[0] === window.location.href.split('#')[0];
+var origin = performance.timeOrigin;
+window.location.href = target.href;
+return [origin, sameDocument];
+"""
+
+
+class ConnectionLost(ConnectionError):
+    """
+    Connection was closed before any byte of the response arrived
+
+    """
+
+
+class AsyncCommandExecutor(object):
+    """
+    Pool of keep-alive HTTP/1.1 connections to a WebDriver endpoint.
+    Idle connections the endpoint closed are dropped before reuse. A GET or DELETE command whose reused connection
+    is lost before any response byte arrived is sent once more on a fresh connection, other commands may have run
+    already and fail instead.
+
+    """
+
+    def __init__(self, url, max_connections=8, timeout=120):
+        """
+        Inits executor
+        :param str url: WebDriver endpoint, e.g. http://127.0.0.1:9515
+        :param int max_connections: Upper bound of open connections, requests wait for a free one above it
+        :param float timeout: Seconds a single request may take
+
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        self.base_path = parsed.path.rstrip("/")
+        self.ssl = ssl.create_default_context() if parsed.scheme == "https" else None
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+        self.opened = 0
+        self.reused = 0
+        self.retried = 0
+
+    async def _connection(self, fresh=False):
+        while self._idle and not fresh:
+            reader, writer = self._idle.pop()
+            if reader.at_eof() or writer.is_closing():
+                writer.close()
+                continue
+            self.reused += 1
+            return (reader, writer), True
+        self.opened += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl), False
+
+    async def request(self, method, path, body=None):
+        """
+        Send a WebDriver command
+        :param str method: HTTP method
+        :param str path: Command path, e.g. /session/<id>/url
+        :param dict body: JSON body of POST commands
+        :return: Value of the response
+        :raises WebDriverException: Subclass matching the W3C error of the response
+
+        """
+        payload = json.dumps(body if body is not None else {}).encode() if method == "POST" else b""
+        head = ("{} {}{} HTTP/1.1\r\nHost: {}:{}\r\nAccept: application/json\r\n"
+                "Content-Type: application/json;charset=UTF-8\r\nContent-Length: {}\r\nConnection: keep-alive\r\n\r\n"
+                .format(method, self.base_path, path, self.host, self.port, len(payload))).encode()
+        async with self._slots:
+            fresh = False
+            while True:
+                (reader, writer), reused = await self._connection(fresh)
+                try:
+                    writer.write(head + payload)
+                    status, headers, data = await asyncio.wait_for(self._read_response(reader), self.timeout)
+                except ConnectionLost:
+                    writer.close()
+                    if not reused or fresh or method not in IDEMPOTENT_METHODS:
+                        raise
+                    self.retried += 1
+                    fresh = True
+                    continue
+                except BaseException:
+                    writer.close()
+                    raise
+                break
+            if headers.get("connection", "").lower() == "close":
+                writer.close()
+            else:
+                self._idle.append((reader, writer))
+        text = data.decode("utf-8")
+        if status >= 400:
+            ErrorHandler().check_response({"status": status, "value": text})
+        return json.loads(text).get("value") if text else None
+
+    @staticmethod
+    async def _read_response(reader):
+        try:
+            status_line = await reader.readline()
+        except ConnectionError as e:
+            raise ConnectionLost("WebDriver endpoint closed the connection :: {}".format(e))
+        if not status_line:
+            raise ConnectionLost("WebDriver endpoint closed the connection")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            return status, headers, b"".join(chunks)
+        return status, headers, await reader.readexactly(int(headers.get("content-length", 0)))
+
+    async def close(self):
+        """
+        Close all idle connections
+
+        """
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    def stats(self):
+        return {"opened": self.opened, "reused": self.reused, "retried": self.retried, "idle": len(self._idle)}
+
+
+class AsyncSession(object):
+    """
+    A WebDriver session driven through an AsyncCommandExecutor.
+    Commands of one session are serialized, because they all act on its current window.
+
+    """
+
+    def __init__(self, executor, session_id, capabilities=None, owned=True):
+        self.executor = executor
+        self.session_id = session_id
+        self.capabilities = capabilities or {}
+        self.owned = owned
+        self.lock = asyncio.Lock()
+        self.current_window = None
+        self._script_timeout = 0
+
+    @classmethod
+    async def start(cls, executor, capabilities):
+        """
+        Start a new session
+        :param AsyncCommandExecutor executor: Executor of the endpoint
+        :param dict capabilities: Always match capabilities, e.g. webdriver.ChromeOptions().to_capabilities()
+        :rtype: AsyncSession
+
+        """
+        value = await executor.request("POST", "/session", {"capabilities": {"firstMatch": [{}],
+                                                                             "alwaysMatch": capabilities}})
+        return cls(executor, value["sessionId"], value.get("capabilities"))
+
+    @classmethod
+    def attach(cls, driver, executor=None):
+        """
+        Drive the session of a synchronous WebDriver asynchronously, e.g. to open many tabs of a pooled driver at once
+        :param driver: WebDriver instance
+        :param AsyncCommandExecutor executor: Executor to share, defaults to a new one for the driver's endpoint
+        :rtype: AsyncSession
+
+        """
+        if executor is None:
+            # Imported here, base.command_executor needs Selenium 4.26 or later
+            from base.command_executor import executor_url
+            executor = AsyncCommandExecutor(executor_url(driver))
+        return cls(executor, driver.session_id, driver.capabilities, owned=False)
+
+    async def execute(self, method, command, body=None):
+        """
+        Send a command of this session without switching windows
+        :param str method: HTTP method
+        :param str command: Path below /session/<id>, e.g. /url
+        :param dict body: JSON body of POST commands
+        :return: Value of the response
+
+        """
+        return await self.executor.request(method, "/session/{}{}".format(self.session_id, command), body)
+
+    async def execute_in(self, window, method, command, body=None):
+        """
+        Send a command to a window of this session, switching to it first when needed
+        :param window: Window handle or None for the current window
+
+        """
+        async with self.lock:
+            if window is not None and window != self.current_window:
+                await self.execute("POST", "/window", {"handle": window})
+                self.current_window = window
+            return await self.execute(method, command, body)
+
+    async def ensure_script_timeout(self, timeout):
+        needed = (timeout + SCRIPT_TIMEOUT_MARGIN) * 1000
+        if self._script_timeout < needed:
+            await self.execute("POST", "/timeouts", {"script": int(needed)})
+            self._script_timeout = needed
+
+    async def execute_cdp_cmd(self, cmd, params=None):
+        """
+        Send a Chrome DevTools Protocol command through chromedriver's HTTP endpoint, to the current window
+        :param str cmd: Command name, e.g. "Network.clearBrowserCookies"
+        :param dict params: Command parameters
+        :return: Result of the command
+        :rtype: dict
+
+        """
+        return await self.execute("POST", "/goog/cdp/execute", {"cmd": cmd, "params": params or {}})
+
+    async def window_handles(self):
+        return await self.execute("GET", "/window/handles")
+
+    async def new_tab(self):
+        """
+        Open a new tab without switching to it
+        :rtype: AsyncBase
+
+        """
+        value = await self.execute("POST", "/window/new", {"type": "tab"})
+        return AsyncBase(self, window=value["handle"])
+
+    async def quit(self):
+        """
+        End the session when it was started by this object, otherwise only release connections
+
+        """
+        if self.owned:
+            await self.execute("DELETE", "")
+        await self.executor.close()
+
+
+class AsyncBase(object):
+    """
+    Asynchronous page base bound to one window of a session.
+    Page objects of different tabs of the same session can run concurrently: navigation is started with a script
+    and completion is polled, so no command keeps the session busy during a page load.
+
+    """
+
+    def __init__(self, session, window=None, explicit_wait=45):
+        """
+        :param AsyncSession session: Session to drive
+        :param window: Window handle of the page, None uses the current window
+        :param int explicit_wait: Default wait time in seconds
+
+        """
+        self.session = session
+        self.window = window
+        self.explicit_wait = explicit_wait
+
+    async def _execute(self, method, command, body=None):
+        return await self.session.execute_in(self.window, method, command, body)
+
+    async def execute_script(self, script, *args):
+        value = await self._execute("POST", "/execute/sync", {"script": script, "args": _wrap_args(args)})
+        return self._unwrap(value)
+
+    async def execute_async_script(self, script, *args):
+        value = await self._execute("POST", "/execute/async", {"script": script, "args": _wrap_args(args)})
+        return self._unwrap(value)
+
+    async def execute_cdp_cmd(self, cmd, params=None):
+        """
+        Send a Chrome DevTools Protocol command to the window of this page, e.g.
+        await page.execute_cdp_cmd("Emulation.setGeolocationOverride", {"latitude": 41, "longitude": 29, "accuracy": 1})
+        :rtype: dict
+
+        """
+        return await self._execute("POST", "/goog/cdp/execute", {"cmd": cmd, "params": params or {}})
+
+    def _unwrap(self, value, locator=None):
+        if isinstance(value, dict):
+            if ELEMENT_KEY in value:
+                return AsyncWrapWebElement(self, value[ELEMENT_KEY], locator)
+            return {key: self._unwrap(item, locator) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._unwrap(item, locator) for item in value]
+        return value
+
+    async def navigate_url(self, url, timeout=30):
+        """
+        Browse the window to requested url and wait until the document is complete
+        :param str url: Requested URL of the site to be redirected
+        :param float timeout: Maximum time to wait for the page
+
+        """
+        if self.window is None:
+            await self._execute("POST", "/url", {"url": url})
+            return
+        previous, same_document = await self.execute_script(NAVIGATE_JS, url)
+        if not same_document:
+            await self.wait_ready(timeout, previous=previous)
+
+    async def wait_ready(self, timeout=30, interval=0.05, previous=None):
+        """
+        Wait until document.readyState of the window is complete
+        :param float previous: performance.timeOrigin of the document navigated away from, its readyState is
+            ignored until a new document replaced it
+
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                state, origin, blank = await self.execute_script(
+                    "return [document.readyState, performance.timeOrigin, window.location.href === 'about:blank'];")
+                old_document = origin == previous if previous is not None else blank
+            except JavascriptException:
+                # The old document unloaded while the script ran
+                state, old_document = None, True
+            if state == "complete" and not old_document:
+                return
+            if time.monotonic() >= deadline:
+                raise TimeoutException("Page not ready after {} seconds".format(timeout))
+            await asyncio.sleep(interval)
+
+    async def get_browser_title(self):
+        return await self._execute("GET", "/title")
+
+    async def get_browser_url(self):
+        return await self._execute("GET", "/url")
+
+    async def refresh(self):
+        await self._execute("POST", "/refresh")
+
+    async def navigate_browser_back(self):
+        await self._execute("POST", "/back")
+
+    async def navigate_browser_forward(self):
+        await self._execute("POST", "/forward")
+
+    async def get_element(self, locator):
+        """
+        Get element for a provided locator
+        :rtype: AsyncWrapWebElement
+
+        """
+        value = await self._execute("POST", "/element", {"using": locator[0], "value": locator[1]})
+        return AsyncWrapWebElement(self, value[ELEMENT_KEY], locator)
+
+    async def get_elements(self, locator):
+        """
+        Get all elements for a provided locator without waiting
+        :rtype: list
+
+        """
+        values = await self._execute("POST", "/elements", {"using": locator[0], "value": locator[1]})
+        return [AsyncWrapWebElement(self, value[ELEMENT_KEY], locator) for value in values]
+
+    async def is_element_present(self, locator):
+        return bool(await self.execute_script(SNAPSHOT_JS, locator[0], locator[1], None, None, []))
+
+    async def snapshot_elements(self, locator, fields=DEFAULT_FIELDS):
+        """
+        Read fields of many elements with one script call, see Base.snapshot_elements
+        :rtype: list
+
+        """
+        return await self.execute_script(SNAPSHOT_JS, locator[0], locator[1], None, None, list(fields))
+
+    async def wait_for_element(self, locator, condition="present", timeout=20):
+        """
+        Wait for an element condition inside the browser, see WaitEngine
+        :param str condition: One of "present", "visible", "clickable", "invisible"
+        :rtype: AsyncWrapWebElement
+
+        """
+        await self.session.ensure_script_timeout(timeout)
+        result = await self.execute_async_script(WAIT_JS, locator[0], locator[1], condition, int(timeout * 1000),
+                                                 None)
+        if result is None:
+            raise TimeoutException("Condition '{}' not met for element {} after {} seconds"
+                                   .format(condition, locator, timeout))
+        if isinstance(result, AsyncWrapWebElement):
+            result.locator = locator
+        return result
+
+    async def open_new_tab(self):
+        """
+        Open a new tab of the session
+        :return: Page base bound to the new tab
+        :rtype: AsyncBase
+
+        """
+        return await self.session.new_tab()
+
+    async def switch_window(self, index):
+        """
+        Bind this page to another window of the session
+        :param index: tab index or allowed values are "first", "last"
+
+        """
+        handles = await self.session.window_handles()
+        if index == "first":
+            self.window = handles[0]
+        elif index == "last":
+            self.window = handles[-1]
+        elif type(index) == int:
+            self.window = handles[index]
+        else:
+            raise Exception("switch_window: Invalid index: {}".format(index))
+
+
+class AsyncWrapWebElement(object):
+    """
+    Element of an AsyncBase page
+
+    """
+    __slots__ = ("page", "id", "locator")
+
+    def __init__(self, page, element_id, locator=None):
+        self.page = page
+        self.id = element_id
+        self.locator = locator
+
+    def to_json(self):
+        return {ELEMENT_KEY: self.id}
+
+    async def _execute(self, method, command, body=None):
+        return await self.page._execute(method, "/element/{}{}".format(self.id, command), body)
+
+    async def text(self):
+        """
+        Visible text of the element, e.g. await element.text()
+        :rtype: str
+
+        """
+        return await self._execute("GET", "/text")
+
+    async def get_attribute(self, name):
+        return await self._execute("GET", "/attribute/{}".format(name))
+
+    async def get_property(self, name):
+        return await self._execute("GET", "/property/{}".format(name))
+
+    async def is_enabled(self):
+        return await self._execute("GET", "/enabled")
+
+    async def is_selected(self):
+        return await self._execute("GET", "/selected")
+
+    async def click(self):
+        await self._execute("POST", "/click")
+        return self
+
+    async def clear(self):
+        await self._execute("POST", "/clear")
+        return self
+
+    async def send_keys(self, value):
+        await self._execute("POST", "/value", {"text": value})
+        return self
+
+    async def find_element(self, *locator):
+        locator = locator[0] if isinstance(locator[0], tuple) else locator
+        value = await self._execute("POST", "/element", {"using": locator[0], "value": locator[1]})
+        return AsyncWrapWebElement(self.page, value[ELEMENT_KEY], locator)
+
+    async def find_elements(self, *locator):
+        locator = locator[0] if isinstance(locator[0], tuple) else locator
+        values = await self._execute("POST", "/elements", {"using": locator[0], "value": locator[1]})
+        return [AsyncWrapWebElement(self.page, value[ELEMENT_KEY], locator) for value in values]
+
+    async def js_click(self):
+        await self.page.execute_script("arguments[0].click();", self)
+        return self
+
+    async def scroll(self, center=False):
+        if center:
+            await self.page.execute_script("arguments[0].scrollIntoView(true);", self)
+        else:
+            await self.page.execute_script("arguments[0].scrollIntoView({block: 'center'});", self)
+        return self
+
+
+def _wrap_args(args):
+    if isinstance(args, AsyncWrapWebElement):
+        return args.to_json()
+    if isinstance(args, (list, tuple)):
+        return [_wrap_args(item) for item in args]
+    if isinstance(args, dict):
+        return {key: _wrap_args(item) for key, item in args.items()}
+    return args
@@ -1,22 +1,36 @@
-import calendar
-import datetime
+import contextlib
+import inspect
 import logging
-import random
-import string
 import time
 import json
 from functools import wraps
-from random import randint
 
 from selenium.common.exceptions import *
-from selenium.webdriver import ActionChains
 from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.remote.command import Command
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions as ec
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.support.ui import WebDriverWait
 
+from base.async_base import AsyncBase, AsyncSession
+from base.browser_profiles import remove_user_data_dir
+from base.browser_state import reset_browser_state, reset_page_storage, supports_cdp
+from base.device_emulation import DeviceEmulation
+from base.dom_snapshot import DomSnapshot, UnsupportedLocator
+from base.element_cache import ElementCache
+from base.element_snapshot import DEFAULT_FIELDS, snapshot_elements
+from base.element_stream import iter_element_batches
+from base.gestures import GestureRecorder, gesture
+from base.js_snippets import FETCH_PROBE_JS
+from base.network_capture import NetworkCapture
+from base.network_intercept import NetworkInterceptor
+from base.page_readiness import PageReadiness
+from base.polling import Poller
+from base.test_data import add_months, current_test_data
+from base.wait_engine import WaitEngine, ensure_script_timeout
+
 
 class Base(object):
     """
@@ -25,17 +39,43 @@ class Base(object):
     with other project users.
 
     """
-
-    def __init__(self, driver, explicit_wait=45):
+    # PollStats of the latest wait_until call
+    last_wait_stats = None
+    # AbsenceReport of the latest absence check
+    last_absence_report = None
+    # App specific readiness checks of the page, JavaScript expressions or callables taking the driver
+    ready_hooks = ()
+    # Also wait for the network to be idle when the page is loaded, needs the performance log enabled
+    wait_network_idle = False
+    # NetworkRules the page needs, e.g. blocked analytics or stubbed APIs, added to the driver on construction
+    network_rules = ()
+    # SessionStore whose logged in state the page needs, put into the driver on construction instead of logging in
+    session_store = None
+
+    def __init__(self, driver, explicit_wait=45, command_executor=None):
         """
         Inits Selenium Driver class with driver
         :param driver: WebDriver instance
         :param int explicit_wait: Time you want use as wait time
+        :param command_executor: PooledRemoteConnection to send the driver's commands through, or the URL of the
+        endpoint to use the process wide shared one, needs Selenium 4.26 or later
         :return A SeleniumDriver object
 
         """
+        if command_executor is not None:
+            if isinstance(command_executor, str):
+                # Imported here, the pooled executor needs Selenium 4.26 or later and the rest of Base does not
+                from base.command_executor import shared_executor
+                command_executor = shared_executor(command_executor)
+            command_executor.attach(driver)
         self.driver = driver
         self.wait = WebDriverWait(self.driver, explicit_wait)
+        self.wait_engine = WaitEngine(self.driver)
+        self.page_readiness = PageReadiness(self.driver, hooks=self.ready_hooks, network_idle=self.wait_network_idle)
+        if self.network_rules:
+            self.network_interceptor.add(*self.network_rules)
+        if self.session_store is not None:
+            self.session_store.ensure(self.driver)
 
     def driver(self):
         return self.driver
@@ -52,7 +92,9 @@ class Base(object):
 
     def refresher(self, total_time, refresh_time):
         """
-        Refresh the page according to total time and refresh per seconds
+        Refresh the page according to total time and refresh per seconds.
+        Loading time of the page counts towards refresh_time.
+        Runs for the full total_time, use refresh_until to stop as soon as the awaited content shows up.
         :param int total_time: Total waiting time for all refreshes
         :param int refresh_time: Time for refresh per seconds
 
@@ -60,7 +102,81 @@ class Base(object):
         refresh_count = int(total_time / refresh_time)
         for current_refresh in range(0, refresh_count):
             self.driver.refresh()
-            time.sleep(refresh_time)
+            self.element_cache.invalidate()
+            elapsed = self.page_readiness.wait()
+            time.sleep(max(0, refresh_time - elapsed))
+
+    def refresh_until(self, condition, timeout=60, first_interval=1, max_interval=10, settle=2, probe_url=None,
+                      probe_check=None):
+        """
+        Reload the page until a condition holds and stop as soon as it does.
+        Reloads start first_interval apart and back off up to max_interval, so content that shows up quickly is seen
+        quickly and a slow backend is not hammered. With probe_url, the backend is polled with fetch() inside the
+        page and the page is reloaded only once the probe passes.
+        :param condition: locator tuple of an element to wait for or callable taking the driver
+        :param float timeout: Maximum time in seconds
+        :param float first_interval: Seconds between the first reloads
+        :param float max_interval: Upper bound of seconds between reloads
+        :param float settle: Seconds a locator may take to appear after a reload
+        :param str probe_url: URL requested with the page's cookies to check server state without reloading
+        :param probe_check: Callable taking the probe response dict with "status", "ok" and "text", defaults to ok
+        :return: PollStats of the reloads
+        :raises TimeoutException: Condition did not hold in time
+
+        """
+        start_time = time.monotonic()
+        if probe_url:
+            probe, probe_stats = Poller(timeout, first_interval=first_interval, max_interval=max_interval).poll(
+                lambda: (probe_check or (lambda response: response["ok"]))(self.fetch_probe(probe_url)))
+            if not probe:
+                raise TimeoutException("refresh_until: Probe of {} did not pass after {} seconds"
+                                       .format(probe_url, timeout))
+            logging.info("Probe of {} passed after {} requests".format(probe_url, probe_stats.attempts))
+        attempts = []
+
+        def check():
+            # A passed probe means the page shown is stale, so the first check reloads already
+            reload = bool(attempts or probe_url)
+            if reload:
+                self.driver.refresh()
+                self.element_cache.invalidate()
+                self.page_readiness.wait()
+            attempts.append(None)
+            return self._refresh_condition(condition, settle if reload else 0)
+
+        remaining = max(0, timeout - (time.monotonic() - start_time))
+        matched, stats = Poller(remaining, first_interval=first_interval, max_interval=max_interval).poll(check)
+        Base.last_wait_stats = stats
+        reload_count = len(attempts) if probe_url else len(attempts) - 1
+        if not matched:
+            raise TimeoutException("refresh_until: {} not met after {} reloads in {} seconds"
+                                   .format(condition, reload_count, timeout))
+        logging.info("Condition {} met after {} reloads in {:.2f} seconds".format(
+            condition, reload_count, time.monotonic() - start_time))
+        return stats
+
+    def _refresh_condition(self, condition, settle):
+        if callable(condition):
+            return condition(self.driver)
+        if not settle:
+            return self.is_element_present(condition)
+        try:
+            self.wait_engine.until(ec.presence_of_element_located, condition, settle)
+        except TimeoutException:
+            return False
+        return True
+
+    def fetch_probe(self, url, timeout=10):
+        """
+        Request a URL from inside the page, with its cookies, without navigating
+        :param str url: URL to request, relative URLs resolve against the page
+        :param float timeout: Seconds the request may take
+        :return: Dict with "status", "ok" and "text", status 0 when the request failed
+        :rtype: dict
+
+        """
+        ensure_script_timeout(self.driver, timeout)
+        return self.driver.execute_async_script(FETCH_PROBE_JS, url, int(timeout * 1000))
 
     def refresh(self):
         """
@@ -68,7 +184,8 @@ class Base(object):
 
         """
         self.driver.refresh()
-        time.sleep(3)
+        self.element_cache.invalidate()
+        self.page_readiness.wait_logged("refresh", replaced_sleep=3)
         logging.info("The current browser location was refreshed")
 
     def get_browser_title(self):
@@ -103,31 +220,103 @@ class Base(object):
 
     def filter_network_request(self):
         """
-        Filters request in network
+        Filters request in network, draining the performance log.
+        Returns Network.requestWillBeSent and Network.requestWillBeSentExtraInfo messages, matched by substring as
+        before, including the ones network_capture queries such as the network idle wait read since the last call.
+        Responses of the drained entries stay queryable on network_capture.
+
+        """
+        return [message for message in self.network_capture.messages()
+                if "Network.requestWillBeSent" in message["method"]]
+
+    @property
+    def element_cache(self):
+        """
+        Element cache shared by all page objects of the driver
+        :rtype: ElementCache
+
+        """
+        return ElementCache.for_driver(self.driver)
+
+    @property
+    def device_emulation(self):
+        """
+        Device emulation of the driver, shared by every page object
+        :rtype: DeviceEmulation
+
+        """
+        return DeviceEmulation.for_driver(self.driver)
+
+    def emulate_device(self, device):
+        """
+        Switch the browser to a device in place, e.g. emulate_device("Nexus 5"), without starting another browser.
+        Pooled drivers go back to the desktop when they are reset after the test.
+        :param device: DeviceProfile or the name of a device registered in device_emulation.DEVICES
+        :rtype: DeviceProfile
+
+        """
+        device = self.device_emulation.apply(device)
+        self.element_cache.invalidate()
+        return device
+
+    def restore_device(self):
+        """
+        Stop emulating a device
+
+        """
+        self.device_emulation.restore()
+        self.element_cache.invalidate()
+
+    @property
+    def network_interceptor(self):
+        """
+        Request blocking and stubbing of the driver, shared by every page object
+        :rtype: NetworkInterceptor
+
+        """
+        return NetworkInterceptor.for_driver(self.driver)
+
+    @property
+    def network_capture(self):
+        """
+        Network capture shared by all page objects of the driver
+        :rtype: NetworkCapture
 
         """
-        browser_log = self.driver.get_log('performance')
-        events = [self.process_browser_request_entry(entry) for entry in browser_log]
-        events = [event for event in events if 'Network.requestWillBeSent' in event['method']]
-        return events
+        return NetworkCapture.for_driver(self.driver)
 
     def navigate_url(self, url):
         """
         Browse current window to requested url.
+        When the application rejects the session of session_store, logs in again and reloads the url once.
         :param str url: Requested URL of the site to be redirected
 
         """
         self.driver.get(url)
+        self.element_cache.invalidate()
+        self.page_readiness.wait_logged("navigate_url")
+        if self.session_store is not None and not self.session_store.verify(self.driver):
+            self.session_store.ensure(self.driver)
+            self.driver.get(url)
+            self.element_cache.invalidate()
+            self.page_readiness.wait_logged("navigate_url")
 
     def navigate_browser_back(self, additional_wait=0):
 
         """
         Go one pages back
-        :param additional_wait: Additional wait time before getting back (in seconds)
+        :param additional_wait: Maximum time to wait for the current page to be ready before getting back (in seconds)
 
         """
-        time.sleep(additional_wait)
+        if additional_wait:
+            try:
+                self.page_readiness.wait_logged("navigate_browser_back", replaced_sleep=additional_wait,
+                                                timeout=additional_wait)
+            except TimeoutException:
+                pass
         self.driver.back()
+        self.element_cache.invalidate()
+        self.page_readiness.wait_logged("navigate_browser_back")
 
     def navigate_browser_forward(self):
         """
@@ -135,6 +324,8 @@ class Base(object):
 
         """
         self.driver.forward()
+        self.element_cache.invalidate()
+        self.page_readiness.wait_logged("navigate_browser_forward")
 
     def quit_driver(self):
         """
@@ -143,6 +334,7 @@ class Base(object):
         """
         if self.driver is not None and self.is_browser_reachable():
             self.driver.quit()
+            remove_user_data_dir(self.driver)
 
     def is_browser_reachable(self):
         try:
@@ -150,16 +342,20 @@ class Base(object):
         except:
             return False
 
-    def clear_browser_data(self):
+    def clear_browser_data(self, origins=None):
         """
-        Clears browsing history, cookies and other site data, cached images and files
+        Clears cookies, cached images and files, local storage, sessionStorage and back/forward history of the current
+        tab, IndexedDB, service workers and other site data.
+        The browsing history of the profile (chrome://history) is not cleared, use a throwaway profile, see
+        browser_profiles, when tests depend on it.
+        :param origins: Only clear data of these origins, e.g. ["https://example.com"], cache is cleared in any case
 
         """
-        self.navigate_url('chrome://settings/clearBrowserData')
-        time.sleep(2)
-        actions = ActionChains(self.driver)
-        actions.send_keys(Keys.TAB * 7).send_keys(Keys.ENTER).perform()
-        time.sleep(2)
+        if supports_cdp(self.driver):
+            reset_browser_state(self.driver, origins=origins, history=True)
+            self.driver.execute_script("try { window.sessionStorage.clear(); } catch (e) {}")
+        else:
+            reset_page_storage(self.driver)
 
     def is_element_present(self, locator):
         """
@@ -167,10 +363,17 @@ class Base(object):
         :param locator: locator of the element to find
 
         """
+        if self.element_cache.snapshot is not None:
+            try:
+                return self.element_cache.snapshot.is_present(locator)
+            except UnsupportedLocator:
+                pass
+        # Presence is always asked fresh, a cached element may have been removed or replaced since it was found
         try:
-            self.driver.find_element(*locator)
+            element = self.driver.find_element(*locator)
         except (NoSuchElementException, StaleElementReferenceException):
             return False
+        self.element_cache.put(locator, WrapWebElement(self.driver, element, locator))
         return True
 
     def is_element_clickable(self, locator):
@@ -192,6 +395,16 @@ class Base(object):
         :param locator: locator of the element to find
 
         """
+        if self.element_cache.snapshot is not None:
+            try:
+                return self.element_cache.snapshot.is_visible(locator)
+            except UnsupportedLocator:
+                # Answered by the browser at once, like the snapshot would
+                elements = self.driver.find_elements(*locator)
+                try:
+                    return bool(elements) and elements[0].is_displayed()
+                except StaleElementReferenceException:
+                    return False
         try:
             self.wait_for_element_visible(locator, timeout=30)
         except (NoSuchElementException, StaleElementReferenceException, ElementNotInteractableException,
@@ -199,6 +412,50 @@ class Base(object):
             return False
         return True
 
+    def is_element_absent(self, locator, grace=0, quiet=0.3, frames=3, timeout=5):
+        """
+        Return True if element is not in the page and stays away, without waiting for a full timeout.
+        Decided in the browser: missing for some animation frames after the DOM settled, see WaitEngine.until_absent
+        :param locator: locator of the element to check
+        :param float grace: Seconds the element is given to show up after the last action
+        :param float quiet: Seconds without DOM changes needed to trust the absence
+        :param int frames: Consecutive animation frames the element must be missing
+        :param float timeout: Upper bound of the check in seconds
+
+        """
+        return self._check_absence(locator, "absent", "check", grace, quiet, frames, timeout).absent
+
+    def is_element_hidden(self, locator, grace=0, quiet=0.3, frames=3, timeout=5):
+        """
+        Return True if no element of the locator is visible and that stays so, see is_element_absent
+        :param locator: locator of the element to check
+
+        """
+        return self._check_absence(locator, "hidden", "check", grace, quiet, frames, timeout).absent
+
+    def wait_for_element_absent(self, locator, timeout=20, hidden=False, quiet=0.3, frames=3):
+        """
+        Wait until element is gone, i.e. removed or with hidden set invisible, and stays away
+        :param locator: locator of the element to wait for
+        :param int timeout: Maximum time to wait in seconds
+        :param bool hidden: Invisible elements count as gone
+        :return: Report of the wait
+        :rtype: AbsenceReport
+        :raises TimeoutException: Element is still shown
+
+        """
+        report = self._check_absence(locator, "hidden" if hidden else "absent", "wait", 0, quiet, frames, timeout)
+        if not report.absent:
+            raise TimeoutException("Element {} still shown after {} seconds".format(locator, timeout))
+        return report
+
+    def _check_absence(self, locator, condition, mode, grace, quiet, frames, timeout):
+        report = self.wait_engine.until_absent(locator, condition, mode, grace, quiet, frames, timeout)
+        Base.last_absence_report = report
+        logging.info("Checked {} is {} :: {} in {:.3f} seconds, {} checks".format(
+            locator, condition, report.absent, report.elapsed, report.checks))
+        return report
+
     def get_element(self, locator):
         """
         Get element for a provided locator
@@ -207,15 +464,18 @@ class Base(object):
         :rtype: WrapWebElement
 
         """
+        cached = self.element_cache.get(locator)
+        if cached is not None:
+            return cached
         try:
             element = self.driver.find_element(*locator)
         except (NoSuchElementException, StaleElementReferenceException):
             raise Exception("There is no such element or its" + str(locator) + " has changed ")
-        return WrapWebElement(self.driver, element, locator)
+        return self.element_cache.put(locator, WrapWebElement(self.driver, element, locator))
 
     def get_element_list(self, locator, list_length=1):
         """
-        Get elements list for a provided locator
+        Get elements list for a provided locator, long or virtualized lists are better walked with iter_elements
         :param locator: locator of the element list to find
         :param int list_length: Expected count of list
         :return: List of web elements or empty list
@@ -228,24 +488,113 @@ class Base(object):
             return []
         return list(map(lambda el: WrapWebElement(self.driver, el, locator=locator), elements))
 
+    def iter_elements(self, locator, key="text", batch_size=50, root=None, scroll=True, settle=1, timeout=10):
+        """
+        Iterate over the items of a long list as they render, scrolling when the rendered ones are used up, e.g.
+            for row in self.iter_elements(rows_locator, key="attribute:data-id"):
+                if row.text == "Wanted":
+                    break
+        Works for virtualized lists: items are told apart by their key, not by their element, and memory stays
+        constant however long the list is. Use an item before asking for the next one, scrolling may recycle it.
+        :param locator: locator of the list items
+        :param str key: Field identifying an item, see iter_element_batches
+        :param int batch_size: Most items fetched per script call
+        :param root: Element to search the items in, defaults to the document
+        :param bool scroll: Scroll for more items, False iterates the rendered items only
+        :param float settle: Seconds to wait for new items after scrolling
+        :param float timeout: Seconds to wait for the first item to render
+        :rtype: generator of WrapWebElement
+
+        """
+        for records in self.iter_element_batches(locator, (), key, batch_size, root, scroll, settle, timeout):
+            for record in records:
+                yield record["element"]
+
+    def iter_element_batches(self, locator, fields=DEFAULT_FIELDS, key="text", batch_size=50, root=None,
+                             scroll=True, settle=1, timeout=10):
+        """
+        Like iter_elements, but yields each batch as snapshot records with the key, the element and the
+        requested fields, read in the same script call
+        :param fields: Names of the fields to read, see element_snapshot.snapshot_elements
+        :rtype: generator of list
+
+        """
+        for records in iter_element_batches(self.driver, locator, key=key, fields=fields, batch_size=batch_size,
+                                            root=root, scroll=scroll, settle=settle, timeout=timeout):
+            yield wrap_records(self.driver, records, locator)
+
+    def take_snapshot(self, root=None):
+        """
+        Copy the current document, or the subtree of root, with one script call and turn on snapshot mode:
+        is_element_present and is_element_visible answer from the copy without any WebDriver command until the
+        snapshot is invalidated by invalidate_snapshot, navigation or a window/frame switch
+        :param root: Web element to take the snapshot of, defaults to the whole document
+        :rtype: DomSnapshot
+
+        """
+        snapshot = DomSnapshot.capture(self.driver, getattr(root, "element", root))
+        self.element_cache.snapshot = snapshot
+        return snapshot
+
+    def invalidate_snapshot(self):
+        """
+        Leave snapshot mode, checks go to the browser again
+
+        """
+        self.element_cache.snapshot = None
+
+    @contextlib.contextmanager
+    def snapshot_mode(self, root=None):
+        """
+        Snapshot mode for a block of read only checks, e.g. in PageBase.check
+            with self.snapshot_mode() as snapshot:
+                assert self.is_element_present(logo) and snapshot.find_element(title).text == "Home"
+        :rtype: DomSnapshot
+
+        """
+        snapshot = self.take_snapshot(root)
+        try:
+            yield snapshot
+        finally:
+            if self.element_cache.snapshot is snapshot:
+                self.invalidate_snapshot()
+
+    def snapshot_elements(self, locator, fields=DEFAULT_FIELDS):
+        """
+        Read fields of many elements with one script call instead of one command per element and field,
+        e.g. snapshot_elements(rows_locator, ("text", "href", "displayed"))
+        :param locator: locator of the elements or list of elements to read
+        :param fields: Names of the fields to read, see element_snapshot.snapshot_elements
+        :return: One dict per element with the requested fields
+        :rtype: list
+
+        """
+        if isinstance(locator, tuple):
+            records = snapshot_elements(self.driver, fields, locator=locator)
+        else:
+            records = snapshot_elements(self.driver, fields, elements=locator)
+            locator = None
+        return wrap_records(self.driver, records, locator)
+
     def wait_for_element(self, locator, wait_type=ec.presence_of_element_located, timeout=20):
         """
-        Wait for element to present
+        Wait for element to present.
+        Known expected conditions are watched inside the browser with one script call, others are polled.
         :param wait_type: which condition of the element you are waiting for
         :param locator: locator of the element to find
         :param int timeout: Maximum time you want to wait for the element
         :rtype: WrapWebElement
 
         """
+        presence = wait_type is ec.presence_of_element_located
         start_time = int(round(time.time() * 1000))
         element = None
         try:
             logging.info("Waiting for maximum :: " + str(timeout) +
                          " :: seconds for element to be visible and clickable")
-            wait = WebDriverWait(self.driver, timeout,
-                                 ignored_exceptions=[NoSuchElementException, ElementNotVisibleException,
-                                                     ElementNotSelectableException])
-            element = wait.until(wait_type(locator))
+            element = self.wait_engine.until(wait_type, locator, timeout,
+                                             ignored_exceptions=[NoSuchElementException, ElementNotVisibleException,
+                                                                 ElementNotSelectableException])
             end_time = int(round(time.time() * 1000))
             duration = (end_time - start_time) / 1000.00
             logging.info("Element '"
@@ -254,7 +603,8 @@ class Base(object):
             logging.error("Element '"
                           "' not appeared on the web pages after :: " + str(timeout) + " :: seconds")
         if isinstance(element, WebElement):
-            return WrapWebElement(self.driver, element, locator)
+            element = WrapWebElement(self.driver, element, locator)
+            return self.element_cache.put(locator, element) if presence else element
         else:
             return element
 
@@ -290,25 +640,24 @@ class Base(object):
 
     def create_random_string(self, size=1):
         """
-        Create random string to use it in name generator
+        Create random string to use it in name generator, drawn from the seeded generator of the running test
         :param int size: Size of desired random string
         :return: Random string
         :rtype: string
 
         """
-        chars = string.ascii_uppercase
-        return ''.join(random.choice(chars) for _ in range(size))
+        return current_test_data().string(size)
 
     def create_random_integer(self, start=0, finish=10):
         """
-        Create random integer to use it in name generator
+        Create random integer to use it in name generator, drawn from the seeded generator of the running test
         :param int start: Starting point for interval
         :param int finish: Endpoint for interval
         :return: Random integer between given interval
         :rtype: int
 
         """
-        return randint(start, finish)
+        return current_test_data().integer(start, finish)
 
     def erase_text(self, locator, click=None, clear=None, backspace=None):
         """
@@ -330,28 +679,30 @@ class Base(object):
             element.clear()
 
         if backspace:
-            actions = ActionChains(self.driver)
-            actions.send_keys(Keys.END)
-            for _ in range(backspace):
-                actions.send_keys(Keys.BACKSPACE)
-            actions.perform()
+            with gesture(self.driver) as actions:
+                actions.send_keys(Keys.END)
+                for _ in range(backspace):
+                    actions.send_keys(Keys.BACKSPACE)
 
     @staticmethod
-    def wait_until(function, params=None, equals=None, not_equals=None, timeout=None, interval=None, list_check=None):
+    def wait_until(function, params=None, equals=None, not_equals=None, timeout=None, interval=None, list_check=None,
+                   abort=None):
         """
         Checked to wait until the specified timeout time of the specified function.
+        Retries back off exponentially from a few milliseconds up to interval and never sleep past the timeout.
         :param function: Function name to wait
         :param params: Function name to parameters
         :param equals: Wait until match value with equals parameter
         :param not_equals: Wait until match value with not equals parameter
         :param timeout: Time to wait
-        :param interval: Interval seconds to retry
+        :param interval: Maximum interval seconds to retry
         :param list_check: Use true if you are waiting list
-        :return: Function value, if is timeout finish returns False
+        :param abort: Optional callable taking the last function value, stops waiting when it returns True
+        :return: Function value, if is timeout finish or aborted returns False
         """
-        end = time.time() + timeout
+        last = []
 
-        while time.time() < end:
+        def check():
             if isinstance(params, tuple):
                 val = function(*params)
             elif isinstance(params, list):
@@ -360,16 +711,20 @@ class Base(object):
                 val = function(**params)
             else:
                 val = function()
+            last[:] = [val]
 
             if list_check is not None and len(val) >= equals:
-                return val
+                return True
             elif equals is not None and val == equals:
-                return val
+                return True
             elif not_equals is not None and val != not_equals:
-                return val
-            else:
-                time.sleep(interval)
-        return False
+                return True
+            return False
+
+        poller = Poller(timeout, max_interval=interval or 0.5)
+        matched, stats = poller.poll(check, abort=(lambda _: abort(last[0])) if abort else None)
+        Base.last_wait_stats = stats
+        return last[0] if matched else False
 
     class SwitchFrame:
         def __init__(self, driver, element):
@@ -378,9 +733,11 @@ class Base(object):
 
         def __enter__(self):
             self.driver.switch_to.frame(self.element)
+            ElementCache.for_driver(self.driver).enter_frame(self.element)
 
         def __exit__(self, type, value, traceback):
             self.driver.switch_to.parent_frame()
+            ElementCache.for_driver(self.driver).exit_frame()
 
     def switch_frame(self, locator):
         """
@@ -439,15 +796,20 @@ class Base(object):
 
         """
         if index == "main":
-            self.driver.switch_to.window("main")
+            handle = "main"
         elif index == "first":
-            self.driver.switch_to.window(self.get_driver().window_handles[0])
+            handle = self.get_driver().window_handles[0]
         elif index == "last":
-            self.driver.switch_to.window(self.get_driver().window_handles[-1])
+            handle = self.get_driver().window_handles[-1]
         elif type(index) == int:
-            self.driver.switch_to.window(self.get_driver().window_handles[index])
+            handle = self.get_driver().window_handles[index]
         else:
             raise Exception("switch_window: Invalid index: {}".format(index))
+        self.driver.switch_to.window(handle)
+        self.element_cache.switch_window(handle)
+        emulation = DeviceEmulation.for_driver(self.driver, create=False)
+        if emulation is not None:
+            emulation.follow_window()
 
     def open_new_tab(self):
         """
@@ -457,6 +819,28 @@ class Base(object):
         self.get_driver().execute_script("window.open();")
         self.switch_window("last")
 
+    def async_page(self, executor=None):
+        """
+        Asynchronous page base on the session of this driver, to drive several tabs at once with asyncio.gather.
+        Async pages switch windows on their own, call switch_window afterwards before using this page again.
+        :param AsyncCommandExecutor executor: Executor to share between pages, a new one is created by default
+        :rtype: AsyncBase
+
+        """
+        return AsyncBase(AsyncSession.attach(self.get_driver(), executor), explicit_wait=self.wait._timeout)
+
+    def record_gestures(self):
+        """
+        Queue the gestures of all elements (click variants, hover, focus, slide, key shortcuts) and send them as one
+        actions request. Use as context manager, queued actions are also sent before any other command.
+            with page.record_gestures():
+                source.hover()
+                target.double_click()
+        :rtype: GestureRecorder
+
+        """
+        return GestureRecorder(self.get_driver())
+
     @staticmethod
     def add_months(current_date, months):
         """
@@ -466,29 +850,55 @@ class Base(object):
         :return: Future datetime
 
         """
-        month = current_date.month - 1 + months
-        year = int(current_date.year + month / 12)
-        month = month % 12 + 1
-        day = min(current_date.day, calendar.monthrange(year, month)[1])
-        return datetime.date(year, month, day)
+        return add_months(current_date, months)
+
+
+def refind_on_stale(method):
+    """
+    Retry a WrapWebElement method once with a re-found element when its element got stale and the wrapper knows
+    how to find it again, e.g. elements served by the element cache
+
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except StaleElementReferenceException:
+            if self.refind is None:
+                raise
+            self.replace_element(self.refind())
+            return method(self, *args, **kwargs)
+
+    return wrapper
 
 
 class WrapWebElement(WebElement):
     """
     This class defines the generic interceptor for the methods of wrapped web element references.It also provides
-    implementations for methods that acquire web element references
+    implementations for methods that acquire web element references.
+    Methods and properties of WebElement which are not overridden here are delegated to the wrapped element by
+    members generated once at import time, see _add_delegates.
 
     """
-    element = None
-    driver = None
-    locator = None
+    __slots__ = ("element", "driver", "locator", "refind")
 
     def __init__(self, driver, element, locator=None):
         super().__init__(element.parent, element._id)
         self.element = element
         self.driver = driver
         self.locator = locator
+        self.refind = None
+
+    def replace_element(self, element):
+        """
+        Point the wrapper to a new element, e.g. after the old one got stale
+        :param element: WebElement instance
+
+        """
+        self.element = element
+        self._id = element._id
 
+    @refind_on_stale
     def find_element(self, *locator):
         """
         Find an element given a By strategy and locator.
@@ -504,6 +914,7 @@ class WrapWebElement(WebElement):
             used_locator = locator
         return WrapWebElement(self.driver, element, locator=used_locator)
 
+    @refind_on_stale
     def find_elements(self, *locator):
         """
         Find elements given locator.
@@ -519,6 +930,21 @@ class WrapWebElement(WebElement):
             used_locator = locator
         return list(map(lambda el: WrapWebElement(self.driver, el, locator=used_locator), elements))
 
+    @refind_on_stale
+    def snapshot_elements(self, *locator, fields=DEFAULT_FIELDS):
+        """
+        Read fields of the elements found inside this element with one script call
+        :param locator: locator of the elements to read
+        :param fields: Names of the fields to read, see element_snapshot.snapshot_elements
+        :return: One dict per element with the requested fields
+        :rtype: list
+
+        """
+        used_locator = locator[0] if isinstance(locator[0], tuple) else locator
+        records = snapshot_elements(self.driver, fields, locator=used_locator, root=self.element)
+        return wrap_records(self.driver, records, used_locator)
+
+    @refind_on_stale
     def wait_visible(self, timeout=20):
         """
         Wait for element to be visible
@@ -527,10 +953,11 @@ class WrapWebElement(WebElement):
         :rtype: WrapWebElement
 
         """
-        wait = WebDriverWait(self.driver, timeout)
-        wait.until(lambda _: self.element.is_displayed(), "{} element not visible".format(str(self.locator)))
+        WaitEngine(self.driver).until_element(self.element, "visible", timeout,
+                                              "{} element not visible".format(str(self.locator)))
         return self
 
+    @refind_on_stale
     def wait_enable(self, timeout=20):
         """
         Wait for element to be enable
@@ -539,10 +966,11 @@ class WrapWebElement(WebElement):
         :rtype: WrapWebElement
 
         """
-        wait = WebDriverWait(self.driver, timeout)
-        wait.until(lambda _: self.element.is_enabled(), "{} element not enable".format(str(self.locator)))
+        WaitEngine(self.driver).until_element(self.element, "enabled", timeout,
+                                              "{} element not enable".format(str(self.locator)))
         return self
 
+    @refind_on_stale
     def wait_clickable(self, timeout=20):
         """
         Wait for element to be clickable
@@ -551,10 +979,11 @@ class WrapWebElement(WebElement):
         :rtype: WrapWebElement
 
         """
-        self.wait_visible(timeout=timeout)
-        self.wait_enable(timeout=timeout)
+        WaitEngine(self.driver).until_element(self.element, "clickable", timeout,
+                                              "{} element not clickable".format(str(self.locator)))
         return self
 
+    @refind_on_stale
     def click(self, delay=0):
         """
         Clicks the web element.
@@ -568,6 +997,7 @@ class WrapWebElement(WebElement):
         self.element.click()
         return self
 
+    @refind_on_stale
     def js_click(self):
         """
         Clicks given element with execute script
@@ -576,26 +1006,29 @@ class WrapWebElement(WebElement):
         self.driver.execute_script("arguments[0].click();", self.element)
         return self
 
+    @refind_on_stale
     def double_click(self):
         """
         Double-clicks an element.
         :rtype: WrapWebElement
 
         """
-        actions = ActionChains(self.driver)
-        actions.double_click(self.element).perform()
+        with gesture(self.driver) as actions:
+            actions.double_click(self.element)
         return self
 
+    @refind_on_stale
     def right_click(self):
         """
         Right clicks an element.
         :rtype: WrapWebElement
 
         """
-        actions = ActionChains(self.driver)
-        actions.context_click(self.element).perform()
+        with gesture(self.driver) as actions:
+            actions.context_click(self.element)
         return self
 
+    @refind_on_stale
     def offset_click(self, x_offset, y_offset):
         """
          Function provides relative offset shifting
@@ -603,12 +1036,12 @@ class WrapWebElement(WebElement):
         :param y_offset: vertical offset
 
         """
-        action = ActionChains(self.driver)
-        action.move_to_element_with_offset(self.element, x_offset, y_offset)
-        action.click()
-        action.perform()
+        with gesture(self.driver) as action:
+            action.move_to_element_with_offset(self.element, x_offset, y_offset)
+            action.click()
         return self
 
+    @refind_on_stale
     def slide(self, x_offset, y_offset):
         """
         Slides an element by offsets
@@ -616,33 +1049,34 @@ class WrapWebElement(WebElement):
         :param y_offset: vertical offset
 
         """
-        action = ActionChains(self.driver)
-        action.click_and_hold(self.element)
-        action.move_by_offset(x_offset, y_offset)
-        action.release()
-        action.perform()
+        with gesture(self.driver) as action:
+            action.click_and_hold(self.element)
+            action.move_by_offset(x_offset, y_offset)
+            action.release()
         return self
 
+    @refind_on_stale
     def focus(self):
         """
         Focus on an an element.
         :rtype: WrapWebElement
 
         """
-        actions = ActionChains(self.driver)
-        actions.move_to_element(self.element).perform()
-        self.click()
+        with gesture(self.driver) as actions:
+            actions.move_to_element(self.element).click()
         return self
 
+    @refind_on_stale
     def hover(self):
         """
         Hover to an element
 
         """
-        actions = ActionChains(self.driver)
-        actions.move_to_element(self.element).perform()
+        with gesture(self.driver) as actions:
+            actions.move_to_element(self.element)
         return self
 
+    @refind_on_stale
     def scroll(self, center=False):
         """
         Scrolls to an element
@@ -655,18 +1089,28 @@ class WrapWebElement(WebElement):
             self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", self.element)
         return self
 
+    @refind_on_stale
     def send_keys(self, value, delay=0):
         """
         Sends keys to current focused element.
+        With delay, the first character focuses the element and the rest is typed by the driver as key actions,
+        which go to whatever element has focus. When focus already left the element after the first character, e.g.
+        on auto-advancing OTP inputs, the rest is sent to the element one character at a time instead. Focus moving
+        on later in the text is not noticed, so type such fields per field.
         :param str value: A string for typing
         :param float delay: Requested wait time between typing each character
         :rtype: WrapWebElement
 
         """
-        if delay:
-            for char in list(value):
-                self.element.send_keys(char)
-                time.sleep(delay)
+        if delay and len(value) > 1:
+            self.element.send_keys(value[0])
+            if self.driver.execute_script("return document.activeElement === arguments[0];", self.element):
+                for actions in typing_actions(value[1:], delay):
+                    self.driver.execute(Command.W3C_ACTIONS, {"actions": actions})
+            else:
+                for char in value[1:]:
+                    time.sleep(delay)
+                    self.element.send_keys(char)
         else:
             self.element.send_keys(value)
         return self
@@ -679,9 +1123,8 @@ class WrapWebElement(WebElement):
            'Keys' class.
 
         """
-        actions = ActionChains(self.driver)
-        actions.send_keys(*keys_to_send)
-        actions.perform()
+        with gesture(self.driver) as actions:
+            actions.send_keys(*keys_to_send)
 
     def control_shortcuts(self, char):
         """
@@ -689,35 +1132,120 @@ class WrapWebElement(WebElement):
         :param str char:  Give one of the shortcut letters
 
         """
-        actions = ActionChains(self.driver)
-        actions.key_down(Keys.CONTROL)
-        actions.key_down(char)
-        actions.key_up(char)
-        actions.key_up(Keys.CONTROL)
-        actions.perform()
+        with gesture(self.driver) as actions:
+            actions.key_down(Keys.CONTROL)
+            actions.key_down(char)
+            actions.key_up(char)
+            actions.key_up(Keys.CONTROL)
 
-    def __getattribute__(self, attribute):
+    def __getattr__(self, attribute):
         """
-        Return getattr(self, name).
+        Fallback for attributes that exist only on the wrapped element instance.
         :param str attribute: Attribute of the element
         :return: value of attribute
 
         """
-        if attribute not in list(WrapWebElement.__dict__):
-            returning_value = object.__getattribute__(self.element, attribute)
-        else:
-            returning_value = object.__getattribute__(self, attribute)
-
-        @wraps(WebElement)
-        def wrapper(*args, **kwargs):
-            value = returning_value(*args, **kwargs)
-            if (isinstance(value, WebElement) or attribute in (
-                    "submit", "clear")) and attribute != 'find_element':
-                return self
-            else:
+        if attribute in WrapWebElement.__slots__:
+            raise AttributeError(attribute)
+        return getattr(self.element, attribute)
+
+
+def wrap_records(driver, records, locator=None):
+    """
+    Wrap web elements of snapshot records
+    :param driver: WebDriver instance
+    :param list records: Records returned by snapshot_elements
+    :param tuple locator: locator the elements were found with
+    :rtype: list
+
+    """
+    for record in records:
+        if "element" in record:
+            record["element"] = WrapWebElement(driver, record["element"], locator=locator)
+    return records
+
+
+# Longest pause time of one actions request, longer texts are split so requests stay below the HTTP timeout
+TYPING_CHUNK_SECONDS = 30
+
+
+def typing_actions(text, delay):
+    """
+    W3C actions that type a text with a pause before every character.
+    The pauses run in the driver, so key handlers see the same timing as with one send_keys call per character.
+    :param str text: Text to type
+    :param float delay: Seconds between characters
+    :return: Actions payloads, one per request
+    :rtype: list
+
+    """
+    pause = {"type": "pause", "duration": int(delay * 1000)}
+    per_chunk = max(1, int(TYPING_CHUNK_SECONDS / delay))
+    chunks = []
+    for start in range(0, len(text), per_chunk):
+        keys = []
+        for char in text[start:start + per_chunk]:
+            keys.extend((pause, {"type": "keyDown", "value": char}, {"type": "keyUp", "value": char}))
+        chunks.append([{"type": "key", "id": "castapp-keyboard", "actions": keys}])
+    return chunks
+
+
+# Delegated methods that return the wrapper instead of their own result
+RETURNS_SELF = frozenset(("submit", "clear"))
+# Result types that can not be a WebElement, checked before the slower abstract class isinstance
+PLAIN_TYPES = frozenset((bool, str, int, float, dict, list, type(None)))
+
+
+def _delegate_method(name):
+    if name in RETURNS_SELF:
+        def delegate(self, *args, **kwargs):
+            getattr(self.element, name)(*args, **kwargs)
+            return self
+    else:
+        def delegate(self, *args, **kwargs):
+            value = getattr(self.element, name)(*args, **kwargs)
+            if type(value) in PLAIN_TYPES or not isinstance(value, WebElement):
                 return value
+            return self
+
+    if not name.startswith("_"):
+        delegate = refind_on_stale(delegate)
+
+    delegate.__name__ = delegate.__qualname__ = name
+    delegate.__doc__ = getattr(WebElement, name).__doc__
+    return delegate
+
 
-        if callable(returning_value):
-            return wrapper
+def _delegate_property(name):
+    @refind_on_stale
+    def getter(self):
+        return getattr(self.element, name)
+
+    return property(getter, doc=getattr(WebElement, name).__doc__)
+
+
+def _add_delegates(cls):
+    """
+    Generate class level delegating members for every public and private WebElement member that the wrapper
+    does not override, so attribute access on a wrapper is a plain class lookup.
+    :param cls: Wrapper class
+    :return: Frozen dispatch table of delegated member names
+    :rtype: frozenset
+
+    """
+    delegated = []
+    for name in dir(WebElement):
+        if name.startswith("__") or name in cls.__dict__:
+            continue
+        member = inspect.getattr_static(WebElement, name)
+        if isinstance(member, property):
+            setattr(cls, name, _delegate_property(name))
+        elif callable(member) and not isinstance(member, (staticmethod, classmethod)):
+            setattr(cls, name, _delegate_method(name))
         else:
-            return returning_value
+            continue
+        delegated.append(name)
+    return frozenset(delegated)
+
+
+WrapWebElement.DELEGATED = _add_delegates(WrapWebElement)
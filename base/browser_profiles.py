@@ -0,0 +1,213 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+
+from selenium import webdriver
+
+# Switches that turn off browser work no test looks at
+TRIMMED_ARGUMENTS = ("--disable-gpu", "--disable-extensions", "--disable-background-networking",
+                     "--disable-component-update", "--disable-default-apps", "--disable-sync",
+                     "--disable-dev-shm-usage", "--no-first-run", "--no-default-browser-check", "--mute-audio",
+                     "--metrics-recording-only", "--password-store=basic")
+# Files that bind a user data dir to a running browser, they must not be copied from the template
+TEMPLATE_LOCKS = ("SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile")
+
+
+class BrowserProfile(object):
+    """
+    Named set of browser options a driver factory starts Chrome with
+
+    """
+
+    def __init__(self, name, headless=False, window_size=None, mobile_emulation=None, images=True, trimmed=False,
+                 network_conditions=None, template=False, arguments=()):
+        """
+        Inits profile
+        :param str name: Name of the profile in PROFILES
+        :param bool headless: Start without a window
+        :param tuple window_size: Fixed viewport as (width, height), None maximizes the window
+        :param dict mobile_emulation: chromedriver mobileEmulation option, e.g. {"deviceName": "Nexus 5"}
+        :param bool images: Load images, turning it off saves decoding time and memory per page
+        :param bool trimmed: Turn off GPU, extensions, background networking and other idle browser work
+        :param dict network_conditions: Throttling passed to driver.set_network_conditions
+        :param bool template: Start from a copy of a pre-warmed user data dir instead of an empty one
+        :param arguments: Additional command line switches
+
+        """
+        self.name = name
+        self.headless = headless
+        self.window_size = window_size
+        self.mobile_emulation = mobile_emulation
+        self.images = images
+        self.trimmed = trimmed
+        self.network_conditions = network_conditions
+        self.template = template
+        self.arguments = tuple(arguments)
+
+    def options(self, user_data_dir=None):
+        """
+        Chrome options of the profile
+        :param str user_data_dir: User data dir to start with
+        :rtype: ChromeOptions
+
+        """
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument("--headless=new")
+        if self.window_size:
+            options.add_argument("--window-size={},{}".format(*self.window_size))
+        if self.trimmed:
+            for argument in TRIMMED_ARGUMENTS:
+                options.add_argument(argument)
+        if not self.images:
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+        if self.mobile_emulation:
+            options.add_experimental_option("mobileEmulation", self.mobile_emulation)
+        if user_data_dir:
+            options.add_argument("--user-data-dir={}".format(user_data_dir))
+        for argument in self.arguments:
+            options.add_argument(argument)
+        return options
+
+    def create_driver(self):
+        """
+        Start Chrome with the profile
+        :return: WebDriver instance
+
+        """
+        start_time = time.monotonic()
+        user_data_dir = copy_template(self) if self.template else None
+        driver = webdriver.Chrome(options=self.options(user_data_dir))
+        if user_data_dir:
+            # Not run at exit: exit hooks may run before close_pools quits the browser still using the dir
+            _user_data_dirs[driver] = weakref.finalize(driver, shutil.rmtree, user_data_dir, ignore_errors=True)
+            _user_data_dirs[driver].atexit = False
+        if self.window_size is None and not self.mobile_emulation:
+            driver.maximize_window()
+        if self.network_conditions:
+            driver.set_network_conditions(**self.network_conditions)
+        logging.info("Started browser with profile {} in {:.2f} seconds".format(self.name,
+                                                                                time.monotonic() - start_time))
+        return driver
+
+
+PROFILES = {}
+# Cleanup of the copied user data dir of every driver started from a template
+_user_data_dirs = weakref.WeakKeyDictionary()
+
+
+def register_profile(profile):
+    """
+    Add a profile to the registry, replacing one with the same name
+    :param BrowserProfile profile: Profile to add
+    :rtype: BrowserProfile
+
+    """
+    PROFILES[profile.name] = profile
+    return profile
+
+
+def get_profile(name):
+    """
+    Get a registered profile
+    :param str name: Name of the profile
+    :rtype: BrowserProfile
+
+    """
+    if name not in PROFILES:
+        raise Exception("get_profile: Unknown browser profile: {}, available: {}".format(name, ", ".join(PROFILES)))
+    return PROFILES[name]
+
+
+def create_driver(name):
+    """
+    Start Chrome with a registered profile
+    :param str name: Name of the profile
+    :return: WebDriver instance
+
+    """
+    return get_profile(name).create_driver()
+
+
+NEXUS_5 = {"deviceName": "Nexus 5"}
+
+register_profile(BrowserProfile("default"))
+register_profile(BrowserProfile("mobile", mobile_emulation=NEXUS_5))
+register_profile(BrowserProfile("fast-headless", headless=True, window_size=(1366, 768), images=False, trimmed=True,
+                                template=True))
+register_profile(BrowserProfile("mobile-emulated", headless=True, mobile_emulation=NEXUS_5, images=False,
+                                trimmed=True, template=True))
+# Fast 3G like link, as in the DevTools throttling presets
+register_profile(BrowserProfile("network-throttled", headless=True, window_size=(1366, 768), trimmed=True,
+                                template=True, network_conditions={"offline": False, "latency": 150,
+                                                                   "download_throughput": 1600 * 1024 // 8,
+                                                                   "upload_throughput": 750 * 1024 // 8}))
+
+_template_lock = threading.Lock()
+
+
+def remove_user_data_dir(driver):
+    """
+    Delete the user data dir copied for a driver, call after the driver quit. Without a call the dir is deleted
+    when the driver is garbage collected.
+    :param driver: WebDriver instance
+
+    """
+    cleanup = _user_data_dirs.pop(driver, None)
+    if cleanup is not None:
+        cleanup()
+
+
+def template_directory(profile):
+    """
+    Pre-warmed user data dir of a profile, shared by all workers of the machine
+    :rtype: str
+
+    """
+    root = os.environ.get("CASTAPP_PROFILE_CACHE") or os.path.join(tempfile.gettempdir(), "castapp-profiles")
+    return os.path.join(root, profile.name)
+
+
+def build_template(profile):
+    """
+    Create the pre-warmed user data dir of a profile once: Chrome is started on an empty dir and quit, so first run
+    setup is done before tests copy it. Concurrent workers build into own dirs and the first rename wins.
+    :return: Template directory
+    :rtype: str
+
+    """
+    target = template_directory(profile)
+    with _template_lock:
+        if os.path.isdir(target):
+            return target
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        building = tempfile.mkdtemp(prefix=profile.name + "-", dir=os.path.dirname(target))
+        driver = webdriver.Chrome(options=profile.options(building))
+        try:
+            driver.get("about:blank")
+        finally:
+            driver.quit()
+        try:
+            os.rename(building, target)
+        except OSError:
+            shutil.rmtree(building, ignore_errors=True)
+        return target
+
+
+def copy_template(profile):
+    """
+    Copy the pre-warmed user data dir of a profile for one browser
+    :return: User data dir to start the browser with, removed when the driver is garbage collected
+    :rtype: str
+
+    """
+    template = build_template(profile)
+    user_data_dir = tempfile.mkdtemp(prefix="castapp-{}-".format(profile.name))
+    shutil.copytree(template, user_data_dir, symlinks=True, dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns(*TEMPLATE_LOCKS))
+    return user_data_dir
@@ -0,0 +1,106 @@
+import logging
+import time
+from urllib.parse import urlsplit
+
+# Storage types of Storage.clearDataForOrigin
+ALL_STORAGE_TYPES = ("cookies", "local_storage", "indexeddb", "websql", "service_workers", "cache_storage",
+                     "file_systems", "shader_cache")
+
+# Browser names of Chromium based browsers, which accept DevTools Protocol commands
+CDP_BROWSERS = frozenset(("chrome", "chromium", "chrome-headless-shell", "msedge", "microsoftedge"))
+
+
+def supports_cdp(driver):
+    """
+    Check whether Chrome DevTools Protocol commands can be sent through the driver
+    :param driver: WebDriver instance
+    :rtype: bool
+
+    """
+    capabilities = getattr(driver, "capabilities", None) or {}
+    return hasattr(driver, "execute_cdp_cmd") and capabilities.get("browserName", "").lower() in CDP_BROWSERS
+
+
+def frame_origins(driver):
+    """
+    Get security origins of the current page and its frames
+    :param driver: WebDriver instance
+    :return: Origins with a scheme that can hold data
+    :rtype: set
+
+    """
+    origins = set()
+    frames = [driver.execute_cdp_cmd("Page.getFrameTree", {})["frameTree"]]
+    while frames:
+        node = frames.pop()
+        origin = node["frame"].get("securityOrigin", "")
+        if origin.startswith(("http://", "https://")):
+            origins.add(origin)
+        frames.extend(node.get("childFrames", []))
+    return origins
+
+
+def visited_origins(driver):
+    """
+    Get origins the current tab holds data of: the ones in its navigation history and in its current frames
+    :param driver: WebDriver instance of a Chromium based browser
+    :rtype: set
+
+    """
+    origins = frame_origins(driver)
+    for entry in driver.execute_cdp_cmd("Page.getNavigationHistory", {})["entries"]:
+        url = urlsplit(entry["url"])
+        if url.scheme in ("http", "https") and url.netloc:
+            origins.add("{}://{}".format(url.scheme, url.netloc))
+    return origins
+
+
+def reset_browser_state(driver, origins=None, cache=True, storage_types=ALL_STORAGE_TYPES, known_origins=(),
+                        history=False):
+    """
+    Clear cookies, cache, local storage, IndexedDB, service workers and other site data through DevTools Protocol.
+    Works headless and does not need any page to be opened. sessionStorage is per tab and not cleared, close the tab
+    for that, as reset_session does.
+    :param driver: WebDriver instance of a Chromium based browser
+    :param origins: Origins to clear, e.g. ["https://example.com"]. None clears all cookies and the data of the
+        origins visited in the current tab, see visited_origins
+    :param bool cache: Also clear the HTTP cache, which is shared by all origins
+    :param storage_types: Storage types to clear per origin
+    :param known_origins: Origins cleared as well when origins is None, e.g. visited in tabs closed already
+    :param bool history: Also clear the back and forward history of the current tab. The browsing history of the
+        profile has no DevTools command, it is not cleared.
+    :return: Seconds the reset took
+    :rtype: float
+
+    """
+    start_time = time.monotonic()
+    if cache:
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+    if origins is None:
+        if "cookies" in storage_types:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        origins = visited_origins(driver) | set(known_origins)
+    elif "cookies" in storage_types:
+        cookies = driver.execute_cdp_cmd("Network.getCookies", {"urls": list(origins)})["cookies"]
+        for cookie in cookies:
+            driver.execute_cdp_cmd("Network.deleteCookies", {"name": cookie["name"], "domain": cookie["domain"],
+                                                             "path": cookie["path"]})
+    for origin in origins:
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin,
+                                                              "storageTypes": ",".join(storage_types)})
+    if history:
+        # After visited_origins, which reads the history
+        driver.execute_cdp_cmd("Page.resetNavigationHistory", {})
+    elapsed = time.monotonic() - start_time
+    logging.info("Browser state reset for origins {} in :: {:.3f} :: seconds".format(sorted(origins), elapsed))
+    return elapsed
+
+
+def reset_page_storage(driver):
+    """
+    Fallback reset for drivers without DevTools Protocol access: cookies of the current domain and web storage
+    :param driver: WebDriver instance
+
+    """
+    driver.delete_all_cookies()
+    driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
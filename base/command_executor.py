@@ -0,0 +1,149 @@
+import atexit
+import collections
+import logging
+import threading
+import time
+
+from selenium.webdriver.remote.client_config import ClientConfig
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+from urllib3.util.retry import Retry
+
+# Methods that are sent again when the response was lost, POST commands like click are never repeated
+IDEMPOTENT_METHODS = frozenset(("GET", "DELETE"))
+
+
+class PooledRemoteConnection(RemoteConnection):
+    """
+    Command executor with a tuned keep-alive connection pool.
+    Connections to the endpoint are kept open and shared by every driver using the executor, failed connects are
+    retried for all commands and lost responses only for idempotent ones. Each request is timed for stats().
+
+    """
+
+    def __init__(self, remote_server_addr, pool_size=4, retries=2, timeout=120, latency_samples=10000):
+        """
+        Inits executor
+        :param str remote_server_addr: URL of chromedriver or the grid, e.g. http://127.0.0.1:4444
+        :param int pool_size: Connections kept open per host, size it to the parallel commands of a worker
+        :param int retries: Attempts to repeat a request after a connection error
+        :param float timeout: Seconds a single command may take
+        :param int latency_samples: Count of recent request latencies kept for percentiles
+
+        """
+        retry = Retry(total=retries, connect=retries, read=retries, status=0, redirect=False,
+                      allowed_methods=IDEMPOTENT_METHODS, backoff_factor=0.05, raise_on_status=False)
+        pool_args = {"maxsize": pool_size, "block": True, "retries": retry}
+        self.pool_size = pool_size
+        self.latencies = collections.deque(maxlen=latency_samples)
+        self.requests = 0
+        self.shared = False
+        super().__init__(client_config=ClientConfig(
+            remote_server_addr=remote_server_addr, keep_alive=True, timeout=timeout,
+            init_args_for_pool_manager={"init_args_for_pool_manager": pool_args}))
+
+    def _request(self, method, url, body=None):
+        start_time = time.perf_counter()
+        try:
+            return super()._request(method, url, body)
+        finally:
+            self.latencies.append(time.perf_counter() - start_time)
+            self.requests += 1
+
+    def attach(self, driver):
+        """
+        Send the commands of a running driver through this executor.
+        Vendor commands of the driver's own executor (e.g. Chrome's CDP commands) are kept.
+        :param driver: WebDriver instance
+        :return: Driver itself
+
+        """
+        previous = driver.command_executor
+        if previous is self:
+            return driver
+        commands = getattr(previous, "_commands", None)
+        if commands:
+            self._commands = dict(self._commands, **commands)
+        driver.command_executor = self
+        if not getattr(previous, "shared", False):
+            previous.close()
+        return driver
+
+    def close(self):
+        # Shared executors outlive the drivers that quit through them, close_executors releases them
+        if not self.shared:
+            super().close()
+
+    def connection_pools(self):
+        pools = self._conn.pools
+        return [pools[key] for key in pools.keys()]
+
+    def stats(self):
+        """
+        Connection reuse and latency of the executor
+        :return: Counts of requests, opened and reused connections and latency percentiles in milliseconds
+        :rtype: dict
+
+        """
+        opened = sum(pool.num_connections for pool in self.connection_pools())
+        samples = sorted(self.latencies)
+
+        def percentile(share):
+            if not samples:
+                return None
+            return samples[min(len(samples) - 1, int(share * len(samples)))] * 1000
+
+        return {"requests": self.requests, "opened": opened, "reused": max(0, self.requests - opened),
+                "pool_size": self.pool_size, "p50_ms": percentile(0.5), "p90_ms": percentile(0.9),
+                "p99_ms": percentile(0.99), "max_ms": samples[-1] * 1000 if samples else None}
+
+    def log_stats(self):
+        stats = self.stats()
+        if not stats["requests"]:
+            return
+        logging.info("Command executor {} :: {requests} requests, {opened} connections opened, {reused} reused, "
+                     "p50 {p50_ms:.1f} ms, p90 {p90_ms:.1f} ms, p99 {p99_ms:.1f} ms"
+                     .format(self._client_config.remote_server_addr, **stats))
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def shared_executor(remote_server_addr, **kwargs):
+    """
+    Get the executor of a URL shared in this process, it is created on first use
+    :param str remote_server_addr: URL of chromedriver or the grid
+    :param kwargs: PooledRemoteConnection arguments, used only when the executor is created
+    :rtype: PooledRemoteConnection
+
+    """
+    with _executors_lock:
+        executor = _executors.get(remote_server_addr)
+        if executor is None:
+            executor = _executors[remote_server_addr] = PooledRemoteConnection(remote_server_addr, **kwargs)
+            executor.shared = True
+        return executor
+
+
+def executor_url(driver):
+    """
+    URL of the endpoint a driver talks to
+    :rtype: str
+
+    """
+    connection = driver.command_executor
+    config = getattr(connection, "_client_config", None)
+    return config.remote_server_addr if config else connection._url
+
+
+def close_executors():
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.log_stats()
+        executor.shared = False
+        executor.close()
+
+
+atexit.register(close_executors)
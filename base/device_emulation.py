@@ -0,0 +1,203 @@
+import logging
+import weakref
+
+from base.browser_state import supports_cdp
+
+_emulations = weakref.WeakKeyDictionary()
+
+
+class DeviceProfile(object):
+    """
+    Screen, user agent and input of a device a browser can emulate
+
+    """
+
+    def __init__(self, name, width, height, device_scale_factor=1, mobile=False, touch=False, user_agent=None,
+                 platform=None, max_touch_points=5):
+        """
+        Inits device
+        :param str name: Name of the device in DEVICES
+        :param int width: Viewport width in CSS pixels
+        :param int height: Viewport height in CSS pixels
+        :param float device_scale_factor: Device pixels per CSS pixel
+        :param bool mobile: Emulate a mobile viewport: meta viewport, overlay scrollbars and text autosizing
+        :param bool touch: Emulate a touch screen
+        :param str user_agent: User agent to send, None keeps the browser's own
+        :param str platform: navigator.platform reported with the user agent
+        :param int max_touch_points: Touch points reported when touch is emulated
+
+        """
+        self.name = name
+        self.width = width
+        self.height = height
+        self.device_scale_factor = device_scale_factor
+        self.mobile = mobile
+        self.touch = touch
+        self.user_agent = user_agent
+        self.platform = platform
+        self.max_touch_points = max_touch_points
+
+    def metrics(self):
+        return {"width": self.width, "height": self.height, "deviceScaleFactor": self.device_scale_factor,
+                "mobile": self.mobile, "screenWidth": self.width, "screenHeight": self.height}
+
+    def __repr__(self):
+        return "DeviceProfile({!r}, {}x{})".format(self.name, self.width, self.height)
+
+
+DEVICES = {}
+
+
+def register_device(device):
+    """
+    Add a device to the registry, replacing one with the same name
+    :param DeviceProfile device: Device to add
+    :rtype: DeviceProfile
+
+    """
+    DEVICES[device.name] = device
+    return device
+
+
+def get_device(name):
+    """
+    Get a registered device
+    :param str name: Name of the device
+    :rtype: DeviceProfile
+
+    """
+    if name not in DEVICES:
+        raise Exception("get_device: Unknown device: {}, available: {}".format(name, ", ".join(DEVICES)))
+    return DEVICES[name]
+
+
+# Same metrics and user agents as the DevTools device toolbar presets
+register_device(DeviceProfile("Nexus 5", 360, 640, 3, mobile=True, touch=True, platform="Linux armv8l",
+                              user_agent="Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 "
+                                         "(KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36"))
+register_device(DeviceProfile("Pixel 7", 412, 915, 2.625, mobile=True, touch=True, platform="Linux armv8l",
+                              user_agent="Mozilla/5.0 (Linux; Android 13; Pixel 7) AppleWebKit/537.36 "
+                                         "(KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36"))
+register_device(DeviceProfile("iPhone 12 Pro", 390, 844, 3, mobile=True, touch=True, platform="iPhone",
+                              user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 14_7_1 like Mac OS X) "
+                                         "AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.2 Mobile/15E148 "
+                                         "Safari/604.1"))
+register_device(DeviceProfile("iPad Air", 820, 1180, 2, mobile=True, touch=True, platform="iPad",
+                              user_agent="Mozilla/5.0 (iPad; CPU OS 13_3 like Mac OS X) AppleWebKit/605.1.15 "
+                                         "(KHTML, like Gecko) CriOS/87.0.4280.77 Mobile/15E148 Safari/604.1"))
+register_device(DeviceProfile("Desktop HD", 1366, 768))
+
+
+class DeviceEmulation(object):
+    """
+    Switches the device a Chromium based browser emulates at runtime through the DevTools Protocol, so web and mobile
+    tests can share one pooled browser instead of launching one per device.
+    restore clears the overrides, so the windows report the browser's own user agent and real metrics again.
+    Overrides only hold in the window they were sent to, follow_window puts them into other windows, e.g. new tabs;
+    Base.switch_window calls it on every switch.
+
+    """
+
+    def __init__(self, driver):
+        """
+        Inits emulation
+        :param driver: WebDriver instance of a Chromium based browser
+
+        """
+        self.driver = driver
+        self.device = None
+        self.switches = 0
+        # Handles of the windows that got the overrides of the current device
+        self._windows = set()
+
+    @classmethod
+    def for_driver(cls, driver, create=True):
+        """
+        Get the emulation state shared by every page object of a driver
+        :param driver: WebDriver instance
+        :param bool create: Create the state when the driver has none yet
+        :rtype: DeviceEmulation
+
+        """
+        emulation = _emulations.get(driver)
+        if emulation is None and create:
+            emulation = _emulations[driver] = cls(driver)
+        return emulation
+
+    def apply(self, device):
+        """
+        Emulate a device, the current page adapts without reloading
+        :param device: DeviceProfile or the name of a registered one
+        :rtype: DeviceProfile
+
+        """
+        if not isinstance(device, DeviceProfile):
+            device = get_device(device)
+        if device is self.device:
+            self.follow_window()
+            return device
+        if not supports_cdp(self.driver):
+            raise Exception("DeviceEmulation: Browser {} has no DevTools Protocol"
+                            .format(self.driver.capabilities.get("browserName")))
+        self._override(device)
+        self.device = device
+        self._windows = {self.driver.current_window_handle}
+        self.switches += 1
+        logging.info("Emulating device {}".format(device.name))
+        return device
+
+    def follow_window(self):
+        """
+        Emulate the current device in the current window too, when it did not get the overrides yet
+
+        """
+        if self.device is None:
+            return
+        handle = self.driver.current_window_handle
+        if handle not in self._windows:
+            self._override(self.device)
+            self._windows.add(handle)
+
+    def restore(self):
+        """
+        Stop emulating, every window is its own again
+
+        """
+        if self.device is None:
+            return
+        current = self.driver.current_window_handle
+        others = self._windows - {current}
+        if others:
+            for handle in others & set(self.driver.window_handles):
+                self.driver.switch_to.window(handle)
+                self._clear()
+            self.driver.switch_to.window(current)
+        if current in self._windows:
+            self._clear()
+        self.discard()
+
+    def discard(self):
+        """
+        Forget the emulated device without sending anything, after the windows that emulated it were closed
+
+        """
+        self.device = None
+        self._windows = set()
+
+    def _override(self, device):
+        self.driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", device.metrics())
+        self._set_user_agent(device.user_agent, device.platform)
+        self.driver.execute_cdp_cmd("Emulation.setTouchEmulationEnabled",
+                                    {"enabled": device.touch, "maxTouchPoints": device.max_touch_points})
+
+    def _clear(self):
+        self.driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+        self._set_user_agent(None, None)
+        self.driver.execute_cdp_cmd("Emulation.setTouchEmulationEnabled", {"enabled": False})
+
+    def _set_user_agent(self, user_agent, platform):
+        # An empty user agent drops the override instead of pinning one
+        params = {"userAgent": user_agent or ""}
+        if user_agent and platform:
+            params["platform"] = platform
+        self.driver.execute_cdp_cmd("Emulation.setUserAgentOverride", params)
@@ -0,0 +1,344 @@
+import re
+
+from selenium.common.exceptions import NoSuchElementException
+
+from base.js_snippets import IS_VISIBLE_JS
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    from cssselect import GenericTranslator
+except ImportError:
+    GenericTranslator = None
+
+# Serializes the document or a subtree in document order, one compact record per element. The text of an element is
+# kept as the runs of text before, between and after its child elements, with whether it is laid out as a block.
+SERIALIZE_JS = IS_VISIBLE_JS + """
+var root = arguments[0] || document.documentElement;
+var nodes = [], stack = [[root, -1]], skipText = {SCRIPT: 1, STYLE: 1, NOSCRIPT: 1, TEMPLATE: 1};
+while (stack.length) {
+    var item = stack.pop(), el = item[0], index = nodes.length;
+    var attributes = [];
+    for (var i = 0; i < el.attributes.length; i++) { attributes.push(el.attributes[i].name, el.attributes[i].value); }
+    var runs = [''];
+    for (var child = el.firstChild; child; child = child.nextSibling) {
+        if (child.nodeType === 1) {
+            runs.push('');
+        } else if (child.nodeType === 3 && !skipText[el.tagName]) {
+            runs[runs.length - 1] += child.nodeValue;
+        }
+    }
+    var display = window.getComputedStyle(el).display || '';
+    var block = el.tagName === 'BR' || (display.indexOf('inline') !== 0 && display !== 'contents');
+    var rect = el.getBoundingClientRect();
+    nodes.push([el.tagName.toLowerCase(), item[1], attributes, runs, castappIsVisible(el) ? 1 : 0,
+                [rect.x + window.scrollX, rect.y + window.scrollY, rect.width, rect.height], block ? 1 : 0]);
+    for (var last = el.lastElementChild; last; last = last.previousElementSibling) { stack.push([last, index]); }
+}
+return {url: window.location.href, nodes: nodes};
+"""
+
+# Simple CSS selector parts the built-in engine evaluates: combinators, tag, #id, .class and attribute tests
+CSS_TOKEN = re.compile(r"""(?P<combinator>\s*>\s*|\s+)|(?P<tag>[a-zA-Z][\w-]*|\*)|\#(?P<id>[\w-]+)|\.(?P<cls>[\w-]+)|"""
+                       r"""\[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[~^$*|]?=)\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|"""
+                       r"""(?P<bare>[^\]\s]+))\s*)?\]""")
+
+ATTRIBUTE_TESTS = {
+    None: lambda actual, expected: True,
+    "=": lambda actual, expected: actual == expected,
+    "~=": lambda actual, expected: expected in actual.split(),
+    "^=": lambda actual, expected: bool(expected) and actual.startswith(expected),
+    "$=": lambda actual, expected: bool(expected) and actual.endswith(expected),
+    "*=": lambda actual, expected: bool(expected) and expected in actual,
+    "|=": lambda actual, expected: actual == expected or actual.startswith(expected + "-"),
+}
+
+
+class UnsupportedLocator(Exception):
+    """
+    The snapshot can not resolve a locator, e.g. XPath without lxml, it has to be checked in the browser
+
+    """
+
+
+class SnapshotNode(object):
+    """
+    An element of a DomSnapshot, read only
+
+    """
+    __slots__ = ("snapshot", "index", "tag_name", "parent", "attributes", "runs", "visible", "rect", "block")
+
+    def __init__(self, snapshot, index, record):
+        self.snapshot = snapshot
+        self.index = index
+        self.tag_name, self.parent, attributes, self.runs, visible, rect, block = record
+        self.attributes = dict(zip(attributes[::2], attributes[1::2]))
+        self.visible = bool(visible)
+        self.rect = dict(zip(("x", "y", "width", "height"), rect))
+        self.block = bool(block)
+
+    @property
+    def text(self):
+        """
+        Text of the element and its visible descendants with collapsed whitespace, like the text of a web element:
+        block elements are separated from their neighbours, inline ones are not.
+        Unlike WebElement.text, a hidden element still returns its own text, check visible where that matters.
+        :rtype: str
+
+        """
+        return self.snapshot.text_of(self.index)
+
+    def get_attribute(self, name):
+        return self.attributes.get(name)
+
+    def is_displayed(self):
+        return self.visible
+
+    def __repr__(self):
+        return "SnapshotNode(<{}> {})".format(self.tag_name, self.attributes)
+
+
+class DomSnapshot(object):
+    """
+    Copy of a document taken with one script call, with visibility and bounding boxes of every element.
+    Locators are resolved locally: id, name, class name, tag name and link texts directly, simple CSS selectors by a
+    built-in matcher, XPath and other CSS with lxml (and cssselect) when they are installed. Locators it can not
+    resolve raise UnsupportedLocator, Base then checks them in the browser.
+    A snapshot does not follow the page, drop it whenever the page may have changed.
+
+    """
+
+    def __init__(self, data):
+        """
+        :param dict data: Result of SERIALIZE_JS
+
+        """
+        self.url = data["url"]
+        self.nodes = [SnapshotNode(self, index, record) for index, record in enumerate(data["nodes"])]
+        self.children = [[] for _ in self.nodes]
+        for node in self.nodes:
+            if node.parent >= 0:
+                self.children[node.parent].append(node.index)
+        self._texts = {}
+        self._results = {}
+        self._indexes = {}
+        self._tree = None
+
+    @classmethod
+    def capture(cls, driver, root=None):
+        """
+        Take a snapshot of the current document
+        :param driver: WebDriver instance
+        :param root: Web element to take the snapshot of, defaults to the whole document
+        :rtype: DomSnapshot
+
+        """
+        return cls(driver.execute_script(SERIALIZE_JS, root))
+
+    def text_of(self, index):
+        text = self._texts.get(index)
+        if text is None:
+            parts = []
+            stack = [index]
+            while stack:
+                current = stack.pop()
+                if isinstance(current, str):
+                    parts.append(current)
+                    continue
+                node = self.nodes[current]
+                if current != index and not node.visible:
+                    continue
+                separator = " " if node.block else ""
+                # Pushed in reverse: separator, text run, first child, text run, ..., last text run, separator
+                stack.append(separator)
+                for child, run in zip(reversed(self.children[current]), reversed(node.runs[1:])):
+                    stack.extend((run, child))
+                stack.extend((node.runs[0], separator))
+            text = self._texts[index] = " ".join("".join(parts).split())
+        return text
+
+    def find_elements(self, locator):
+        """
+        Elements matching a locator, in document order
+        :param tuple locator: locator tuple like the ones given to Base methods
+        :rtype: list
+
+        """
+        locator = tuple(locator)
+        result = self._results.get(locator)
+        if result is None:
+            result = self._results[locator] = self._query(*locator)
+        return result
+
+    def find_element(self, locator):
+        """
+        First element matching a locator
+        :rtype: SnapshotNode
+        :raises NoSuchElementException: No element matches
+
+        """
+        result = self.find_elements(locator)
+        if not result:
+            raise NoSuchElementException("No element in snapshot of {} for {}".format(self.url, locator))
+        return result[0]
+
+    def is_present(self, locator):
+        return bool(self.find_elements(locator))
+
+    def is_visible(self, locator):
+        result = self.find_elements(locator)
+        return bool(result) and result[0].visible
+
+    def _query(self, by, value):
+        nodes = self.nodes
+        if by == "id":
+            return list(self._candidates("id", value))
+        if by == "name":
+            return [node for node in nodes if node.attributes.get("name") == value]
+        if by == "class name":
+            return list(self._candidates("class", value))
+        if by == "tag name":
+            return list(self._candidates("tag", value.lower()))
+        if by == "link text":
+            return [node for node in self._candidates("tag", "a") if node.text == value.strip()]
+        if by == "partial link text":
+            return [node for node in self._candidates("tag", "a") if value in node.text]
+        if by == "css selector":
+            selectors = self._parse_css(value)
+            if selectors is not None:
+                found = set()
+                for parts in selectors:
+                    found.update(node.index for node in self._compound_candidates(parts[-1])
+                                 if self._matches(node.index, parts, len(parts) - 1))
+                return [nodes[index] for index in sorted(found)]
+            if GenericTranslator is None:
+                raise UnsupportedLocator("DomSnapshot: Selector {!r} needs lxml and cssselect".format(value))
+            return self._xpath(GenericTranslator().css_to_xpath(value))
+        if by == "xpath":
+            return self._xpath(value)
+        raise UnsupportedLocator("DomSnapshot: Unsupported locator strategy: {}".format(by))
+
+    def _candidates(self, kind, value):
+        """
+        Nodes with an id, class or tag name, from an index built on first use
+        :rtype: list
+
+        """
+        index = self._indexes.get(kind)
+        if index is None:
+            index = self._indexes[kind] = {}
+            for node in self.nodes:
+                if kind == "tag":
+                    keys = (node.tag_name,)
+                elif kind == "id":
+                    keys = (node.attributes.get("id"),)
+                else:
+                    keys = node.attributes.get("class", "").split()
+                for key in keys:
+                    index.setdefault(key, []).append(node)
+        return index.get(value, [])
+
+    def _compound_candidates(self, compound):
+        _, tag, ids, classes, _ = compound
+        if ids:
+            return self._candidates("id", ids[0])
+        if classes:
+            return self._candidates("class", classes[0])
+        if tag is not None:
+            return self._candidates("tag", tag)
+        return self.nodes
+
+    @staticmethod
+    def _parse_css(selector):
+        """
+        Parse a selector list into compound selectors
+        :return: Per selector a list of (combinator, tag, ids, classes, attribute tests), None when unsupported
+
+        """
+        selectors = []
+        for part in selector.split(","):
+            part = part.strip()
+            compounds, position = [], 0
+            combinator, current = None, None
+            for match in CSS_TOKEN.finditer(part):
+                if match.start() != position:
+                    return None
+                position = match.end()
+                if match.group("combinator") is not None:
+                    combinator = ">" if ">" in match.group("combinator") else " "
+                    current = None
+                    continue
+                if current is None:
+                    current = [combinator, None, [], [], []]
+                    compounds.append(current)
+                    combinator = None
+                if match.group("tag") is not None:
+                    current[1] = None if match.group("tag") == "*" else match.group("tag").lower()
+                elif match.group("id") is not None:
+                    current[2].append(match.group("id"))
+                elif match.group("cls") is not None:
+                    current[3].append(match.group("cls"))
+                else:
+                    expected = next((match.group(name) for name in ("dq", "sq", "bare")
+                                     if match.group(name) is not None), None)
+                    current[4].append((match.group("attr").lower(), match.group("op"), expected))
+            if position != len(part) or not compounds or combinator is not None:
+                return None
+            selectors.append(compounds)
+        return selectors
+
+    def _matches(self, index, parts, position):
+        node = self.nodes[index]
+        combinator, tag, ids, classes, tests = parts[position]
+        if tag is not None and node.tag_name != tag:
+            return False
+        attributes = node.attributes
+        if ids and any(attributes.get("id") != value for value in ids):
+            return False
+        if classes:
+            names = attributes.get("class", "").split()
+            if any(name not in names for name in classes):
+                return False
+        for name, operator, expected in tests:
+            actual = attributes.get(name)
+            if actual is None or not ATTRIBUTE_TESTS[operator](actual, expected):
+                return False
+        if position == 0:
+            return True
+        parent = node.parent
+        if parts[position][0] == ">":
+            return parent >= 0 and self._matches(parent, parts, position - 1)
+        while parent >= 0:
+            if self._matches(parent, parts, position - 1):
+                return True
+            parent = self.nodes[parent].parent
+        return False
+
+    def _xpath(self, expression):
+        if etree is None:
+            raise UnsupportedLocator("DomSnapshot: XPath locators need lxml")
+        if self._tree is None:
+            self._tree = self._build_tree()
+        root, indexes = self._tree
+        return [self.nodes[indexes[element]] for element in root.getroottree().xpath(expression)
+                if element in indexes]
+
+    def _build_tree(self):
+        elements = []
+        for node in self.nodes:
+            attributes = {name: value for name, value in node.attributes.items()
+                          if re.match(r"^[A-Za-z_][\w.-]*$", name)}
+            if node.parent < 0:
+                element = etree.Element(node.tag_name, attributes)
+            else:
+                element = etree.SubElement(elements[node.parent], node.tag_name, attributes)
+            element.text = node.runs[0] or None
+            elements.append(element)
+        for node in self.nodes:
+            # Text after a child element is the tail of that child in lxml
+            for child, run in zip(self.children[node.index], node.runs[1:]):
+                elements[child].tail = run or None
+        return elements[0], {element: index for index, element in enumerate(elements)}
@@ -0,0 +1,273 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from selenium.common.exceptions import WebDriverException
+
+from base.browser_profiles import remove_user_data_dir
+from base.browser_state import reset_browser_state, reset_page_storage, supports_cdp, visited_origins
+from base.device_emulation import DeviceEmulation
+from base.element_cache import ElementCache
+from base.network_capture import NetworkCapture
+from base.network_intercept import NetworkInterceptor
+from base.session_store import forget_session
+
+
+class DriverPool(object):
+    """
+    Pool of reusable WebDriver sessions.
+    Drivers are created lazily on the first acquire, handed back with release and reset between tests
+    instead of being relaunched. A released driver remembers the worker that used it, so the same worker
+    gets the same browser back whenever it is idle.
+
+    """
+
+    def __init__(self, factory, size=1, reset=None, name="default"):
+        """
+        Inits pool with a driver factory
+        :param factory: Callable without arguments that returns a new WebDriver instance
+        :param int size: Maximum count of live drivers in the pool
+        :param reset: Callable that takes a driver and wipes its state, defaults to reset_session
+        :param str name: Name of the pool used in logs and stats
+
+        """
+        if size < 1:
+            raise Exception("DriverPool: Invalid size: {}".format(size))
+        self.factory = factory
+        self.size = size
+        self.reset = reset or reset_session
+        self.name = name
+        self._lock = threading.Condition()
+        self._idle = []
+        self._busy = {}
+        self._closed = False
+        self._stats = {"created": 0, "reused": 0, "affinity_hits": 0, "resets": 0, "discarded": 0,
+                       "peak_in_use": 0, "acquire_wait": 0.0}
+
+    @staticmethod
+    def current_worker():
+        """
+        Default affinity key of the caller: worker id given by the runner, otherwise process and thread
+        :return: Worker key
+
+        """
+        return os.environ.get("CASTAPP_WORKER_ID") or "{}:{}".format(os.getpid(), threading.get_ident())
+
+    def acquire(self, worker=None, timeout=None):
+        """
+        Get a driver from the pool, creating one if the pool is not full yet.
+        Blocks until a driver is released when all drivers are busy.
+        :param worker: Affinity key, defaults to current_worker()
+        :param timeout: Maximum seconds to wait for a free driver, None waits forever
+        :return: WebDriver instance
+
+        """
+        worker = worker or self.current_worker()
+        start_time = time.monotonic()
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise Exception("DriverPool '{}' is closed".format(self.name))
+                if self._idle:
+                    driver = self._take_idle(worker)
+                    self._stats["reused"] += 1
+                    break
+                if len(self._busy) < self.size:
+                    driver = None
+                    break
+                remaining = None if timeout is None else timeout - (time.monotonic() - start_time)
+                if remaining is not None and remaining <= 0:
+                    raise Exception("DriverPool '{}': No free driver after {} seconds".format(self.name, timeout))
+                self._lock.wait(remaining)
+            slot = ("pending", worker, start_time)
+            if driver is None:
+                # Reserve the slot before launching, so concurrent acquires can not exceed the size
+                self._busy[slot] = worker
+            self._stats["acquire_wait"] += time.monotonic() - start_time
+        if driver is None:
+            driver = self._create(slot, worker)
+        with self._lock:
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], len(self._busy))
+        return driver
+
+    def release(self, driver, reset=True):
+        """
+        Give a driver back to the pool
+        :param driver: WebDriver instance taken with acquire
+        :param bool reset: Wipe cookies, storage and extra tabs before the driver is reused
+
+        """
+        with self._lock:
+            worker = self._busy.pop(id(driver), None)
+        if reset:
+            try:
+                self.reset(driver)
+            except Exception as e:
+                # The driver is out of _busy already, it has to be quit here or its browser leaks
+                logging.warning("DriverPool '{}': Reset failed, discarding driver :: {}".format(self.name, e))
+                self._quit(driver)
+                with self._lock:
+                    self._stats["discarded"] += 1
+                    self._lock.notify()
+                return
+        with self._lock:
+            self._stats["resets"] += int(reset)
+            closed = self._closed
+            if not closed:
+                self._idle.append((worker, driver))
+            self._lock.notify()
+        if closed:
+            self._quit(driver)
+
+    def discard(self, driver):
+        """
+        Quit a driver and remove it from the pool, e.g. when its browser crashed
+        :param driver: WebDriver instance taken with acquire
+
+        """
+        with self._lock:
+            self._busy.pop(id(driver), None)
+            self._stats["discarded"] += 1
+            self._lock.notify()
+        self._quit(driver)
+
+    def close(self):
+        """
+        Quit all idle drivers and refuse new acquires. Busy drivers are quit when they are released.
+
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._lock.notify_all()
+        for _, driver in idle:
+            self._quit(driver)
+        logging.info("DriverPool '{}' closed :: {}".format(self.name, self.stats()))
+
+    def stats(self):
+        """
+        Get pool statistics
+        :return: Counters of created/reused/reset/discarded drivers, current and peak usage, total acquire wait
+        :rtype: dict
+
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(name=self.name, size=self.size, in_use=len(self._busy), idle=len(self._idle))
+        return stats
+
+    def _take_idle(self, worker):
+        for index, (last_worker, driver) in enumerate(self._idle):
+            if last_worker == worker:
+                self._stats["affinity_hits"] += 1
+                break
+        else:
+            index = len(self._idle) - 1
+        last_worker, driver = self._idle.pop(index)
+        self._busy[id(driver)] = worker
+        return driver
+
+    def _create(self, slot, worker):
+        try:
+            driver = self.factory()
+        except Exception:
+            with self._lock:
+                self._busy.pop(slot, None)
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._busy.pop(slot, None)
+            self._busy[id(driver)] = worker
+            self._stats["created"] += 1
+        logging.info("DriverPool '{}': Started driver {} of {}".format(self.name, self._stats["created"], self.size))
+        return driver
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+        remove_user_data_dir(driver)
+
+
+def reset_session(driver):
+    """
+    Wipe browser state of a driver so it can be reused by the next test.
+    Clears cookies, cache and the site data of every origin any tab visited, then replaces all tabs with one fresh
+    about:blank tab, which also drops sessionStorage, history and scripts injected into the old tabs.
+    A restored session is dropped as well, the next test's SessionStore puts it back from disk, and an emulated device
+    is dropped with the tabs that emulated it, and the performance log and network capture are emptied, so the next
+    test does not see this test's requests.
+    :param driver: WebDriver instance
+
+    """
+    handles = driver.window_handles
+    cdp = supports_cdp(driver)
+    origins = set()
+    for handle in handles:
+        driver.switch_to.window(handle)
+        if cdp:
+            origins |= visited_origins(driver)
+    interceptor = NetworkInterceptor.for_driver(driver, create=False)
+    if interceptor is not None:
+        interceptor.clear()
+    forget_session(driver)
+    if cdp:
+        reset_browser_state(driver, known_origins=origins)
+    else:
+        reset_page_storage(driver)
+    driver.switch_to.new_window("tab")
+    fresh = driver.current_window_handle
+    for handle in handles:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(fresh)
+    ElementCache.for_driver(driver).switch_window(None)
+    emulation = DeviceEmulation.for_driver(driver, create=False)
+    if emulation is not None:
+        # The overrides went with the closed tabs
+        emulation.discard()
+    if hasattr(driver, "get_log"):
+        # Only Chromium drivers have a performance log
+        try:
+            NetworkCapture.for_driver(driver).clear()
+        except WebDriverException:
+            # Performance log is not enabled, there is nothing to drain
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name, factory, size=None):
+    """
+    Get the process wide pool registered with given name, creating it on first use
+    :param str name: Name of the pool
+    :param factory: Callable that returns a new WebDriver instance
+    :param int size: Pool size, defaults to CASTAPP_POOL_SIZE environment variable or 1
+    :rtype: DriverPool
+
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            size = size or int(os.environ.get("CASTAPP_POOL_SIZE", 1))
+            pool = _pools[name] = DriverPool(factory, size=size, name=name)
+        return pool
+
+
+@atexit.register
+def close_pools():
+    """
+    Close every registered pool, quitting their browsers
+
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,173 @@
+import collections
+import logging
+import weakref
+
+from selenium.common.exceptions import JavascriptException, NoSuchElementException, StaleElementReferenceException
+
+from base.js_snippets import FIND_JS, JS_LOCATOR_STRATEGIES
+
+_caches = weakref.WeakKeyDictionary()
+
+# True when the cached element is still the one find_element would return for its locator, i.e. it is attached and
+# is the first match, so hits stay right when an SPA changes texts or classes in place
+CHECK_JS = FIND_JS + """
+return castappFind(arguments[1], arguments[2], document, false) === arguments[0];
+"""
+
+
+class ElementCache(object):
+    """
+    Cache of located elements keyed by (locator, frame, window handle), shared by all page objects of a driver.
+    Hits cost no command: navigation, refresh and window/frame switches invalidate the cache, and the cached
+    wrappers re-find their element by themselves when it turns out stale on use. The trade-off is that an element
+    that is still attached but no longer the first match of its locator, e.g. after an SPA re-ordered a list in
+    place, is returned until the page is invalidated. Turn probe on to check every hit in the browser instead, which
+    costs one script call per hit, as much as the find it replaces. stats() reports the net commands saved.
+
+    """
+
+    def __init__(self, driver, probe=False, max_size=256):
+        """
+        Inits element cache
+        :param driver: WebDriver instance
+        :param bool probe: Validate every hit against its locator with one script call, so a hit is always the
+            element find_element would return, at the cost of saving no command
+        :param int max_size: Count of cached elements, least recently used ones are dropped first
+
+        """
+        self.driver = driver
+        self.probe = probe
+        self.max_size = max_size
+        self.frames = []
+        self.window = None
+        self._elements = collections.OrderedDict()
+        # DomSnapshot of the current document while Base is in snapshot mode
+        self.snapshot = None
+        self.hits = 0
+        self.probes = 0
+        self.misses = 0
+        self.stale = 0
+        self.refinds = 0
+        self.invalidations = 0
+
+    @classmethod
+    def for_driver(cls, driver):
+        """
+        Get the cache shared by every page object of a driver
+        :param driver: WebDriver instance
+        :rtype: ElementCache
+
+        """
+        cache = _caches.get(driver)
+        if cache is None:
+            cache = _caches[driver] = cls(driver)
+        return cache
+
+    def key(self, locator):
+        return tuple(locator), tuple(self.frames), self.window
+
+    def get(self, locator):
+        """
+        Get a cached element of the current frame and window
+        :param tuple locator: locator of the element
+        :return: Cached element or None
+        :rtype: WrapWebElement
+
+        """
+        key = self.key(locator)
+        element = self._elements.get(key)
+        if element is None:
+            self.misses += 1
+            return None
+        if self.probe:
+            self.probes += 1
+        if self.probe and not self._still_matches(element, locator):
+            self.stale += 1
+            self.misses += 1
+            del self._elements[key]
+            return None
+        self._elements.move_to_end(key)
+        self.hits += 1
+        return element
+
+    def _still_matches(self, element, locator):
+        if locator[0] not in JS_LOCATOR_STRATEGIES:
+            return False
+        try:
+            return self.driver.execute_script(CHECK_JS, element.element, locator[0], locator[1]) is True
+        except (StaleElementReferenceException, NoSuchElementException, JavascriptException):
+            return False
+
+    def put(self, locator, element):
+        """
+        Cache an element found in the current frame and window and make it re-find itself when it gets stale
+        :param tuple locator: locator the element was found with
+        :param element: WrapWebElement instance
+        :return: The element
+        :rtype: WrapWebElement
+
+        """
+        element.refind = lambda: self._refind(locator)
+        self._elements[self.key(locator)] = element
+        while len(self._elements) > self.max_size:
+            self._elements.popitem(last=False)
+        return element
+
+    def _refind(self, locator):
+        self.refinds += 1
+        return self.driver.find_element(*locator)
+
+    def invalidate(self):
+        """
+        Drop all cached elements and the document snapshot
+
+        """
+        self.snapshot = None
+        if self._elements:
+            self.invalidations += 1
+            self._elements.clear()
+
+    def enter_frame(self, frame):
+        """
+        Track switching into a frame
+        :param frame: Frame element
+
+        """
+        self.frames.append(getattr(frame, "id", frame))
+        self.invalidate()
+
+    def exit_frame(self):
+        """
+        Track switching to the parent frame
+
+        """
+        if self.frames:
+            self.frames.pop()
+        self.invalidate()
+
+    def switch_window(self, handle):
+        """
+        Track switching to another window, which also leaves any frame
+        :param handle: Window handle or name
+
+        """
+        self.window = handle
+        self.frames = []
+        self.invalidate()
+
+    def stats(self):
+        """
+        Get cache statistics.
+        commands_saved is the net count of WebDriver commands saved against finding every element again: hits
+        without a probe save their find, while probes that fail and re-finds of stale elements each cost one extra
+        command. It stays at or below zero with probe on.
+        :rtype: dict
+
+        """
+        free_hits = self.hits - (self.probes - self.stale)
+        return {"hits": self.hits, "probes": self.probes, "misses": self.misses, "stale": self.stale,
+                "refinds": self.refinds, "commands_saved": free_hits - self.stale - self.refinds,
+                "invalidations": self.invalidations, "size": len(self._elements)}
+
+    def log_stats(self):
+        logging.info("Element cache :: {}".format(self.stats()))
@@ -0,0 +1,64 @@
+from base.js_snippets import FIND_JS, IS_VISIBLE_JS
+
+READ_FIELD_JS = IS_VISIBLE_JS + """
+function castappReadField(el, field) {
+    switch (field) {
+        case 'element': return el;
+        case 'text': return castappIsVisible(el) ? (el.innerText || '').trim() : '';
+        case 'tag_name': return el.tagName.toLowerCase();
+        case 'displayed': return castappIsVisible(el);
+        case 'enabled': return castappIsEnabled(el);
+        case 'selected': return !!(el.selected || el.checked);
+        case 'rect':
+            var rect = el.getBoundingClientRect();
+            return {x: rect.x + window.scrollX, y: rect.y + window.scrollY, width: rect.width, height: rect.height};
+    }
+    var separator = field.indexOf(':');
+    var kind = separator === -1 ? '' : field.slice(0, separator), name = field.slice(separator + 1);
+    if (kind === 'attribute') { return el.getAttribute(name); }
+    if (kind === 'property') { return el[name] === undefined ? null : el[name]; }
+    if (kind === 'css') { return window.getComputedStyle(el).getPropertyValue(name); }
+    // Same lookup as WebElement.get_attribute: property first, then attribute
+    var property = el[name];
+    if (property !== undefined && property !== null && typeof property !== 'object' && typeof property !== 'function') {
+        return typeof property === 'boolean' ? (property ? 'true' : null) : String(property);
+    }
+    return el.getAttribute(name);
+}
+"""
+
+SNAPSHOT_JS = FIND_JS + READ_FIELD_JS + """
+var by = arguments[0], value = arguments[1], elements = arguments[2], root = arguments[3], fields = arguments[4];
+if (!elements) { elements = castappFind(by, value, root || document, true); }
+
+return elements.map(function (el) {
+    var record = {};
+    for (var i = 0; i < fields.length; i++) { record[fields[i]] = castappReadField(el, fields[i]); }
+    return record;
+});
+"""
+
+DEFAULT_FIELDS = ("text",)
+
+
+def snapshot_elements(driver, fields=DEFAULT_FIELDS, locator=None, elements=None, root=None):
+    """
+    Read several fields of many elements with one script call.
+    Supported fields are "element", "text", "tag_name", "displayed", "enabled", "selected", "rect",
+    "attribute:<name>", "property:<name>", "css:<name>" and any other name, which is read like get_attribute.
+    :param driver: WebDriver instance
+    :param fields: Names of the fields to read
+    :param tuple locator: locator of the elements to read, used when elements is not given
+    :param elements: List of web elements to read
+    :param root: Web element to search the locator in, defaults to the document
+    :return: One dict per element with the requested fields, "element" values are plain WebElements
+    :rtype: list
+
+    """
+    if elements is None and locator is None:
+        raise Exception("snapshot_elements: Either locator or elements is required")
+    if elements is not None:
+        if not elements:
+            return []
+        return driver.execute_script(SNAPSHOT_JS, None, None, list(elements), root, list(fields))
+    return driver.execute_script(SNAPSHOT_JS, locator[0], locator[1], None, root, list(fields))
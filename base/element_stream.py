@@ -0,0 +1,153 @@
+import logging
+import uuid
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support import expected_conditions as ec
+from selenium.webdriver.support.ui import WebDriverWait
+
+from base.element_snapshot import READ_FIELD_JS
+from base.js_snippets import FIND_JS
+from base.wait_engine import WaitEngine, ensure_script_timeout
+
+# Asynchronous script: return the next batch of elements whose key was not returned before. When every rendered
+# element was returned already, the last one is scrolled into view like WrapWebElement.scroll does and the batch is
+# taken as soon as new elements render, or after the settle time. Keys already returned stay in the page, in a set
+# per stream, so only new elements cross the wire.
+STREAM_JS = FIND_JS + READ_FIELD_JS + """
+var by = arguments[0], value = arguments[1], root = arguments[2], key = arguments[3], fields = arguments[4];
+var batch = arguments[5], scroll = arguments[6], center = arguments[7], settle = arguments[8], token = arguments[9];
+var done = arguments[arguments.length - 1];
+var streams = window.castappStreams = window.castappStreams || {};
+var seen = streams[token] = streams[token] || new Set();
+
+function keyOf(el) {
+    var k = castappReadField(el, key);
+    return k === null || k === undefined || k === '' ? null : String(k);
+}
+
+function rendered() { return castappFind(by, value, root || document, true); }
+
+function hasFresh(elements) {
+    for (var i = 0; i < elements.length; i++) {
+        var k = keyOf(elements[i]);
+        if (k !== null && !seen.has(k)) { return true; }
+    }
+    return false;
+}
+
+function finish(scrolled) {
+    var elements = rendered(), records = [];
+    for (var i = 0; i < elements.length && records.length < batch; i++) {
+        var k = keyOf(elements[i]);
+        if (k === null || seen.has(k)) { continue; }
+        seen.add(k);
+        var record = {key: k, element: elements[i]};
+        for (var j = 0; j < fields.length; j++) { record[fields[j]] = castappReadField(elements[i], fields[j]); }
+        records.push(record);
+    }
+    done({records: records, scrolled: scrolled});
+}
+
+var elements = rendered();
+if (!scroll || !elements.length || hasFresh(elements)) {
+    finish(false);
+} else {
+    var last = elements[elements.length - 1], before = last.getBoundingClientRect().top;
+    if (center) { last.scrollIntoView(true); } else { last.scrollIntoView({block: 'center'}); }
+    var scrolled = last.getBoundingClientRect().top !== before, finished = false, scheduled = false;
+    var observer = new MutationObserver(function () {
+        if (scheduled) { return; }
+        scheduled = true;
+        // Rows usually render in several mutations, check once per frame
+        requestAnimationFrame(function () {
+            scheduled = false;
+            if (!finished && hasFresh(rendered())) { stop(); }
+        });
+    });
+    var stop = function () {
+        finished = true;
+        observer.disconnect();
+        clearTimeout(timer);
+        finish(scrolled);
+    };
+    var timer = setTimeout(stop, settle * 1000);
+    observer.observe(root || document.documentElement, {childList: true, subtree: true, attributes: true,
+                                                         characterData: true});
+}
+"""
+
+DROP_STREAM_JS = "if (window.castappStreams) { delete window.castappStreams[arguments[0]]; }"
+
+
+def iter_element_batches(driver, locator, key="text", fields=(), batch_size=50, root=None, scroll=True,
+                         center=False, settle=1, idle_rounds=2, timeout=10):
+    """
+    Stream the elements of a long list in batches as they render, e.g. of infinite scroll feeds and virtualized
+    grids whose rows are recycled. Only elements with a new key are returned, so memory does not grow with the list
+    on this side and the stream can be abandoned as soon as the wanted element showed up.
+    :param driver: WebDriver instance
+    :param tuple locator: locator of the list items
+    :param str key: Field whose value identifies an item, see element_snapshot.snapshot_elements, e.g. "text" or
+    "attribute:data-id". Items without a value are skipped.
+    :param fields: Names of additional fields to read per item
+    :param int batch_size: Most items per batch, i.e. per script call
+    :param root: Web element to search the locator in, defaults to the document
+    :param bool scroll: Scroll to the last item when every rendered item was returned
+    :param bool center: Scrolling semantics of WrapWebElement.scroll
+    :param float settle: Seconds to wait for new items after scrolling
+    :param int idle_rounds: Scrolls in a row without new items that end the stream
+    :param float timeout: Seconds to wait for the first item to render, the stream is empty if none does
+    :return: Generator of lists of dicts with "key", "element" and the requested fields
+    :rtype: generator
+
+    """
+    token = uuid.uuid4().hex
+    root = getattr(root, "element", root)
+    if scroll:
+        ensure_script_timeout(driver, settle)
+    idle = 0
+    first = True
+    try:
+        while True:
+            result = driver.execute_async_script(STREAM_JS, locator[0], locator[1], root, key, list(fields),
+                                                 batch_size, scroll, center, settle, token)
+            records = result["records"]
+            if first and not records:
+                # Nothing rendered yet, the script returned without scrolling. Only then the first item is waited
+                # for, so rendered lists cost no extra round trip.
+                first = False
+                if _wait_for_first(driver, locator, root, timeout):
+                    continue
+                return
+            first = False
+            if records:
+                idle = 0
+                yield records
+                continue
+            idle += 1
+            if not scroll or not result["scrolled"] or idle >= idle_rounds:
+                return
+    finally:
+        try:
+            driver.execute_script(DROP_STREAM_JS, token)
+        except WebDriverException:
+            # The page navigated away, taking the stream with it
+            pass
+
+
+def _wait_for_first(driver, locator, root, timeout):
+    """
+    Wait for the first item, lists are often rendered after the page loaded
+    :return: False when no item rendered in time
+
+    """
+    try:
+        if root is None:
+            WaitEngine(driver).until(ec.presence_of_element_located, locator, timeout)
+        else:
+            # WAIT_JS searches the document only
+            WebDriverWait(driver, timeout).until(lambda _: root.find_elements(*locator))
+    except TimeoutException:
+        logging.info("No element of list {} rendered after {} seconds".format(locator, timeout))
+        return False
+    return True
@@ -0,0 +1,70 @@
+import weakref
+
+
+class ExecuteHooks(object):
+    """
+    Hooks around the commands of a driver.
+    Tools that watch or delay commands, like CommandTracer and GestureRecorder, share one replacement of
+    driver.execute on the instance, so they can be added and removed in any order without undoing each other.
+
+    """
+    _registry = weakref.WeakKeyDictionary()
+
+    def __init__(self, driver):
+        """
+        Inits hooks and replaces execute of the driver
+        :param driver: WebDriver instance
+
+        """
+        self.driver = driver
+        self.hooks = []
+        self._previous_execute = vars(driver).get("execute")
+        execute = driver.execute
+        hooks = self.hooks
+
+        def hooked_execute(driver_command, params=None):
+            return _call(list(hooks), execute, driver_command, params)
+
+        driver.execute = hooked_execute
+
+    @classmethod
+    def for_driver(cls, driver, create=True):
+        """
+        Get the hooks of a driver
+        :param driver: WebDriver instance
+        :param bool create: Install the hooks if the driver has none
+        :rtype: ExecuteHooks
+
+        """
+        hooks = cls._registry.get(driver)
+        if hooks is None and create:
+            hooks = cls._registry[driver] = cls(driver)
+        return hooks
+
+    def add(self, hook):
+        """
+        Route every command through a hook, hooks added later run first
+        :param hook: Callable taking the next execute function, the command and its params
+
+        """
+        self.hooks.append(hook)
+
+    def remove(self, hook):
+        """
+        Remove a hook, the driver gets its own execute back with the last one
+
+        """
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+        if not self.hooks:
+            if self._previous_execute is None:
+                vars(self.driver).pop("execute", None)
+            else:
+                self.driver.execute = self._previous_execute
+            ExecuteHooks._registry.pop(self.driver, None)
+
+
+def _call(hooks, execute, driver_command, params):
+    if not hooks:
+        return execute(driver_command, params)
+    return hooks[-1](lambda command, params=None: _call(hooks[:-1], execute, command, params), driver_command, params)
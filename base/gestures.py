@@ -0,0 +1,112 @@
+import contextlib
+import weakref
+
+from selenium.webdriver import ActionChains
+
+from base.execute_hooks import ExecuteHooks
+
+
+class GestureRecorder(object):
+    """
+    Collects the actions of several gestures, on any element of a driver, and performs them with one request.
+    While a recorder is active, the gesture methods of WrapWebElement and Base queue their actions instead of
+    performing them. Queued actions are flushed on flush(), when recording stops and automatically before any other
+    command of the driver, so reads after a gesture always see its effects.
+
+    """
+    _active = weakref.WeakKeyDictionary()
+
+    def __init__(self, driver):
+        """
+        Inits recorder
+        :param driver: WebDriver instance
+
+        """
+        self.driver = driver
+        self.actions = ActionChains(driver)
+        self.flushes = 0
+
+    @classmethod
+    def for_driver(cls, driver):
+        """
+        Get the recorder that is recording on a driver
+        :return: Active recorder or None
+        :rtype: GestureRecorder
+
+        """
+        return cls._active.get(driver)
+
+    @property
+    def pending(self):
+        return any(device.actions for device in self.actions.w3c_actions.devices)
+
+    def start(self):
+        """
+        Start queueing gestures of the driver
+        :rtype: GestureRecorder
+
+        """
+        if GestureRecorder._active.get(self.driver) is not None:
+            raise Exception("GestureRecorder: Driver is already recording gestures")
+        GestureRecorder._active[self.driver] = self
+        ExecuteHooks.for_driver(self.driver).add(self._flushing_execute)
+        return self
+
+    def _flushing_execute(self, execute, driver_command, params):
+        # flush() swaps in a fresh chain before performing, so its own request finds nothing pending
+        if self.pending:
+            self.flush()
+        return execute(driver_command, params)
+
+    def flush(self):
+        """
+        Perform the queued actions with one request
+        :rtype: GestureRecorder
+
+        """
+        if self.pending:
+            actions, self.actions = self.actions, ActionChains(self.driver)
+            actions.perform()
+            self.flushes += 1
+        return self
+
+    def stop(self):
+        """
+        Flush the queued actions and stop recording
+
+        """
+        try:
+            self.flush()
+        finally:
+            hooks = ExecuteHooks.for_driver(self.driver, create=False)
+            if hooks is not None:
+                hooks.remove(self._flushing_execute)
+            GestureRecorder._active.pop(self.driver, None)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.stop()
+        else:
+            # Gestures queued before the failure are dropped, the test already failed
+            self.actions = ActionChains(self.driver)
+            self.stop()
+
+
+@contextlib.contextmanager
+def gesture(driver):
+    """
+    Actions of one gesture: the active recorder's queue, or a chain that is performed when the block ends
+    :param driver: WebDriver instance
+    :rtype: ActionChains
+
+    """
+    recorder = GestureRecorder.for_driver(driver)
+    if recorder is not None:
+        yield recorder.actions
+        return
+    actions = ActionChains(driver)
+    yield actions
+    actions.perform()
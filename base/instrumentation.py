@@ -0,0 +1,195 @@
+import collections
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from selenium.webdriver.remote.command import Command
+
+from base.base_functions import Base, WrapWebElement
+from base.execute_hooks import ExecuteHooks
+
+# Commands whose parameters carry a locator
+FIND_COMMANDS = frozenset((Command.FIND_ELEMENT, Command.FIND_ELEMENTS, Command.FIND_CHILD_ELEMENT,
+                           Command.FIND_CHILD_ELEMENTS))
+
+# Frames of generated WrapWebElement members, named after the delegated member
+DELEGATE_FRAMES = frozenset(("delegate", "getter"))
+# Frames of decorators around page methods, left out of call paths
+DECORATOR_FRAMES = frozenset(("wrapper",))
+
+
+class CommandRecord(object):
+    """
+    A single traced WebDriver command
+
+    """
+    __slots__ = ("command", "locator", "stack", "start", "duration", "retries", "error")
+
+    def __init__(self, command, locator, stack, start, duration, retries, error):
+        self.command = command
+        self.locator = locator
+        self.stack = stack
+        self.start = start
+        self.duration = duration
+        self.retries = retries
+        self.error = error
+
+    @property
+    def caller(self):
+        """
+        Outermost page method that issued the command
+        :rtype: str
+
+        """
+        return self.stack[0] if self.stack else "<test>"
+
+    def as_dict(self):
+        return {"command": self.command, "locator": self.locator, "caller": self.caller, "stack": list(self.stack),
+                "start": self.start, "duration": self.duration, "retries": self.retries, "error": self.error}
+
+
+class CommandTracer(object):
+    """
+    Records every WebDriver command sent by a driver with its latency, locator and the page methods that issued it.
+    Installing hooks driver.execute on the instance only, so a driver without tracer runs untouched code.
+
+    """
+
+    def __init__(self, driver, name="trace"):
+        """
+        Inits tracer
+        :param driver: WebDriver instance
+        :param str name: Name of the trace, e.g. the test id
+
+        """
+        self.driver = driver
+        self.name = name
+        self.records = []
+        self._origin = None
+
+    def install(self):
+        """
+        Start tracing commands of the driver
+        :rtype: CommandTracer
+
+        """
+        hooks = ExecuteHooks.for_driver(self.driver)
+        if any(isinstance(getattr(hook, "__self__", None), CommandTracer) for hook in hooks.hooks):
+            raise Exception("CommandTracer: Driver is already traced")
+        self._origin = time.perf_counter()
+        hooks.add(self._traced_execute)
+        return self
+
+    def uninstall(self):
+        """
+        Stop tracing, the driver uses its own execute method again unless other hooks are left
+
+        """
+        hooks = ExecuteHooks.for_driver(self.driver, create=False)
+        if hooks is not None:
+            hooks.remove(self._traced_execute)
+
+    def _traced_execute(self, execute, driver_command, params):
+        stack, locator = self._page_stack(sys._getframe(1))
+        if locator is None and driver_command in FIND_COMMANDS and params:
+            locator = (params.get("using"), params.get("value"))
+        start_time = time.perf_counter()
+        error = None
+        try:
+            return execute(driver_command, params)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._record(driver_command, locator, stack, start_time, time.perf_counter() - start_time, error)
+
+    @staticmethod
+    def _page_stack(frame):
+        stack = []
+        locator = None
+        while frame is not None:
+            owner = frame.f_locals.get("self")
+            name = frame.f_code.co_name
+            if isinstance(owner, (Base, WrapWebElement)) and name not in DECORATOR_FRAMES:
+                if name in DELEGATE_FRAMES:
+                    name = frame.f_locals.get("name", name)
+                stack.append("{}.{}".format(type(owner).__name__, name))
+                if locator is None and isinstance(owner, WrapWebElement):
+                    locator = owner.locator
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack), locator
+
+    def _record(self, command, locator, stack, start_time, duration, error):
+        retries = 0
+        if self.records:
+            last = self.records[-1]
+            if last.command == command and last.locator == locator and last.stack == stack:
+                retries = last.retries + 1
+        self.records.append(CommandRecord(command, locator, stack, start_time - self._origin, duration, retries, error))
+
+    def folded_stacks(self):
+        """
+        Total milliseconds per call path in folded stack format, which flame graph tools read
+        :return: Lines like "LoginPage.login;Base.get_element;findElement 12.3"
+        :rtype: list
+
+        """
+        totals = collections.OrderedDict()
+        for record in self.records:
+            path = ";".join((self.name,) + record.stack + (record.command,))
+            totals[path] = totals.get(path, 0.0) + record.duration * 1000
+        return ["{} {:.1f}".format(path, total) for path, total in sorted(totals.items(), key=lambda item: -item[1])]
+
+    def summary(self):
+        """
+        Time and count per command and per caller
+        :rtype: dict
+
+        """
+        by_command = {}
+        by_caller = {}
+        for record in self.records:
+            for totals, key in ((by_command, record.command), (by_caller, record.caller)):
+                count, total = totals.get(key, (0, 0.0))
+                totals[key] = (count + 1, total + record.duration)
+        return {"name": self.name, "commands": len(self.records),
+                "total": sum(record.duration for record in self.records),
+                "retries": sum(1 for record in self.records if record.retries),
+                "by_command": by_command, "by_caller": by_caller}
+
+    def log_summary(self, limit=10):
+        """
+        Log the most expensive call paths of the trace
+
+        """
+        summary = self.summary()
+        logging.info("Trace {name} :: {commands} commands in {total:.2f} seconds, {retries} retries".format(**summary))
+        for line in self.folded_stacks()[:limit]:
+            logging.info("    " + line + " ms")
+
+    def write_chrome_trace(self, path):
+        """
+        Write the trace in Chrome trace event format, it can be opened in chrome://tracing or Perfetto
+        :param str path: Output file
+
+        """
+        pid, tid = os.getpid(), threading.get_ident()
+        events = [{"name": record.command, "cat": record.caller, "ph": "X", "pid": pid, "tid": tid,
+                   "ts": record.start * 1e6, "dur": record.duration * 1e6,
+                   "args": {"locator": str(record.locator), "stack": " > ".join(record.stack),
+                            "retries": record.retries, "error": record.error}} for record in self.records]
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"name": self.name}}, trace_file)
+
+
+def trace_directory():
+    """
+    Directory to write traces to, tracing is off unless CASTAPP_TRACE_DIR is set
+    :rtype: str
+
+    """
+    return os.environ.get("CASTAPP_TRACE_DIR")
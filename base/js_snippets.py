@@ -0,0 +1,70 @@
+"""
+JavaScript helpers shared by the scripts the framework injects into pages.
+Each snippet only declares functions and the values they use, so scripts can concatenate the snippets they need in front of their body.
+
+"""
+import pkgutil
+
+# Locator strategies that FIND_JS can resolve in the browser, same values as selenium By constants
+JS_LOCATOR_STRATEGIES = frozenset(("id", "xpath", "link text", "partial link text", "name", "tag name",
+                                   "class name", "css selector"))
+
+FIND_JS = """
+function castappFind(by, value, root, all) {
+    root = root || document;
+    var found;
+    if (by === 'xpath') {
+        var snapshot = document.evaluate(value, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        found = [];
+        for (var i = 0; i < snapshot.snapshotLength; i++) {
+            if (snapshot.snapshotItem(i).nodeType === 1) { found.push(snapshot.snapshotItem(i)); }
+        }
+    } else if (by === 'link text' || by === 'partial link text') {
+        found = Array.prototype.filter.call(root.querySelectorAll('a'), function (a) {
+            var text = (a.innerText || a.textContent || '').trim();
+            return by === 'link text' ? text === value : text.indexOf(value) !== -1;
+        });
+    } else {
+        var selector = value;
+        if (by === 'id') { selector = '#' + CSS.escape(value); }
+        else if (by === 'name') { selector = '[name="' + CSS.escape(value) + '"]'; }
+        else if (by === 'class name') { selector = '.' + CSS.escape(value); }
+        if (!all) { return root.querySelector(selector); }
+        found = Array.prototype.slice.call(root.querySelectorAll(selector));
+    }
+    return all ? found : (found[0] || null);
+}
+"""
+
+# Visibility follows Selenium's isDisplayed atom, the code WebElement.is_displayed runs, so in-browser checks agree
+# with it on opacity, overflow clipping, <details>, <option> and the other special cases
+IS_VISIBLE_JS = """
+var castappIsDisplayed = %s;
+
+function castappIsVisible(el) {
+    return !!el && el.isConnected && castappIsDisplayed(el);
+}
+
+""" % pkgutil.get_data("selenium.webdriver.remote", "isDisplayed.js").decode("utf-8").strip() + """
+function castappIsEnabled(el) {
+    return !!el && !(el.matches && el.matches(':disabled'));
+}
+"""
+
+# Asynchronous script: request a URL with the page's cookies and pass status and body to the callback
+FETCH_PROBE_JS = """
+var url = arguments[0], timeout = arguments[1], done = arguments[arguments.length - 1];
+var controller = window.AbortController ? new AbortController() : null;
+var timer = setTimeout(function () { if (controller) { controller.abort(); } }, timeout);
+fetch(url, {credentials: 'include', cache: 'no-store', signal: controller ? controller.signal : undefined})
+    .then(function (response) {
+        return response.text().then(function (text) {
+            clearTimeout(timer);
+            done({status: response.status, ok: response.ok, text: text});
+        });
+    })
+    .catch(function (error) {
+        clearTimeout(timer);
+        done({status: 0, ok: false, text: String(error)});
+    });
+"""
@@ -0,0 +1,263 @@
+import collections
+import json
+import re
+import weakref
+
+from base.polling import Poller
+
+# Cheap substring test run on raw log entries before JSON parsing
+NETWORK_PREFIX = '"Network.'
+# Resource types that stay open for the lifetime of the page and never count as in flight
+STREAMING_TYPES = frozenset(("EventSource", "WebSocket"))
+
+_captures = weakref.WeakKeyDictionary()
+
+
+class NetworkExchange(object):
+    """
+    A request paired with its response and loading finished/failed events by requestId
+
+    """
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.url = None
+        self.method = None
+        self.resource_type = None
+        self.frame_id = None
+        self.loader_id = None
+        self.request = None
+        self.response = None
+        self.started = None
+        self.ended = None
+        self.encoded_length = None
+        self.error = None
+        self.redirects = []
+
+    @property
+    def status(self):
+        return self.response["status"] if self.response else None
+
+    @property
+    def finished(self):
+        """
+        True when loading finished or failed
+        :rtype: bool
+
+        """
+        return self.ended is not None
+
+    @property
+    def duration(self):
+        """
+        Seconds between request and end of loading, None while loading
+        :rtype: float
+
+        """
+        if self.ended is None or self.started is None:
+            return None
+        return self.ended - self.started
+
+    def __repr__(self):
+        return "NetworkExchange({} {} -> {})".format(self.method, self.url, self.status)
+
+
+class NetworkCapture(object):
+    """
+    Incremental consumer of the Chrome 'performance' log.
+    Entries are read as a stream, non Network events are dropped by a substring check before JSON parsing and
+    Network events are folded into a bounded store of NetworkExchange records keyed by requestId.
+    Messages drained by queries (find, in_flight, poll) are kept, bounded, until messages() hands them out, so
+    waiting for the network to be idle does not take requests away from filter_network_request.
+    Requires the driver to be started with goog:loggingPrefs {"performance": "ALL"}.
+
+    """
+
+    def __init__(self, driver, max_exchanges=2000, max_unread=10000):
+        """
+        Inits capture
+        :param driver: WebDriver instance
+        :param int max_exchanges: Count of exchanges kept in memory, oldest are evicted first
+        :param int max_unread: Count of drained messages kept for messages(), oldest are dropped first
+
+        """
+        self.driver = driver
+        self.max_exchanges = max_exchanges
+        self.exchanges = collections.OrderedDict()
+        self.evicted = 0
+        self.unread = collections.deque(maxlen=max_unread)
+        # Loader of the latest document per frame, requests of other loaders belong to pages left already
+        self.documents = {}
+        # Newest DevTools timestamp seen, the clock request ages are measured with
+        self.latest_timestamp = None
+
+    @classmethod
+    def for_driver(cls, driver):
+        """
+        Get the capture shared by every page object of a driver, since reading the log drains it
+        :param driver: WebDriver instance
+        :rtype: NetworkCapture
+
+        """
+        capture = _captures.get(driver)
+        if capture is None:
+            capture = _captures[driver] = cls(driver)
+        return capture
+
+    def messages(self, methods=None):
+        """
+        Yield Network messages not handed out yet: the ones drained by earlier queries, then the performance log.
+        Every Network message updates the exchange store, also the ones not yielded.
+        :param methods: Optional collection of method names to yield, e.g. ("Network.requestWillBeSent",)
+        :return: Generator of DevTools messages with "method" and "params"
+
+        """
+        while self.unread:
+            message = self.unread.popleft()
+            if methods is None or message["method"] in methods:
+                yield message
+        for message in self._drain():
+            if methods is None or message["method"] in methods:
+                yield message
+
+    def poll(self):
+        """
+        Consume all pending log entries into the exchange store, keeping them for messages()
+        :return: Count of consumed Network messages
+        :rtype: int
+
+        """
+        count = 0
+        for message in self._drain():
+            self.unread.append(message)
+            count += 1
+        return count
+
+    def _drain(self):
+        for entry in self.driver.get_log("performance"):
+            raw = entry["message"]
+            if NETWORK_PREFIX not in raw:
+                continue
+            message = json.loads(raw)["message"]
+            if not message["method"].startswith("Network."):
+                continue
+            self._record(message)
+            yield message
+
+    def find(self, url=None, method=None, status=None, finished=None):
+        """
+        Query captured exchanges, consuming pending log entries first
+        :param url: Substring or compiled regular expression the URL must match
+        :param str method: HTTP method
+        :param int status: Response status code
+        :param bool finished: Filter on finished state
+        :return: Matching exchanges, oldest first
+        :rtype: list
+
+        """
+        self.poll()
+        return [exchange for exchange in self.exchanges.values() if self._matches(exchange, url, method, status,
+                                                                                   finished)]
+
+    def wait_for_request(self, url, timeout=10, method=None, finished=True):
+        """
+        Wait until a request matching the URL was captured
+        :param url: Substring or compiled regular expression the URL must match
+        :param int timeout: Maximum time to wait in seconds
+        :param str method: HTTP method
+        :param bool finished: Also wait for its loading to finish
+        :return: First matching exchange or None on timeout
+        :rtype: NetworkExchange
+
+        """
+        matches, _ = Poller(timeout, max_interval=0.25).poll(
+            lambda: self.find(url, method=method, finished=True if finished else None))
+        return matches[0] if matches else None
+
+    def in_flight(self, current_only=False, max_age=None):
+        """
+        Count of requests that have not finished loading yet
+        :param bool current_only: Only count requests of the current document of their frame, leaving out requests
+            of pages navigated away from and streaming connections such as EventSource
+        :param float max_age: Leave out requests in flight for longer than this many seconds, e.g. long polls
+        :rtype: int
+
+        """
+        self.poll()
+        return sum(1 for exchange in self.exchanges.values() if not exchange.finished and
+                   (not current_only or self._current(exchange)) and
+                   (max_age is None or self._age(exchange) <= max_age))
+
+    def clear(self):
+        """
+        Drop captured exchanges, pending log entries and drained messages not handed out yet
+
+        """
+        self.poll()
+        self.exchanges.clear()
+        self.unread.clear()
+        self.documents.clear()
+
+    def _current(self, exchange):
+        if exchange.resource_type in STREAMING_TYPES:
+            return False
+        return exchange.frame_id is None or self.documents.get(exchange.frame_id, exchange.loader_id) == \
+            exchange.loader_id
+
+    def _age(self, exchange):
+        if exchange.started is None or self.latest_timestamp is None:
+            return 0
+        return self.latest_timestamp - exchange.started
+
+    @staticmethod
+    def _matches(exchange, url, method, status, finished):
+        if url is not None:
+            if exchange.url is None:
+                return False
+            if isinstance(url, re.Pattern) and not url.search(exchange.url):
+                return False
+            if isinstance(url, str) and url not in exchange.url:
+                return False
+        return ((method is None or exchange.method == method) and (status is None or exchange.status == status)
+                and (finished is None or exchange.finished == finished))
+
+    def _exchange(self, request_id):
+        exchange = self.exchanges.get(request_id)
+        if exchange is None:
+            exchange = self.exchanges[request_id] = NetworkExchange(request_id)
+            while len(self.exchanges) > self.max_exchanges:
+                self.exchanges.popitem(last=False)
+                self.evicted += 1
+        return exchange
+
+    def _record(self, message):
+        method, params = message["method"], message.get("params", {})
+        request_id = params.get("requestId")
+        if request_id is None:
+            return
+        if params.get("timestamp") is not None:
+            self.latest_timestamp = max(self.latest_timestamp or 0, params["timestamp"])
+        if method == "Network.requestWillBeSent":
+            exchange = self._exchange(request_id)
+            if exchange.url is not None and params.get("redirectResponse"):
+                exchange.redirects.append((exchange.url, params["redirectResponse"].get("status")))
+            exchange.request = params["request"]
+            exchange.url = params["request"]["url"]
+            exchange.method = params["request"]["method"]
+            exchange.resource_type = params.get("type")
+            exchange.frame_id = params.get("frameId")
+            exchange.loader_id = params.get("loaderId")
+            if exchange.resource_type == "Document" and exchange.frame_id is not None:
+                self.documents[exchange.frame_id] = exchange.loader_id
+            if exchange.started is None:
+                exchange.started = params.get("timestamp")
+        elif request_id in self.exchanges:
+            exchange = self.exchanges[request_id]
+            if method == "Network.responseReceived":
+                exchange.response = params["response"]
+            elif method == "Network.loadingFinished":
+                exchange.ended = params.get("timestamp")
+                exchange.encoded_length = params.get("encodedDataLength")
+            elif method == "Network.loadingFailed":
+                exchange.ended = params.get("timestamp")
+                exchange.error = params.get("errorText")
@@ -0,0 +1,383 @@
+import base64
+import itertools
+import json
+import logging
+import mimetypes
+import re
+import threading
+import urllib.request
+import weakref
+
+import websocket
+
+from base.browser_state import supports_cdp
+
+# Capabilities that carry the DevTools address of a Chromium based browser
+DEBUGGER_CAPABILITIES = ("goog:chromeOptions", "ms:edgeOptions")
+
+_interceptors = weakref.WeakKeyDictionary()
+# Session of a tab whose Target.attachToTarget is still running, the first attached session seen for it is adopted
+PENDING_SESSION = object()
+
+
+class NetworkRule(object):
+    """
+    What to do with requests whose URL matches a pattern.
+    Patterns use the DevTools wildcards: '*' matches any characters, '?' exactly one.
+
+    """
+
+    def __init__(self, pattern, block=False, status=200, body=b"", headers=None, content_type=None):
+        """
+        :param str pattern: URL pattern, e.g. "*google-analytics.com*"
+        :param bool block: Fail matching requests in the browser, without any response
+        :param int status: HTTP status of the canned response
+        :param body: Canned response body, str or bytes
+        :param dict headers: Response headers
+        :param str content_type: Content-Type header of the response
+
+        """
+        self.pattern = pattern
+        self.block = block
+        self.status = status
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.headers = dict(headers or {})
+        if content_type:
+            self.headers["Content-Type"] = content_type
+        self.regex = re.compile("".join(".*" if char == "*" else "." if char == "?" else re.escape(char)
+                                        for char in pattern) + "$", re.DOTALL)
+
+    @classmethod
+    def blocked(cls, pattern):
+        """
+        Rule that blocks requests, e.g. of analytics, ads or fonts the tests do not assert on
+        :rtype: NetworkRule
+
+        """
+        return cls(pattern, block=True)
+
+    @classmethod
+    def stub(cls, pattern, body, status=200, content_type="application/json", headers=None):
+        """
+        Rule that answers requests with a canned response, dicts and lists are sent as JSON
+        :rtype: NetworkRule
+
+        """
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        return cls(pattern, status=status, body=body, headers=headers, content_type=content_type)
+
+    @classmethod
+    def fixture(cls, pattern, path, status=200, content_type=None):
+        """
+        Rule that answers requests with a local file, so pages can be tested offline
+        :param str path: File to serve, its content type is guessed from the extension when not given
+        :rtype: NetworkRule
+
+        """
+        with open(path, "rb") as fixture_file:
+            body = fixture_file.read()
+        return cls(pattern, status=status, body=body,
+                   content_type=content_type or mimetypes.guess_type(path)[0] or "application/octet-stream")
+
+    def matches(self, url):
+        return self.regex.match(url) is not None
+
+    def fulfill_params(self, request_id):
+        headers = dict(self.headers)
+        headers.setdefault("Content-Length", str(len(self.body)))
+        return {"requestId": request_id, "responseCode": self.status,
+                "responseHeaders": [{"name": name, "value": value} for name, value in headers.items()],
+                "body": base64.b64encode(self.body).decode("ascii")}
+
+    def __repr__(self):
+        return "NetworkRule({!r}, {})".format(self.pattern, "block" if self.block else self.status)
+
+
+class DevToolsConnection(object):
+    """
+    WebSocket connection to the browser endpoint of the DevTools Protocol.
+    Commands and event listeners can be attached to page sessions, events are dispatched on a reader thread.
+
+    """
+
+    def __init__(self, debugger_address, timeout=10):
+        """
+        Connect to the browser
+        :param str debugger_address: host:port of the DevTools HTTP endpoint, e.g. localhost:9222
+        :param float timeout: Seconds to wait for a command response
+
+        """
+        try:
+            with urllib.request.urlopen("http://{}/json/version".format(debugger_address),
+                                        timeout=timeout) as response:
+                url = json.loads(response.read().decode("utf-8"))["webSocketDebuggerUrl"]
+            self.socket = websocket.create_connection(url, timeout=timeout, suppress_origin=True)
+        except (OSError, ValueError, KeyError, websocket.WebSocketException) as e:
+            # The address is local to the machine running the browser, e.g. a Selenium Grid node
+            raise Exception("DevToolsConnection: DevTools endpoint {} is not reachable from this machine, "
+                            "is the browser remote? :: {}".format(debugger_address, e))
+        self.socket.settimeout(None)
+        self.timeout = timeout
+        self.listeners = {}
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._send_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, name="devtools-reader", daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def for_driver(cls, driver):
+        """
+        Connect to the browser of a driver
+        :param driver: WebDriver instance of a Chromium based browser
+        :rtype: DevToolsConnection
+
+        """
+        for capability in DEBUGGER_CAPABILITIES:
+            address = (driver.capabilities.get(capability) or {}).get("debuggerAddress")
+            if address:
+                return cls(address)
+        raise Exception("DevToolsConnection: Driver does not report a DevTools address")
+
+    def send(self, method, params=None, session_id=None, wait=True):
+        """
+        Send a command
+        :param str method: DevTools method, e.g. "Fetch.enable"
+        :param dict params: Parameters of the method
+        :param str session_id: Session of an attached target, None sends to the browser
+        :param bool wait: Wait for the result, must be False on the reader thread i.e. in listeners
+        :return: Result of the command when waiting
+        :rtype: dict
+
+        """
+        message_id = next(self._ids)
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        slot = [threading.Event(), None] if wait else None
+        if wait:
+            self._pending[message_id] = slot
+        with self._send_lock:
+            self.socket.send(json.dumps(message))
+        if not wait:
+            return None
+        if not slot[0].wait(self.timeout):
+            self._pending.pop(message_id, None)
+            raise Exception("DevToolsConnection: No response to {} in {} seconds".format(method, self.timeout))
+        response = slot[1]
+        if "error" in response:
+            raise Exception("DevToolsConnection: {} failed :: {}".format(method, response["error"].get("message")))
+        return response.get("result", {})
+
+    def on(self, method, listener):
+        """
+        Call listener(params, session_id) for every event of a method
+        :param str method: DevTools event, e.g. "Fetch.requestPaused"
+
+        """
+        self.listeners.setdefault(method, []).append(listener)
+
+    def _read(self):
+        while True:
+            try:
+                message = json.loads(self.socket.recv())
+            except (websocket.WebSocketException, OSError, ValueError):
+                break
+            if "id" in message:
+                slot = self._pending.pop(message["id"], None)
+                if slot is not None:
+                    slot[1] = message
+                    slot[0].set()
+                continue
+            for listener in self.listeners.get(message.get("method"), ()):
+                try:
+                    listener(message.get("params", {}), message.get("sessionId"))
+                except Exception as e:
+                    logging.warning("DevTools listener of {} failed :: {}".format(message.get("method"), e))
+
+    def close(self):
+        try:
+            self.socket.close()
+        except (websocket.WebSocketException, OSError):
+            pass
+
+
+class NetworkInterceptor(object):
+    """
+    Blocks and stubs requests of a browser according to NetworkRules.
+    Matching requests are paused with the Fetch domain on a DevTools WebSocket, in every tab, and failed or answered
+    from memory. New tabs wait until the rules are in place, so their first requests are handled too.
+    With offline set, requests no rule matches fail as if the network were down, for fully local fixture pages.
+    The WebSocket needs the browser's DevTools address to be reachable, i.e. a local browser, not a remote grid.
+
+    """
+
+    def __init__(self, driver):
+        """
+        Inits interceptor
+        :param driver: WebDriver instance of a Chromium based browser
+
+        """
+        self.driver = driver
+        self.rules = []
+        self.offline = False
+        self.stubbed = 0
+        self.blocked = 0
+        self.failed = 0
+        self.devtools = None
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_driver(cls, driver, create=True):
+        """
+        Get the interceptor shared by every page object of a driver
+        :param driver: WebDriver instance
+        :param bool create: Create the interceptor when the driver has none yet
+        :rtype: NetworkInterceptor
+
+        """
+        interceptor = _interceptors.get(driver)
+        if interceptor is None and create:
+            interceptor = _interceptors[driver] = cls(driver)
+        return interceptor
+
+    def add(self, *rules, offline=None):
+        """
+        Add rules, already added rules are skipped, so page objects can add theirs on every construction
+        :param rules: NetworkRule instances, the first matching rule wins
+        :param bool offline: Fail requests no rule matches, None keeps the current setting
+        :rtype: NetworkInterceptor
+
+        """
+        new = [rule for rule in rules if rule not in self.rules]
+        changed = bool(new) or (offline is not None and offline != self.offline)
+        if not changed:
+            return self
+        if not supports_cdp(self.driver):
+            raise Exception("NetworkInterceptor: Browser {} has no DevTools Protocol"
+                            .format(self.driver.capabilities.get("browserName")))
+        self.rules.extend(new)
+        if offline is not None:
+            self.offline = offline
+        self.apply()
+        return self
+
+    def clear(self):
+        """
+        Remove all rules, requests go to the network again
+
+        """
+        if not self.rules and not self.offline:
+            return
+        self.rules = []
+        self.offline = False
+        self.apply()
+
+    def apply(self):
+        if self.devtools is None and not self.patterns():
+            return
+        if self.devtools is None:
+            self._connect()
+        for session_id in list(self._sessions.values()):
+            self._enable_fetch(session_id, wait=True)
+
+    def patterns(self):
+        if self.offline:
+            return [{"urlPattern": "*", "requestStage": "Request"}]
+        return [{"urlPattern": rule.pattern, "requestStage": "Request"} for rule in self.rules]
+
+    def _connect(self):
+        self.devtools = DevToolsConnection.for_driver(self.driver)
+        weakref.finalize(self.driver, self.devtools.close)
+        self.devtools.on("Fetch.requestPaused", self._on_request_paused)
+        self.devtools.on("Target.attachedToTarget", self._on_attached)
+        self.devtools.on("Target.detachedFromTarget", self._on_detached)
+        # New tabs are attached before they run and wait until their Fetch patterns are set
+        self.devtools.send("Target.setAutoAttach", {"autoAttach": True, "waitForDebuggerOnStart": True,
+                                                    "flatten": True})
+        for target in self.devtools.send("Target.getTargets")["targetInfos"]:
+            if target["type"] == "page":
+                self._attach(target["targetId"])
+
+    def _attach(self, target_id):
+        with self._lock:
+            if target_id in self._sessions:
+                return
+            self._sessions[target_id] = PENDING_SESSION
+        session_id = self.devtools.send("Target.attachToTarget", {"targetId": target_id, "flatten": True})["sessionId"]
+        with self._lock:
+            # The attachedToTarget event of this or an auto attached session may have been handled already
+            current = self._sessions.get(target_id)
+            if current is PENDING_SESSION:
+                self._sessions[target_id] = session_id
+        if current is not PENDING_SESSION and current != session_id:
+            self.devtools.send("Target.detachFromTarget", {"sessionId": session_id}, wait=False)
+
+    def _enable_fetch(self, session_id, wait):
+        if session_id is PENDING_SESSION:
+            return
+        patterns = self.patterns()
+        if patterns:
+            self.devtools.send("Fetch.enable", {"patterns": patterns}, session_id, wait)
+        else:
+            self.devtools.send("Fetch.disable", {}, session_id, wait)
+
+    def _on_attached(self, params, _):
+        # Configuring waits for responses, which only the reader thread can deliver
+        threading.Thread(target=self._prepare_attached, daemon=True,
+                         args=(params["targetInfo"], params["sessionId"], params.get("waitingForDebugger"))).start()
+
+    def _prepare_attached(self, target, session_id, waiting):
+        keep = False
+        try:
+            with self._lock:
+                # Tabs open before connecting may be attached twice, the first session is kept. A tab whose attach
+                # is pending adopts this session, which may be the one the attach is creating.
+                keep = target["type"] == "page" and \
+                    self._sessions.get(target["targetId"], PENDING_SESSION) in (PENDING_SESSION, session_id)
+                if keep:
+                    self._sessions[target["targetId"]] = session_id
+            if keep:
+                self._enable_fetch(session_id, wait=True)
+        except Exception as e:
+            logging.info("NetworkInterceptor could not prepare new tab :: {}".format(e))
+        try:
+            if waiting:
+                self.devtools.send("Runtime.runIfWaitingForDebugger", {}, session_id, wait=False)
+            if not keep:
+                self.devtools.send("Target.detachFromTarget", {"sessionId": session_id}, wait=False)
+        except Exception as e:
+            logging.info("NetworkInterceptor could not resume new tab :: {}".format(e))
+
+    def _on_detached(self, params, _):
+        target_id = params.get("targetId")
+        with self._lock:
+            if target_id and self._sessions.get(target_id) == params.get("sessionId"):
+                self._sessions.pop(target_id, None)
+
+    def _on_request_paused(self, params, session_id):
+        url = params["request"]["url"]
+        request_id = params["requestId"]
+        for rule in self.rules:
+            if not rule.matches(url):
+                continue
+            if rule.block:
+                self.blocked += 1
+                self.devtools.send("Fetch.failRequest", {"requestId": request_id, "errorReason": "BlockedByClient"},
+                                   session_id, wait=False)
+            else:
+                self.stubbed += 1
+                self.devtools.send("Fetch.fulfillRequest", rule.fulfill_params(request_id), session_id, wait=False)
+            return
+        if self.offline and not url.startswith("data:"):
+            self.failed += 1
+            self.devtools.send("Fetch.failRequest", {"requestId": request_id, "errorReason": "InternetDisconnected"},
+                               session_id, wait=False)
+            return
+        self.devtools.send("Fetch.continueRequest", {"requestId": request_id}, session_id, wait=False)
+
+    def stats(self):
+        return {"rules": len(self.rules), "blocked_patterns": sum(1 for rule in self.rules if rule.block),
+                "stubbed": self.stubbed, "blocked": self.blocked, "failed": self.failed, "tabs": len(self._sessions)}
@@ -6,8 +6,8 @@ from base.base_functions import Base
 class PageBase(Base):
     __metaclass__ = abc.ABCMeta  # ADDED
 
-    def __init__(self, driver, explicit_wait=30):
-        super().__init__(driver, explicit_wait)
+    def __init__(self, driver, explicit_wait=30, command_executor=None):
+        super().__init__(driver, explicit_wait, command_executor)
         self.driver = driver
 
     @abc.abstractmethod
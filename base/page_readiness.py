@@ -0,0 +1,137 @@
+import logging
+import time
+
+from selenium.common.exceptions import JavascriptException, TimeoutException, UnexpectedAlertPresentException
+
+from base.network_capture import NetworkCapture
+from base.polling import Poller
+from base.wait_engine import ensure_script_timeout
+
+READY_JS = """
+var timeout = arguments[0], done = arguments[arguments.length - 1];
+var finished = false, started = Date.now();
+
+function hooksReady() {
+    try { return %s; } catch (e) { return false; }
+}
+
+function check() {
+    if (finished) { return; }
+    if (document.readyState === 'complete' && hooksReady()) {
+        finished = true;
+        done(true);
+    } else if (Date.now() - started >= timeout) {
+        finished = true;
+        done(false);
+    } else {
+        setTimeout(check, 25);
+    }
+}
+check();
+"""
+
+
+class PageReadiness(object):
+    """
+    Detects when the current page is ready instead of sleeping a fixed time.
+    A page is ready when document.readyState is complete, every JavaScript hook expression is truthy, every Python
+    hook returns True and, if enabled, no network request was in flight for idle_time seconds.
+    A page that opens an alert while loading counts as ready, so the test can handle the alert.
+
+    """
+
+    def __init__(self, driver, hooks=(), network_idle=False, idle_time=0.5, max_request_age=10):
+        """
+        Inits readiness detection
+        :param driver: WebDriver instance
+        :param hooks: JavaScript expression strings or callables taking the driver, e.g. "window.appReady === true"
+        :param bool network_idle: Also wait for the network to be idle, needs the performance log enabled
+        :param float idle_time: Seconds without requests in flight that count as network idle
+        :param float max_request_age: Requests in flight for longer than this many seconds, e.g. long polls, do not
+            keep the network from being idle
+
+        """
+        self.driver = driver
+        self.js_hooks = [hook for hook in hooks if isinstance(hook, str)]
+        self.python_hooks = [hook for hook in hooks if not isinstance(hook, str)]
+        self.network_idle = network_idle
+        self.idle_time = idle_time
+        self.max_request_age = max_request_age
+
+    def add_hook(self, hook):
+        """
+        Add an app specific readiness check
+        :param hook: JavaScript expression string or callable taking the driver
+
+        """
+        if isinstance(hook, str):
+            self.js_hooks.append(hook)
+        else:
+            self.python_hooks.append(hook)
+
+    def wait(self, timeout=30):
+        """
+        Wait until the page is ready
+        :param float timeout: Maximum time to wait in seconds
+        :return: Seconds it took until the page was ready
+        :rtype: float
+        :raises TimeoutException: Page was not ready in time
+
+        """
+        start_time = time.monotonic()
+        remaining = lambda: max(0, timeout - (time.monotonic() - start_time))
+        script = READY_JS % " && ".join(["true"] + ["({})".format(hook) for hook in self.js_hooks])
+        ensure_script_timeout(self.driver, timeout)
+        ready = False
+        while remaining() > 0:
+            try:
+                ready = self.driver.execute_async_script(script, int(remaining() * 1000))
+                break
+            except UnexpectedAlertPresentException:
+                return time.monotonic() - start_time
+            except JavascriptException as e:
+                # Hook errors are caught in the page, so only a syntax error fails every time. Anything else means
+                # the document was replaced while waiting, e.g. by client side redirects, check the new one.
+                if "SyntaxError" in (e.msg or ""):
+                    raise JavascriptException("Page ready check with hooks {} failed :: {}".format(self.js_hooks,
+                                                                                                  e.msg))
+                time.sleep(min(0.05, remaining()))
+        if not ready:
+            raise TimeoutException("Page not ready after {} seconds".format(timeout))
+
+        for hook in self.python_hooks:
+            if not Poller(remaining(), max_interval=0.25).poll(lambda: hook(self.driver))[0]:
+                raise TimeoutException("Page ready hook {} not met after {} seconds".format(hook, timeout))
+        if self.network_idle and not self._wait_network_idle(remaining()):
+            raise TimeoutException("Network not idle after {} seconds".format(timeout))
+        return time.monotonic() - start_time
+
+    def _wait_network_idle(self, timeout):
+        # Drained messages stay in the capture, filter_network_request still returns them
+        capture = NetworkCapture.for_driver(self.driver)
+        idle_since = []
+
+        def idle():
+            if capture.in_flight(current_only=True, max_age=self.max_request_age):
+                idle_since[:] = []
+                return False
+            if not idle_since:
+                idle_since.append(time.monotonic())
+            return time.monotonic() - idle_since[0] >= self.idle_time
+
+        return Poller(timeout, first_interval=0.05, max_interval=0.1).poll(idle)[0]
+
+    def wait_logged(self, action, replaced_sleep=0, timeout=30):
+        """
+        Wait until the page is ready and log the time saved against the fixed sleep used before
+        :param str action: Name of the navigation for the log
+        :param float replaced_sleep: Seconds the action used to sleep
+        :param float timeout: Maximum time to wait in seconds
+        :return: Seconds it took until the page was ready
+        :rtype: float
+
+        """
+        elapsed = self.wait(timeout)
+        logging.info("Page ready after {} :: {:.2f} :: seconds, saved {:.2f} seconds"
+                     .format(action, elapsed, max(0.0, replaced_sleep - elapsed)))
+        return elapsed
@@ -0,0 +1,122 @@
+import collections
+import logging
+import random
+import time
+
+# Stats of the latest polls, newest last
+POLL_HISTORY = collections.deque(maxlen=1000)
+
+
+class PollStats(object):
+    """
+    Outcome of a single poll
+
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.attempts = 0
+        self.elapsed = 0.0
+        self.succeeded = False
+        self.aborted = False
+
+    @property
+    def overshoot(self):
+        """
+        Seconds spent after the deadline, zero for successful polls
+        :rtype: float
+
+        """
+        if self.succeeded:
+            return 0.0
+        return max(0.0, self.elapsed - self.timeout)
+
+    def as_dict(self):
+        return {"timeout": self.timeout, "attempts": self.attempts, "elapsed": self.elapsed,
+                "succeeded": self.succeeded, "aborted": self.aborted, "overshoot": self.overshoot}
+
+    def __repr__(self):
+        return "PollStats({})".format(self.as_dict())
+
+
+class Poller(object):
+    """
+    Deadline aware polling scheduler.
+    Checks start with a short interval that grows exponentially with jitter up to max_interval. The clock is
+    time.monotonic, so wall clock jumps do not stretch or cut waits, and the last sleep is clamped to the deadline.
+
+    """
+
+    def __init__(self, timeout, first_interval=0.01, max_interval=0.5, factor=2.0, jitter=0.1):
+        """
+        Inits poller
+        :param float timeout: Maximum time to poll in seconds
+        :param float first_interval: Sleep after the first failed check
+        :param float max_interval: Upper bound of a single sleep
+        :param float factor: Growth of the sleep after every failed check
+        :param float jitter: Relative random spread of every sleep
+
+        """
+        self.timeout = timeout
+        self.first_interval = min(first_interval, max_interval)
+        self.max_interval = max_interval
+        self.factor = factor
+        self.jitter = jitter
+        self._random = random.Random()
+
+    def intervals(self):
+        """
+        Infinite sleep schedule before clamping
+        :return: Generator of seconds
+
+        """
+        interval = self.first_interval
+        while True:
+            yield interval * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+            interval = min(interval * self.factor, self.max_interval)
+
+    def poll(self, check, abort=None):
+        """
+        Call check until it returns a truthy value or the deadline passes. The check always runs at least once.
+        :param check: Callable without arguments returning the result, falsy means not ready yet
+        :param abort: Optional callable taking the last result, returning True stops polling early
+        :return: Tuple of last result and PollStats
+        :rtype: tuple
+
+        """
+        stats = PollStats(self.timeout)
+        start_time = time.monotonic()
+        deadline = start_time + self.timeout
+        intervals = self.intervals()
+        while True:
+            value = check()
+            stats.attempts += 1
+            if value:
+                stats.succeeded = True
+                break
+            if abort is not None and abort(value):
+                stats.aborted = True
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(next(intervals), remaining))
+        stats.elapsed = time.monotonic() - start_time
+        POLL_HISTORY.append(stats)
+        logging.debug("Poll finished :: {}".format(stats))
+        return value, stats
+
+
+def poll_summary():
+    """
+    Aggregate stats of the recorded polls
+    :return: Count, success count, total attempts, mean time to success and max overshoot
+    :rtype: dict
+
+    """
+    history = list(POLL_HISTORY)
+    succeeded = [stats.elapsed for stats in history if stats.succeeded]
+    return {"polls": len(history), "succeeded": len(succeeded),
+            "attempts": sum(stats.attempts for stats in history),
+            "mean_time_to_success": sum(succeeded) / len(succeeded) if succeeded else None,
+            "max_overshoot": max([stats.overshoot for stats in history] or [0.0])}
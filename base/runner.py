@@ -0,0 +1,301 @@
+"""
+Parallel test runner.
+Discovers TestBaseWeb/TestBaseMobile test cases, shards them across worker processes using historical test
+durations and streams every result back to one aggregated report.
+
+Usage: python -m base.runner Tests --workers 4
+
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue as queues
+import sys
+import time
+import traceback
+import unittest
+
+from base.test_base import PooledDriverTestCase
+from base.test_data import run_seed
+
+DURATIONS_FILE = ".castapp_durations.json"
+DEFAULT_DURATION = 1.0
+# Seconds between checks whether workers are still alive while waiting for results
+WORKER_POLL_INTERVAL = 1.0
+
+
+def iter_tests(suite):
+    """
+    Flatten a test suite
+    :param suite: unittest.TestSuite instance
+    :return: Generator of test cases
+
+    """
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from iter_tests(test)
+        else:
+            yield test
+
+
+def discover(start_dir, pattern="*.py", top_level_dir=None):
+    """
+    Find ids of all tests that run on pooled browser drivers
+    :param str start_dir: Directory to search tests in
+    :param str pattern: File name pattern of test modules
+    :param top_level_dir: Top level directory of the project, defaults to the current directory when start_dir is a
+        package and to start_dir itself otherwise
+    :return: Test ids
+    :rtype: list
+
+    """
+    if top_level_dir is None:
+        is_package = os.path.isfile(os.path.join(start_dir, "__init__.py"))
+        top_level_dir = os.getcwd() if is_package else start_dir
+    loader = unittest.TestLoader()
+    suite = loader.discover(start_dir, pattern=pattern, top_level_dir=top_level_dir)
+    if loader.errors:
+        raise Exception("Can not import test modules :: {}".format("\n".join(loader.errors)))
+    test_ids = []
+    for test in iter_tests(suite):
+        if isinstance(test, PooledDriverTestCase):
+            test_ids.append(test.id())
+    return test_ids
+
+
+def load_durations(path):
+    """
+    Read historical test durations
+    :param str path: Durations file
+    :return: Seconds per test id
+    :rtype: dict
+
+    """
+    try:
+        with open(path) as durations_file:
+            return json.load(durations_file)
+    except (IOError, ValueError):
+        return {}
+
+
+def test_durations(results):
+    """
+    Duration of every test of a run. Subtest records count for their test, which gets the longest of its records,
+    as each is timed from the start of the test.
+    :param list results: Result records of the run
+    :return: Seconds per test id
+    :rtype: dict
+
+    """
+    durations = {}
+    for result in results:
+        test_id = result.get("parent") or result["test"]
+        if test_id is not None:
+            durations[test_id] = max(durations.get(test_id, 0.0), result["duration"])
+    return durations
+
+
+def save_durations(path, durations, results):
+    """
+    Merge durations of the current run into the durations file
+    :param str path: Durations file
+    :param dict durations: Previously known durations
+    :param list results: Result records of the current run
+
+    """
+    durations = dict(durations)
+    for test_id, duration in test_durations(results).items():
+        durations[test_id] = round(duration, 3)
+    with open(path, "w") as durations_file:
+        json.dump(durations, durations_file, indent=1, sort_keys=True)
+
+
+def make_shards(test_ids, worker_count, durations):
+    """
+    Split tests into shards with about equal total duration (longest processing time first).
+    Tests without history are assumed to take the average known duration.
+    :param list test_ids: Ids of tests to split
+    :param int worker_count: Count of shards
+    :param dict durations: Seconds per test id
+    :return: List of test id lists
+    :rtype: list
+
+    """
+    known = [durations[test_id] for test_id in test_ids if test_id in durations]
+    default = sum(known) / len(known) if known else DEFAULT_DURATION
+    shards = [[] for _ in range(max(1, min(worker_count, len(test_ids))))]
+    loads = [0.0] * len(shards)
+    for test_id in sorted(test_ids, key=lambda t: durations.get(t, default), reverse=True):
+        index = loads.index(min(loads))
+        shards[index].append(test_id)
+        loads[index] += durations.get(test_id, default)
+    return shards
+
+
+class StreamingResult(unittest.TestResult):
+    """
+    Test result that sends every outcome to the parent process as soon as a test finishes
+
+    """
+
+    def __init__(self, queue, worker_id):
+        super().__init__()
+        self.queue = queue
+        self.worker_id = worker_id
+        self._start_time = None
+
+    def startTest(self, test):
+        super().startTest(test)
+        self._start_time = time.monotonic()
+
+    def _send(self, test, outcome, err=None, parent=None):
+        self.queue.put({"worker": self.worker_id, "test": test.id(), "parent": (parent or test).id(),
+                        "outcome": outcome, "duration": time.monotonic() - (self._start_time or time.monotonic()),
+                        "details": self._exc_info_to_string(err, test) if err else None})
+
+    def addSuccess(self, test):
+        super().addSuccess(test)
+        self._send(test, "passed")
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self._send(test, "failed", err)
+
+    def addError(self, test, err):
+        super().addError(test, err)
+        self._send(test, "error", err)
+
+    def addSubTest(self, test, subtest, err):
+        super().addSubTest(test, subtest, err)
+        if err is not None:
+            self._send(subtest, "failed" if issubclass(err[0], test.failureException) else "error", err, test)
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self.queue.put({"worker": self.worker_id, "test": test.id(), "parent": test.id(), "outcome": "skipped",
+                        "duration": 0.0, "details": reason})
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self._send(test, "expected failure")
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self._send(test, "unexpected success")
+
+
+def run_worker(worker_id, test_ids, queue, seed, worker_count):
+    """
+    Run a shard in a worker process with a single pooled driver
+    :param int worker_id: Index of the worker
+    :param list test_ids: Ids of tests in the shard
+    :param queue: Queue to stream results to
+    :param str seed: Test data seed of the run
+    :param int worker_count: Count of workers, to shard unique test data by
+
+    """
+    os.environ["CASTAPP_WORKER_ID"] = str(worker_id)
+    os.environ["CASTAPP_WORKER_COUNT"] = str(worker_count)
+    os.environ["CASTAPP_SEED"] = seed
+    os.environ["CASTAPP_POOL_SIZE"] = "1"
+    try:
+        suite = unittest.TestLoader().loadTestsFromNames(test_ids)
+        suite.run(StreamingResult(queue, worker_id))
+    except Exception:
+        queue.put({"worker": worker_id, "test": None, "outcome": "error", "duration": 0.0,
+                   "details": traceback.format_exc()})
+    finally:
+        queue.put({"worker": worker_id, "done": True})
+
+
+def run(test_ids, worker_count, durations_file=DURATIONS_FILE, stream=sys.stderr):
+    """
+    Run tests sharded across worker processes and aggregate their results
+    :param list test_ids: Ids of tests to run
+    :param int worker_count: Count of worker processes, each with its own browser
+    :param str durations_file: File of historical durations used for sharding
+    :param stream: Stream to print progress to
+    :return: Aggregated report
+    :rtype: dict
+
+    """
+    durations = load_durations(durations_file)
+    shards = make_shards(test_ids, worker_count, durations)
+    seed = run_seed()
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    workers = {worker_id: context.Process(target=run_worker, args=(worker_id, shard, queue, seed, len(shards)))
+               for worker_id, shard in enumerate(shards) if shard}
+    start_time = time.monotonic()
+    for worker in workers.values():
+        worker.start()
+
+    results = []
+    running = dict(workers)
+    suspects = set()
+    while running:
+        try:
+            message = queue.get(timeout=WORKER_POLL_INTERVAL)
+        except queues.Empty:
+            # A worker counts as lost when it is still dead and silent one interval after it was first seen dead,
+            # so messages it flushed just before exiting are read first
+            for worker_id, worker in list(running.items()):
+                if worker.is_alive():
+                    continue
+                if worker_id not in suspects:
+                    suspects.add(worker_id)
+                    continue
+                del running[worker_id]
+                message = {"worker": worker_id, "test": None, "outcome": "error", "duration": 0.0,
+                           "details": "Worker exited with code {} before finishing".format(worker.exitcode)}
+                results.append(message)
+                stream.write("[worker {worker}] error    {details}\n".format(**message))
+            continue
+        if message.get("done"):
+            running.pop(message["worker"], None)
+            continue
+        results.append(message)
+        stream.write("[worker {worker}] {outcome:<8} {test} ({duration:.2f}s)\n".format(**message))
+        if message["details"] and message["outcome"] in ("failed", "error"):
+            stream.write(message["details"] + "\n")
+        stream.flush()
+    for worker in workers.values():
+        worker.join()
+
+    if results:
+        save_durations(durations_file, durations, [r for r in results if r["test"] and r["outcome"] != "skipped"])
+    summary = {}
+    for result in results:
+        summary[result["outcome"]] = summary.get(result["outcome"], 0) + 1
+    report = {"workers": len(workers), "tests": len(test_ids), "seed": seed,
+              "wall_time": time.monotonic() - start_time, "test_time": sum(test_durations(results).values()),
+              "summary": summary, "results": results}
+    stream.write("Ran {tests} tests on {workers} workers in {wall_time:.2f}s "
+                 "(serial time {test_time:.2f}s, seed {seed}) :: {summary}\n".format(**report))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run browser tests in parallel worker processes")
+    parser.add_argument("start_dir", nargs="?", default="Tests", help="Directory to discover tests in")
+    parser.add_argument("-n", "--workers", type=int, default=os.cpu_count(), help="Count of worker processes")
+    parser.add_argument("-p", "--pattern", default="*.py", help="File name pattern of test modules")
+    parser.add_argument("--durations", default=DURATIONS_FILE, help="File of historical test durations")
+    parser.add_argument("--report", help="Write aggregated JSON report to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    sys.path.insert(0, os.getcwd())
+    test_ids = discover(args.start_dir, args.pattern)
+    report = run(test_ids, args.workers, args.durations)
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(report, report_file, indent=1)
+    failed = sum(report["summary"].get(outcome, 0) for outcome in ("failed", "error", "unexpected success"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+
+from selenium.common.exceptions import WebDriverException
+
+from base.browser_state import supports_cdp
+from base.test_data import worker_shard
+
+# Fields of Network.getAllCookies results that Network.setCookies accepts
+COOKIE_PARAMS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires", "priority",
+                 "sourceScheme", "sourcePort", "partitionKey")
+# Prefix of the sessionStorage key that marks a tab whose storage was restored already, one key per restore so a
+# marker left by an earlier restore never suppresses a later one
+RESTORED_MARKER = "castappSessionRestored"
+
+CAPTURE_STORAGE_JS = """
+var marker = arguments[0];
+try {
+    var read = function (storage) {
+        var items = {};
+        for (var i = 0; i < storage.length; i++) {
+            var name = storage.key(i);
+            if (name.indexOf(marker) !== 0) { items[name] = storage.getItem(name); }
+        }
+        return items;
+    };
+    return {origin: window.location.origin, local: read(window.localStorage), session: read(window.sessionStorage)};
+} catch (e) {
+    return null;
+}
+"""
+
+# Runs before any script of every new document: fills the storage of a saved origin once per tab, later
+# navigations keep whatever the application changed since
+RESTORE_STORAGE_JS = """
+(function (origins, marker) {
+    try {
+        var state = origins[window.location.origin];
+        if (!state || window.sessionStorage.getItem(marker)) { return; }
+        Object.keys(state.local).forEach(function (name) { window.localStorage.setItem(name, state.local[name]); });
+        Object.keys(state.session).forEach(function (name) {
+            window.sessionStorage.setItem(name, state.session[name]);
+        });
+        window.sessionStorage.setItem(marker, '1');
+    } catch (e) {}
+})(%s, %s);
+"""
+
+SET_STORAGE_JS = """
+var state = arguments[0];
+Object.keys(state.local).forEach(function (name) { window.localStorage.setItem(name, state.local[name]); });
+Object.keys(state.session).forEach(function (name) { window.sessionStorage.setItem(name, state.session[name]); });
+"""
+
+# Store and injected script identifier of every driver holding a restored session
+_sessions = weakref.WeakKeyDictionary()
+# Drivers running the login flow of a store, their pages are never rejected since they are on the login page
+_logging_in = weakref.WeakSet()
+
+
+class SessionStore(object):
+    """
+    Logged in browser state, saved once per worker and put into new or reset drivers instead of logging in again.
+    Cookies, including HttpOnly ones, and the localStorage and sessionStorage of the page left by the login are
+    saved to disk. Drivers get the cookies through Network.setCookies and the storage through a script that runs
+    before the first script of the page, so the state is in place before the first navigate_url.
+    Saved state expires after its TTL and is dropped as soon as the rejected check says the application did not
+    accept it, then the next driver logs in again.
+
+    """
+
+    def __init__(self, name, login, rejected=None, ttl=3600, directory=None):
+        """
+        Inits store
+        :param str name: Name of the session, e.g. the account, part of the file name
+        :param login: Callable that takes a driver and logs in through the UI, leaving the browser on a page of
+            the application
+        :param rejected: Callable that takes a driver and tells whether the application rejected the session,
+            e.g. lambda driver: "/login" in driver.current_url
+        :param float ttl: Seconds saved state is used for
+        :param str directory: Directory of the files, defaults to CASTAPP_SESSION_DIR or a temporary directory
+
+        """
+        self.name = name
+        self.login = login
+        self.rejected = rejected
+        self.ttl = ttl
+        self.directory = directory or os.environ.get("CASTAPP_SESSION_DIR") or \
+            os.path.join(tempfile.gettempdir(), "castapp-sessions")
+        self.logins = 0
+        self.restores = 0
+        self.rejections = 0
+        self._lock = threading.RLock()
+
+    @property
+    def path(self):
+        """
+        File of this worker, workers do not share sessions so token rotation in one can not log out another
+        :rtype: str
+
+        """
+        return os.path.join(self.directory, "{}-worker{}.json".format(self.name, worker_shard()[0]))
+
+    def ensure(self, driver):
+        """
+        Make sure the driver holds the session: restore saved state, or log in and save it when there is none
+        :param driver: WebDriver instance
+        :return: True when saved state was restored, False when the driver logged in or had the session already
+        :rtype: bool
+
+        """
+        with self._lock:
+            if driver in _sessions:
+                return False
+            # Marked before logging in, so page objects used by the login flow do not log in again
+            _sessions[driver] = (self, None)
+            try:
+                state = self.load()
+                if state is not None:
+                    self.restore(driver, state)
+                    return True
+                start_time = time.monotonic()
+                _logging_in.add(driver)
+                try:
+                    self.login(driver)
+                finally:
+                    _logging_in.discard(driver)
+                self.logins += 1
+                self.save(self.capture(driver))
+                logging.info("SessionStore {} :: Logged in and saved session in {:.2f} seconds"
+                             .format(self.name, time.monotonic() - start_time))
+                return False
+            except Exception:
+                _sessions.pop(driver, None)
+                raise
+
+    def verify(self, driver):
+        """
+        Check whether the application accepted the session, dropping the saved state when it did not.
+        Always True while the driver runs the login flow, whose pages are expected to look rejected.
+        :param driver: WebDriver instance
+        :rtype: bool
+
+        """
+        if self.rejected is None or driver in _logging_in or _sessions.get(driver, (None,))[0] is not self:
+            return True
+        if not self.rejected(driver):
+            return True
+        logging.warning("SessionStore {} :: Session rejected on {}, logging in again".format(self.name,
+                                                                                           driver.current_url))
+        self.rejections += 1
+        self.invalidate()
+        forget_session(driver)
+        return False
+
+    def capture(self, driver):
+        """
+        Read the session state of a driver
+        :param driver: WebDriver instance
+        :rtype: dict
+
+        """
+        if supports_cdp(driver):
+            cookies = driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        else:
+            cookies = driver.get_cookies()
+        storage = driver.execute_script(CAPTURE_STORAGE_JS, RESTORED_MARKER)
+        origins = {}
+        if storage and storage["origin"].startswith(("http://", "https://")):
+            origins[storage["origin"]] = {"local": storage["local"], "session": storage["session"]}
+        return {"created": time.time(), "cookies": cookies, "origins": origins}
+
+    def save(self, state):
+        os.makedirs(self.directory, exist_ok=True)
+        # Written next to the target and renamed, readers never see half a file
+        descriptor, temporary = tempfile.mkstemp(prefix=self.name + "-", suffix=".tmp", dir=self.directory)
+        with os.fdopen(descriptor, "w") as state_file:
+            json.dump(state, state_file)
+        os.replace(temporary, self.path)
+
+    def load(self):
+        """
+        Saved state of this worker
+        :return: State, None when there is none or it expired
+        :rtype: dict
+
+        """
+        try:
+            with open(self.path) as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return None
+        if time.time() - state.get("created", 0) > self.ttl:
+            self.invalidate()
+            return None
+        return state
+
+    def invalidate(self):
+        """
+        Drop the saved state, the next driver logs in again
+
+        """
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def restore(self, driver, state):
+        """
+        Put saved state into a driver
+        :param driver: WebDriver instance
+        :param dict state: State returned by capture
+
+        """
+        start_time = time.monotonic()
+        if supports_cdp(driver):
+            cookies = [{name: cookie[name] for name in COOKIE_PARAMS if name in cookie} for cookie in state["cookies"]]
+            for cookie in cookies:
+                if cookie.get("expires", -1) < 0:
+                    cookie.pop("expires", None)
+            driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+            identifier = None
+            if state["origins"]:
+                marker = "{}:{}".format(RESTORED_MARKER, uuid.uuid4().hex)
+                source = RESTORE_STORAGE_JS % (json.dumps(state["origins"]), json.dumps(marker))
+                identifier = driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument",
+                                                    {"source": source})["identifier"]
+            _sessions[driver] = (self, identifier)
+        else:
+            self._restore_by_navigation(driver, state)
+            _sessions[driver] = (self, None)
+        self.restores += 1
+        logging.info("SessionStore {} :: Restored session in {:.2f} seconds".format(self.name,
+                                                                                   time.monotonic() - start_time))
+
+    @staticmethod
+    def _restore_by_navigation(driver, state):
+        # Without DevTools cookies and storage can only be set on a page of their origin
+        origins = set(state["origins"])
+        for cookie in state["cookies"]:
+            if cookie.get("domain"):
+                origins.add(("https://" if cookie.get("secure") else "http://") + cookie["domain"].lstrip("."))
+        for origin in sorted(origins):
+            driver.get(origin)
+            host = origin.split("://", 1)[1]
+            for cookie in state["cookies"]:
+                if host.endswith(cookie.get("domain", host).lstrip(".")):
+                    cookie = {name: value for name, value in cookie.items() if name != "sameSite" or value}
+                    driver.add_cookie(cookie)
+            if origin in state["origins"]:
+                driver.execute_script(SET_STORAGE_JS, state["origins"][origin])
+        driver.get("about:blank")
+
+    def stats(self):
+        return {"name": self.name, "logins": self.logins, "restores": self.restores, "rejections": self.rejections}
+
+
+def forget_session(driver):
+    """
+    Stop putting a restored session into new documents of a driver, e.g. when it is reset for the next test
+    :param driver: WebDriver instance
+
+    """
+    store, identifier = _sessions.pop(driver, (None, None))
+    if identifier is not None:
+        try:
+            driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": identifier})
+        except WebDriverException:
+            pass
@@ -1,19 +1,101 @@
-from selenium import webdriver
+import os
 import unittest
 
+from base.browser_profiles import create_driver
+from base.device_emulation import DeviceEmulation
+from base.driver_pool import get_pool
+from base.instrumentation import CommandTracer, trace_directory
+from base.test_data import TestData, use_test_data
 
-class TestBaseMobile(unittest.TestCase):
-    def __init__(self, *args, **kwargs):
-        unittest.TestCase.__init__(self, *args, **kwargs)
-        mobile_emulation = {"deviceName": "Nexus 5"}
-        chrome_options = webdriver.ChromeOptions()
-        chrome_options.add_experimental_option("mobileEmulation", mobile_emulation)
-        self.driver = webdriver.Chrome(chrome_options=chrome_options)
+# Run mobile tests on the web pool with device emulation, CASTAPP_SHARED_MOBILE=0 gives them dedicated browsers
+SHARED_MOBILE = os.environ.get("CASTAPP_SHARED_MOBILE", "1") != "0"
 
 
-class TestBaseWeb(unittest.TestCase):
-    def __init__(self, *args, **kwargs):
-        unittest.TestCase.__init__(self, *args, **kwargs)
-        chrome_options = webdriver.ChromeOptions()
-        self.driver = webdriver.Chrome(chrome_options=chrome_options)
-        self.driver.maximize_window()
+def create_mobile_driver():
+    return create_driver(os.environ.get("CASTAPP_MOBILE_PROFILE", "mobile"))
+
+
+def create_web_driver():
+    return create_driver(os.environ.get("CASTAPP_WEB_PROFILE", "default"))
+
+
+class PooledDriverTestCase(unittest.TestCase):
+    """
+    Test case that takes its driver from a shared DriverPool.
+    The driver is acquired on first use of self.driver and given back to the pool after tearDown,
+    so constructing test cases does not launch any browser.
+    When CASTAPP_TRACE_DIR is set, every WebDriver command of the test is traced into that directory.
+    Random test data of the test comes from a generator seeded with the run seed and the test id.
+    With session_store set, the acquired driver gets the saved logged in state, so tests start logged in.
+    With device set, the acquired driver emulates that device until it is reset after the test.
+
+    """
+    pool_name = None
+    driver_factory = None
+    session_store = None
+    # DeviceProfile or name of a registered device to emulate, None runs on the browser's own window
+    device = None
+
+    @classmethod
+    def driver_pool(cls):
+        """
+        Get the pool that serves drivers of this test case
+        :rtype: DriverPool
+
+        """
+        return get_pool(cls.pool_name, cls.driver_factory)
+
+    def run(self, result=None):
+        with use_test_data(TestData.for_test(self.id())):
+            return super().run(result)
+
+    @property
+    def driver(self):
+        driver = self.__dict__.get("_driver")
+        if driver is None:
+            driver = self._driver = self.driver_pool().acquire()
+            self.addCleanup(self._release_driver)
+            if self.device is not None:
+                DeviceEmulation.for_driver(driver).apply(self.device)
+            if self.session_store is not None:
+                self.session_store.ensure(driver)
+            if trace_directory():
+                self._start_trace(driver)
+        return driver
+
+    @driver.setter
+    def driver(self, driver):
+        self._driver = driver
+
+    def _start_trace(self, driver):
+        tracer = CommandTracer(driver, name=self.id()).install()
+
+        def finish():
+            tracer.uninstall()
+            tracer.log_summary()
+            os.makedirs(trace_directory(), exist_ok=True)
+            tracer.write_chrome_trace(os.path.join(trace_directory(), self.id() + ".trace.json"))
+
+        self.addCleanup(finish)
+
+    def _release_driver(self):
+        driver, self._driver = self._driver, None
+        if driver is not None:
+            self.driver_pool().release(driver)
+
+
+class TestBaseMobile(PooledDriverTestCase):
+    """
+    Mobile tests run on the web pool's browsers emulating the CASTAPP_MOBILE_DEVICE device, so mixed suites share
+    browsers. With CASTAPP_SHARED_MOBILE=0 they run on dedicated browsers started with the CASTAPP_MOBILE_PROFILE
+    profile instead, e.g. for browsers without DevTools Protocol.
+
+    """
+    pool_name = "web" if SHARED_MOBILE else "mobile"
+    driver_factory = staticmethod(create_web_driver if SHARED_MOBILE else create_mobile_driver)
+    device = os.environ.get("CASTAPP_MOBILE_DEVICE", "Nexus 5") if SHARED_MOBILE else None
+
+
+class TestBaseWeb(PooledDriverTestCase):
+    pool_name = "web"
+    driver_factory = staticmethod(create_web_driver)
@@ -0,0 +1,273 @@
+import array
+import calendar
+import contextlib
+import datetime
+import hashlib
+import logging
+import os
+import random
+import string
+
+ALPHABET = string.ascii_uppercase
+
+# Seed of the run, generated once per process when CASTAPP_SEED is not set
+_run_seed = None
+_current = None
+
+
+def add_months(current_date, months):
+    """
+    Adds months to current date to get future datetime
+    :param current_date: Current date
+    :param int months: Count of months you want to add to get future datetime
+    :return: Future datetime
+
+    """
+    month = current_date.month - 1 + months
+    year = current_date.year + month // 12
+    month = month % 12 + 1
+    day = min(current_date.day, calendar.monthrange(year, month)[1])
+    return datetime.date(year, month, day)
+
+
+def run_seed():
+    """
+    Seed of the run, from CASTAPP_SEED or random. Set CASTAPP_SEED to the logged value to reproduce a run.
+    :rtype: str
+
+    """
+    global _run_seed
+    if _run_seed is None:
+        _run_seed = os.environ.get("CASTAPP_SEED") or str(random.SystemRandom().randrange(2 ** 32))
+        logging.info("Test data seed :: {}".format(_run_seed))
+    return _run_seed
+
+
+def worker_shard():
+    """
+    Shard of this process given by the runner
+    :return: Tuple of worker index and worker count
+    :rtype: tuple
+
+    """
+    try:
+        index = int(os.environ.get("CASTAPP_WORKER_ID", 0))
+    except ValueError:
+        index = 0
+    count = max(1, int(os.environ.get("CASTAPP_WORKER_COUNT", 1)))
+    return index % count, count
+
+
+class TestData(object):
+    """
+    Seeded generator of test data.
+    Every test gets its own random stream derived from the run seed and the test id, so a failing test gets the same
+    data again when it is run alone with the run seed and worker shard of the failing run, whatever ran before it.
+    Unique values never repeat within a generator, i.e. within a test, and they are drawn from the worker's own
+    slice of the value space, so tests running in parallel workers never collide. Tests of the same worker draw
+    independently, make values long enough that a repeat between them is unlikely.
+    Batches are generated in bulk: strings from one block of random bytes, numbers and dates by sampling ranges.
+
+    """
+    __test__ = False
+
+    def __init__(self, seed=None, worker=None):
+        """
+        Inits generator
+        :param seed: Seed of the random stream, defaults to the run seed
+        :param tuple worker: Worker index and worker count, defaults to worker_shard()
+
+        """
+        self.seed = run_seed() if seed is None else seed
+        self.random = random.Random(self.seed)
+        self.worker, self.workers = worker or worker_shard()
+        # Unique values issued by this generator, per kind and value space
+        self._issued = {}
+
+    @classmethod
+    def for_test(cls, test_id):
+        """
+        Generator of one test, seeded from the run seed and the test id
+        :param str test_id: Id of the test, e.g. TestCase.id()
+        :rtype: TestData
+
+        """
+        digest = hashlib.sha256("{}:{}".format(run_seed(), test_id).encode("utf-8")).digest()
+        return cls(seed=int.from_bytes(digest[:8], "big"))
+
+    def string(self, size=1, chars=ALPHABET):
+        """
+        Random string, not guaranteed to be unique
+        :rtype: str
+
+        """
+        return "".join(self.random.choices(chars, k=size))
+
+    def strings(self, count, size):
+        """
+        Batch of random strings of uppercase letters, not guaranteed to be unique
+        :rtype: list
+
+        """
+        return self._letter_strings(count, size, ALPHABET)
+
+    def unique_strings(self, count, size):
+        """
+        Batch of strings of uppercase letters that were not returned before by this generator and can not be
+        returned by another worker: their first letters belong to the worker's slice of the alphabet
+        :param int count: Count of strings
+        :param int size: Length of each string, long enough for the worker's slice to hold count values
+        :rtype: list
+
+        """
+        prefix_size = 1
+        while len(ALPHABET) ** prefix_size < self.workers:
+            prefix_size += 1
+        if size < prefix_size:
+            raise Exception("unique_strings: Size {} is too short for {} workers".format(size, self.workers))
+        prefixes = ALPHABET if prefix_size == 1 else self._all_strings(prefix_size)
+        prefixes = prefixes[self.worker::self.workers]
+        capacity = len(prefixes) * len(ALPHABET) ** (size - prefix_size)
+        issued = self._issued.setdefault(("string", size), set())
+        if count + len(issued) > capacity:
+            raise Exception("unique_strings: Only {} unique strings of size {} left for this generator"
+                            .format(capacity - len(issued), size))
+        result = []
+        while len(result) < count:
+            needed = count - len(result)
+            if prefix_size == 1:
+                values = self._letter_strings(needed, size, ALPHABET, first_chars=prefixes)
+            else:
+                values = map(str.__add__, self.random.choices(prefixes, k=needed),
+                             self._letter_strings(needed, size - prefix_size, ALPHABET))
+            result.extend(self._fresh(values, issued, count - len(result)))
+        return result
+
+    def integer(self, start=0, finish=10):
+        """
+        Random integer between start and finish, both included
+        :rtype: int
+
+        """
+        return self.random.randint(start, finish)
+
+    def unique_integers(self, count, start, finish):
+        """
+        Batch of integers between start and finish, both included, never returned before by this generator and
+        from the worker's slice of the interval
+        :rtype: list
+
+        """
+        issued = self._issued.setdefault(("integer", start, finish), set())
+        candidates = range(start + self.worker, finish + 1, self.workers)
+        if count + len(issued) > len(candidates):
+            raise Exception("unique_integers: Only {} unique integers between {} and {} left for this generator"
+                            .format(len(candidates) - len(issued), start, finish))
+        if 2 * (count + len(issued)) > len(candidates):
+            # Dense draws would mostly hit issued values, a sample larger than them by count holds count new ones
+            return self._fresh(self.random.sample(candidates, count + len(issued)), issued, count)
+        result = []
+        while len(result) < count:
+            needed = count - len(result)
+            # 64 bit random words converted in C, the modulo bias over a slice of at most 2**63 values is negligible
+            words = array.array("Q", self.random.randbytes(8 * needed))
+            span = len(candidates)
+            result.extend(self._fresh([candidates[word % span] for word in words], issued, needed))
+        return result
+
+    def date(self, start=None, months=12):
+        """
+        Random date from start up to start plus months
+        :param datetime.date start: First possible date, defaults to today
+        :param int months: Length of the interval in months, negative for dates before start
+        :rtype: datetime.date
+
+        """
+        first, last = self._date_interval(start, months)
+        return datetime.date.fromordinal(self.random.randint(first, last))
+
+    def unique_dates(self, count, start=None, months=12):
+        """
+        Batch of distinct dates from start up to start plus months, from the worker's slice of the interval
+        :rtype: list
+
+        """
+        first, last = self._date_interval(start, months)
+        return [datetime.date.fromordinal(day) for day in self.unique_integers(count, first, last)]
+
+    def _date_interval(self, start, months):
+        start = start or datetime.date.today()
+        end = add_months(start, months)
+        return min(start, end).toordinal(), max(start, end).toordinal()
+
+    def _letter_strings(self, count, size, chars, first_chars=None):
+        if not size:
+            return [""] * count
+        raw = self._letters(count * size, chars)
+        if first_chars:
+            raw[::size] = self._letters(count, first_chars)
+        blob = raw.decode("ascii")
+        return [blob[index:index + size] for index in range(0, count * size, size)]
+
+    def _letters(self, count, chars):
+        # One random byte per character, mapped onto the alphabet with translation tables in C. Bytes above the
+        # largest multiple of the alphabet size are dropped, so every character is equally likely.
+        limit = 256 - 256 % len(chars)
+        rejected = bytes(range(limit, 256))
+        letters = bytearray()
+        while len(letters) < count:
+            needed = count - len(letters)
+            letters += self.random.randbytes(needed * 256 // limit + 16).translate(_table(chars), rejected)
+        del letters[count:]
+        return letters
+
+    @staticmethod
+    def _fresh(values, issued, limit):
+        """
+        Values not issued yet, in order and without duplicates, which are marked as issued
+        :rtype: list
+
+        """
+        unique = dict.fromkeys(values)
+        fresh = [value for value in unique if value not in issued] if issued else list(unique)
+        del fresh[limit:]
+        issued.update(fresh)
+        return fresh
+
+    @staticmethod
+    def _all_strings(size):
+        values = [""]
+        for _ in range(size):
+            values = [value + char for value in values for char in ALPHABET]
+        return values
+
+
+def _table(chars):
+    return bytes(ord(chars[byte % len(chars)]) for byte in range(256))
+
+
+def current_test_data():
+    """
+    Generator of the running test, or a process wide one outside of tests
+    :rtype: TestData
+
+    """
+    global _current
+    if _current is None:
+        _current = TestData()
+    return _current
+
+
+@contextlib.contextmanager
+def use_test_data(test_data):
+    """
+    Make a generator the current one for the duration of a block, e.g. a test run
+    :param TestData test_data: Generator to use
+
+    """
+    global _current
+    previous, _current = _current, test_data
+    try:
+        yield test_data
+    finally:
+        _current = previous
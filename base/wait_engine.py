@@ -0,0 +1,286 @@
+import logging
+import time
+import weakref
+
+from selenium.common.exceptions import *
+from selenium.webdriver.support import expected_conditions as ec
+from selenium.webdriver.support.ui import WebDriverWait
+
+from base.js_snippets import FIND_JS, IS_VISIBLE_JS, JS_LOCATOR_STRATEGIES
+
+# Extra seconds the script timeout must exceed the wait timeout, so the in-browser timer always fires first
+SCRIPT_TIMEOUT_MARGIN = 5
+
+WAIT_JS = FIND_JS + IS_VISIBLE_JS + """
+var by = arguments[0], value = arguments[1], condition = arguments[2], timeout = arguments[3],
+    target = arguments[4], done = arguments[arguments.length - 1];
+var finished = false, observer = null, frame = null, timer = null;
+
+function check() {
+    var el = target ? (target.isConnected ? target : null) : castappFind(by, value, document, false);
+    switch (condition) {
+        case 'present': return el;
+        case 'visible': return castappIsVisible(el) ? el : null;
+        case 'enabled': return castappIsEnabled(el) ? el : null;
+        case 'clickable': return castappIsVisible(el) && castappIsEnabled(el) ? el : null;
+        case 'invisible': return el ? (castappIsVisible(el) ? null : el) : true;
+    }
+    throw new Error('Unknown wait condition: ' + condition);
+}
+
+function finish(result) {
+    if (finished) { return; }
+    finished = true;
+    if (observer) { observer.disconnect(); }
+    if (frame !== null) { cancelAnimationFrame(frame); }
+    clearTimeout(timer);
+    done(result);
+}
+
+function onChange() {
+    var result = check();
+    if (result) { finish(result); }
+}
+
+var result = check();
+if (result) {
+    done(result);
+} else {
+    observer = new MutationObserver(onChange);
+    observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    // Layout only changes (transitions, media queries) do not mutate the DOM, check them once per frame
+    var tick = function () { onChange(); if (!finished) { frame = requestAnimationFrame(tick); } };
+    frame = requestAnimationFrame(tick);
+    timer = setTimeout(function () { finish(null); }, timeout);
+}
+"""
+
+ABSENCE_JS = FIND_JS + IS_VISIBLE_JS + """
+var by = arguments[0], value = arguments[1], condition = arguments[2], mode = arguments[3], grace = arguments[4],
+    quiet = arguments[5], frames = arguments[6], timeout = arguments[7], done = arguments[arguments.length - 1];
+var start = performance.now(), lastMutation = start, absentFrames = 0, checks = 0, appeared = 0, finished = false;
+var observer = new MutationObserver(function () { lastMutation = performance.now(); });
+observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+
+function shown() {
+    if (condition === 'absent') { return !!castappFind(by, value, document, false); }
+    return castappFind(by, value, document, true).some(castappIsVisible);
+}
+
+function finish(absent) {
+    if (finished) { return; }
+    finished = true;
+    observer.disconnect();
+    var now = performance.now();
+    done({absent: absent, elapsed: (now - start) / 1000, checks: checks, appeared: appeared,
+          quiet: (now - lastMutation) / 1000});
+}
+
+function tick() {
+    var now = performance.now();
+    checks++;
+    if (shown()) {
+        absentFrames = 0;
+        appeared++;
+        if (mode === 'check') { return finish(false); }
+    } else {
+        absentFrames++;
+    }
+    var stable = absentFrames >= frames && now - start >= grace;
+    if (stable && now - lastMutation >= quiet) { return finish(true); }
+    // A page that never stops mutating decides on the last frames
+    if (now - start >= timeout) { return finish(stable); }
+    // Hidden tabs get no animation frames
+    if (document.hidden) { setTimeout(tick, 16); } else { requestAnimationFrame(tick); }
+}
+
+tick();
+"""
+
+# Script timeout already set per driver, so it is changed only when a longer wait needs it
+_script_timeouts = weakref.WeakKeyDictionary()
+
+
+def ensure_script_timeout(driver, timeout):
+    """
+    Make sure asynchronous scripts of a driver may run for the given time
+    :param driver: WebDriver instance
+    :param float timeout: Seconds an in-browser wait may take
+
+    """
+    needed = timeout + SCRIPT_TIMEOUT_MARGIN
+    if _script_timeouts.get(driver, 0) < needed:
+        driver.set_script_timeout(needed)
+        _script_timeouts[driver] = needed
+
+
+class AbsenceReport(object):
+    """
+    Outcome of an absence check
+
+    """
+    __slots__ = ("locator", "condition", "absent", "elapsed", "checks", "appeared", "quiet", "in_browser")
+
+    def __init__(self, locator, condition, absent, elapsed, checks, appeared, quiet, in_browser):
+        self.locator = locator
+        self.condition = condition
+        self.absent = absent
+        self.elapsed = elapsed
+        self.checks = checks
+        self.appeared = appeared
+        self.quiet = quiet
+        self.in_browser = in_browser
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return "AbsenceReport({})".format(self.as_dict())
+
+
+class WaitEngine(object):
+    """
+    Waits for element conditions inside the browser.
+    A single execute_async_script call installs a MutationObserver and requestAnimationFrame watcher which resolves
+    as soon as the condition holds, so a wait costs one round trip instead of one per poll.
+    Conditions that can not be checked in the browser fall back to WebDriverWait polling.
+
+    """
+    # Expected conditions that have an in-browser equivalent
+    CONDITIONS = {
+        ec.presence_of_element_located: "present",
+        ec.visibility_of_element_located: "visible",
+        ec.element_to_be_clickable: "clickable",
+        ec.invisibility_of_element_located: "invisible",
+    }
+
+    def __init__(self, driver):
+        """
+        Inits wait engine with driver
+        :param driver: WebDriver instance
+
+        """
+        self.driver = driver
+
+    def until(self, wait_type, locator, timeout, ignored_exceptions=None):
+        """
+        Wait until an expected condition holds for the located element
+        :param wait_type: Expected condition factory, e.g. ec.visibility_of_element_located
+        :param tuple locator: locator of the element to wait for
+        :param int timeout: Maximum time to wait in seconds
+        :param ignored_exceptions: Exceptions ignored by the WebDriverWait fallback
+        :return: Value of the condition, element for element conditions
+        :raises TimeoutException: Condition did not hold in time
+
+        """
+        condition = self.CONDITIONS.get(wait_type)
+        if condition is not None and self._is_supported(locator):
+            start_time = time.monotonic()
+            result = self._wait_in_browser(locator, None, condition, timeout)
+            if result is not None:
+                if result is False:
+                    raise TimeoutException("Condition '{}' not met for element {} after {} seconds"
+                                           .format(condition, locator, timeout))
+                return result
+            timeout = max(0, timeout - (time.monotonic() - start_time))
+        wait = WebDriverWait(self.driver, timeout, ignored_exceptions=ignored_exceptions)
+        return wait.until(wait_type(locator))
+
+    def until_element(self, element, condition, timeout, message=""):
+        """
+        Wait until a condition holds for an already found element
+        :param element: WebElement instance
+        :param str condition: One of "visible", "enabled", "clickable"
+        :param int timeout: Maximum time to wait in seconds
+        :param str message: Message of the timeout exception
+        :return: The element
+        :raises TimeoutException: Condition did not hold in time
+
+        """
+        start_time = time.monotonic()
+        result = self._wait_in_browser((None, None), element, condition, timeout)
+        if result is not None:
+            if result is False:
+                raise TimeoutException(message)
+            return element
+        check = {"visible": lambda _: element.is_displayed(),
+                 "enabled": lambda _: element.is_enabled(),
+                 "clickable": lambda _: element.is_displayed() and element.is_enabled()}[condition]
+        WebDriverWait(self.driver, max(0, timeout - (time.monotonic() - start_time))).until(check, message)
+        return element
+
+    def until_absent(self, locator, condition="absent", mode="check", grace=0, quiet=0.3, frames=3, timeout=5):
+        """
+        Decide in one script call whether an element stays away.
+        The element counts as away once it was missing for a number of consecutive animation frames, the grace
+        period passed and the DOM did not change for quiet seconds. A page that keeps changing is decided at timeout.
+        :param tuple locator: locator of the element
+        :param str condition: "absent" for not in the DOM, "hidden" for no visible match
+        :param str mode: "check" fails as soon as the element shows, "wait" waits for it to go away
+        :param float grace: Seconds the element is given to show up, e.g. a banner rendered after a request
+        :param float quiet: Seconds without DOM changes needed to trust the absence
+        :param int frames: Consecutive frames the element must be missing
+        :param float timeout: Upper bound of the check in seconds
+        :rtype: AbsenceReport
+
+        """
+        if self._is_supported(locator):
+            try:
+                ensure_script_timeout(self.driver, timeout)
+                result = self.driver.execute_async_script(ABSENCE_JS, locator[0], locator[1], condition, mode,
+                                                          int(grace * 1000), int(quiet * 1000), frames,
+                                                          int(timeout * 1000))
+                return AbsenceReport(locator, condition, in_browser=True, **result)
+            except (JavascriptException, TimeoutException) as e:
+                logging.info("In-browser absence check of {} failed, falling back to polling :: {}"
+                             .format(locator, e.msg))
+        return self._poll_absent(locator, condition, mode, grace, quiet, timeout)
+
+    def _poll_absent(self, locator, condition, mode, grace, quiet, timeout):
+        start_time = time.monotonic()
+        window = max(grace, quiet)
+        absent_since = None
+        checks = appeared = 0
+        while True:
+            now = time.monotonic()
+            checks += 1
+            try:
+                elements = self.driver.find_elements(*locator)
+                shown = any(element.is_displayed() for element in elements) if condition == "hidden" else elements
+            except StaleElementReferenceException:
+                shown = True
+            if shown:
+                appeared += 1
+                absent_since = None
+                if mode == "check":
+                    return AbsenceReport(locator, condition, False, now - start_time, checks, appeared, 0.0, False)
+            elif absent_since is None:
+                absent_since = now
+            # Same verdicts as ABSENCE_JS: stable once absent after the grace period, done once quiet as well, and
+            # at the timeout only stable counts
+            stable = absent_since is not None and now - start_time >= grace
+            if stable and now - start_time >= window and now - absent_since >= quiet:
+                return AbsenceReport(locator, condition, True, now - start_time, checks, appeared, 0.0, False)
+            if now - start_time >= timeout:
+                return AbsenceReport(locator, condition, stable, now - start_time, checks, appeared, 0.0, False)
+            time.sleep(0.05)
+
+    @staticmethod
+    def _is_supported(locator):
+        return isinstance(locator, (tuple, list)) and len(locator) == 2 and locator[0] in JS_LOCATOR_STRATEGIES
+
+    def _wait_in_browser(self, locator, element, condition, timeout):
+        """
+        Run the watcher script
+        :return: Condition result, False on timeout or None when the browser could not run the wait
+
+        """
+        try:
+            ensure_script_timeout(self.driver, timeout)
+            result = self.driver.execute_async_script(WAIT_JS, locator[0], locator[1], condition,
+                                                      int(timeout * 1000), element)
+        except (JavascriptException, TimeoutException, StaleElementReferenceException) as e:
+            # Navigation during the wait unloads the script, invalid selectors throw, continue with polling
+            logging.info("In-browser wait for {} failed, falling back to polling :: {}".format(locator, e.msg))
+            return None
+        return False if result is None else result
@@ -0,0 +1,110 @@
+"""
+Micro-benchmark of WrapWebElement attribute dispatch against a fake element that answers every command locally,
+so the numbers show only the cost added by the wrapper. Each access is timed on the current wrapper, on the
+__getattribute__ wrapper it replaced and on the plain WebElement. Delegated members stay about 2-3x slower than the
+plain element: every call goes through the generated delegate and its refind_on_stale wrapper, two Python calls with
+argument packing and a lookup by name that the plain element does not have. The replaced wrapper was 15-20x slower
+than the current one.
+
+Usage: python benchmarks/bench_wrap_element.py
+
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functools import wraps
+
+from selenium.webdriver.remote.webelement import WebElement
+
+from base.base_functions import WrapWebElement
+
+
+class FakeParent(object):
+    """
+    Stand-in for WebDriver that returns a canned value for every command
+
+    """
+    session_id = "fake-session"
+
+    def execute(self, command, params=None):
+        return {"value": "fake"}
+
+    def execute_script(self, script, *args):
+        return True
+
+
+class GetattributeWrapWebElement(WebElement):
+    """
+    WrapWebElement as it was before the generated delegates: every attribute access goes through __getattribute__
+
+    """
+    element = None
+    driver = None
+    locator = None
+
+    def __init__(self, driver, element, locator=None):
+        super().__init__(element.parent, element._id)
+        self.element = element
+        self.driver = driver
+        self.locator = locator
+
+    def __getattribute__(self, attribute):
+        if attribute not in list(GetattributeWrapWebElement.__dict__):
+            returning_value = object.__getattribute__(self.element, attribute)
+        else:
+            returning_value = object.__getattribute__(self, attribute)
+
+        @wraps(WebElement)
+        def wrapper(*args, **kwargs):
+            value = returning_value(*args, **kwargs)
+            if (isinstance(value, WebElement) or attribute in (
+                    "submit", "clear")) and attribute != 'find_element':
+                return self
+            else:
+                return value
+
+        if callable(returning_value):
+            return wrapper
+        else:
+            return returning_value
+
+
+def measure(statement, namespace, number=200000, repeat=5):
+    """
+    Best per-call time of a statement
+    :param str statement: Statement to time
+    :param dict namespace: Globals of the statement
+    :return: Nanoseconds per call
+    :rtype: float
+
+    """
+    return min(timeit.repeat(statement, globals=namespace, number=number, repeat=repeat)) / number * 1e9
+
+
+def main():
+    element = WebElement(FakeParent(), "fake-id")
+    wrapped = WrapWebElement(FakeParent(), element, locator=("id", "fake"))
+    previous = GetattributeWrapWebElement(FakeParent(), element, locator=("id", "fake"))
+    cases = [
+        ("delegated property (text)", "{}.text"),
+        ("delegated method lookup (get_attribute)", "{}.get_attribute"),
+        ("delegated method call (is_enabled())", "{}.is_enabled()"),
+        ("delegated method call (click())", "{}.click()"),
+        ("self returning call (clear())", "{}.clear()"),
+    ]
+    namespace = {"wrapped": wrapped, "previous": previous, "element": element}
+    print("{:<42} {:>12} {:>12} {:>12} {:>10} {:>10}".format("access", "wrapped ns", "previous ns", "plain ns",
+                                                             "speedup", "overhead"))
+    for name, statement in cases:
+        wrapped_ns = measure(statement.format("wrapped"), namespace)
+        previous_ns = measure(statement.format("previous"), namespace)
+        plain_ns = measure(statement.format("element"), namespace)
+        print("{:<42} {:>12.1f} {:>12.1f} {:>12.1f} {:>9.1f}x {:>9.1f}x".format(
+            name, wrapped_ns, previous_ns, plain_ns, previous_ns / wrapped_ns, wrapped_ns / plain_ns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Local stand-in for a W3C WebDriver endpoint.
+Answers the commands the framework sends with canned data after a configurable latency, so benchmarks measure
+the framework and the protocol round trips without a browser.
+
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+
+
+class FakePage(object):
+    """
+    Content served by the fake endpoint: a list of rows and a performance log
+
+    """
+
+    def __init__(self, rows=200, log_entries=2000, network_share=0.2, catalog_rows=10000):
+        """
+        :param int rows: Count of elements every find command returns
+        :param int log_entries: Count of performance log entries returned per get_log call
+        :param float network_share: Part of the log entries that are Network events
+        :param int catalog_rows: Length of the virtualized list element streams walk through
+
+        """
+        self.rows = rows
+        self.log_entries = log_entries
+        self.network_share = network_share
+        self.catalog_rows = catalog_rows
+        self.streams = {}
+
+    def element(self, index):
+        return {ELEMENT_KEY: "row-{}".format(index)}
+
+    def dom_nodes(self):
+        """
+        Serialized document as DomSnapshot reads it: a table with the rows
+        :rtype: list
+
+        """
+        nodes = [["html", -1, [], ["", ""], 1, [0, 0, 1000, 1000], 1],
+                 ["body", 0, [], ["", ""], 1, [0, 0, 1000, 1000], 1],
+                 ["table", 1, ["id", "rows"], [""] * (self.rows + 1), 1, [0, 0, 1000, 1000], 1]]
+        for index in range(self.rows):
+            nodes.append(["tr", 2, ["class", "row", "data-id", str(index)], ["row text"], 1, [0, index * 20, 1000, 20],
+                          1])
+        return nodes
+
+    def stream_batch(self, token, batch):
+        """
+        Next batch of an element stream over the catalog, as STREAM_JS returns it
+        :rtype: dict
+
+        """
+        start = self.streams.get(token, 0)
+        end = min(start + batch, self.catalog_rows)
+        self.streams[token] = end
+        return {"records": [{"key": "row {}".format(index), "element": self.element(index)}
+                            for index in range(start, end)], "scrolled": start > 0}
+
+    def performance_log(self):
+        entries = []
+        network_every = max(1, int(round(1 / self.network_share))) if self.network_share else 0
+        for index in range(self.log_entries):
+            if network_every and index % network_every == 0:
+                message = {"method": "Network.requestWillBeSent",
+                           "params": {"requestId": str(index), "timestamp": index / 1000.0, "type": "XHR",
+                                      "request": {"url": "http://fake/api/{}".format(index), "method": "GET",
+                                                  "headers": {"Accept": "*/*"}}}}
+            else:
+                message = {"method": "Page.lifecycleEvent",
+                           "params": {"frameId": "F", "loaderId": "L", "name": "load", "timestamp": index / 1000.0}}
+            entries.append({"level": "INFO", "timestamp": index,
+                            "message": json.dumps({"message": message, "webview": "W"})})
+        return entries
+
+
+class FakeWebDriverHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, without this delayed ACKs add 40 ms to every keep-alive request
+    disable_nagle_algorithm = True
+    server_version = "FakeWebDriver/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def _handle(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.server.requests += 1
+        status, value = self.server.dispatch(method, self.path, body)
+        payload = json.dumps({"value": value}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeWebDriverServer(ThreadingHTTPServer):
+    """
+    Fake WebDriver server running in a background thread
+
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0.002, page=None, port=0):
+        """
+        :param float latency: Seconds every request takes before it is answered
+        :param FakePage page: Served content
+        :param int port: Port to listen on, 0 picks a free one
+
+        """
+        super().__init__(("127.0.0.1", port), FakeWebDriverHandler)
+        self.latency = latency
+        self.page = page or FakePage()
+        self.requests = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self.server_address[1])
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def dispatch(self, method, path, body):
+        """
+        Answer a WebDriver command
+        :return: Tuple of HTTP status and response value
+
+        """
+        if method == "POST" and path == "/session":
+            return 200, {"sessionId": uuid.uuid4().hex,
+                         "capabilities": {"browserName": "chrome", "browserVersion": "fake",
+                                          "platformName": "linux", "acceptInsecureCerts": False}}
+        match = re.match(r"^/session/[^/]+(/.*)?$", path)
+        if not match:
+            return 404, {"error": "unknown command", "message": path, "stacktrace": ""}
+        command = match.group(1) or ""
+        page = self.page
+        if command in ("", "/window") and method == "DELETE":
+            return 200, None
+        if command in ("/element", "/elements") or re.match(r"^/element/[^/]+/elements?$", command):
+            if command.endswith("elements"):
+                return 200, [page.element(index) for index in range(page.rows)]
+            return 200, page.element(0)
+        if re.match(r"^/element/[^/]+/text$", command):
+            return 200, "row text"
+        if re.match(r"^/element/[^/]+/(enabled|displayed|selected)$", command):
+            return 200, True
+        if re.match(r"^/element/[^/]+/(attribute|property|css)/", command):
+            return 200, "value"
+        if re.match(r"^/element/[^/]+/name$", command):
+            return 200, "tr"
+        if command == "/execute/sync" or command == "/execute/async":
+            return 200, self._execute(body.get("script", ""), body.get("args", []))
+        if command == "/se/log":
+            return 200, page.performance_log() if body.get("type") == "performance" else []
+        if command == "/window/handles":
+            return 200, ["window-0"]
+        if command in ("/url", "/title") and method == "GET":
+            return 200, "http://fake/" if command == "/url" else "Fake"
+        if command.startswith("/goog/cdp/"):
+            return 200, {}
+        return 200, None
+
+    def _execute(self, script, args):
+        page = self.page
+        if "castappStreams[arguments[0]]" in script:
+            page.streams.pop(args[0], None)
+            return None
+        if "castappStreams" in script:
+            return page.stream_batch(args[9], args[5])
+        if "elements.map(function (el)" in script:
+            fields = args[4]
+            elements = args[2] or [page.element(index) for index in range(page.rows)]
+            return [{field: (element if field == "element" else "row text") for field in fields}
+                    for element in elements]
+        if "skipText" in script:
+            return {"url": "http://fake/", "nodes": page.dom_nodes()}
+        if "MutationObserver" in script:
+            return page.element(0)
+        return True
@@ -0,0 +1,222 @@
+"""
+Benchmark suite of the framework against the local fake WebDriver server.
+Runs offline, writes the results as JSON and compares them with a stored baseline to make regressions visible.
+
+Usage:
+    python benchmarks/run.py                     # run, write results/latest.json, compare with results/baseline.json
+    python benchmarks/run.py --save-baseline     # also store the results as the new baseline
+    python benchmarks/run.py --latency 0.01      # simulate a slower (remote) endpoint
+
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from selenium import webdriver
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webelement import WebElement
+
+from base.base_functions import Base, WrapWebElement
+from base.driver_pool import DriverPool
+from base.test_base import TestBaseWeb
+from bench_wrap_element import FakeParent, measure
+from fake_webdriver import FakePage, FakeWebDriverServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+class FakeChromeDriver(webdriver.Remote):
+    """
+    Remote driver with the Chrome only log command, talking to the fake server
+
+    """
+
+    def get_log(self, log_type):
+        return self.execute(Command.GET_LOG, {"type": log_type})["value"]
+
+
+def timed(function, repeat):
+    """
+    Run a function several times
+    :return: Statistics of the run times in milliseconds
+    :rtype: dict
+
+    """
+    samples = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start_time) * 1000)
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples), "mean_ms": statistics.mean(samples),
+            "repeat": repeat}
+
+
+def bench_suite_startup(server, tests=50):
+    """
+    Load a suite of pooled test cases and acquire the first driver
+
+    """
+    def factory():
+        return FakeChromeDriver(command_executor=server.url, options=webdriver.ChromeOptions())
+
+    def startup():
+        case = type("BenchCase", (TestBaseWeb,), dict(
+            {"test_{}".format(index): lambda self: None for index in range(tests)},
+            pool_name="bench-startup", driver_factory=staticmethod(factory)))
+        suite = unittest.TestLoader().loadTestsFromTestCase(case)
+        pool = DriverPool(factory, size=1)
+        pool.release(pool.acquire(), reset=False)
+        pool.close()
+        return suite
+
+    return startup
+
+
+def page_check(page, snapshot):
+    """
+    Check 50 locators like a PageBase.check implementation, directly or in snapshot mode
+
+    """
+    locators = [("css selector", "tr[data-id='{}']".format(index)) for index in range(50)]
+    page.element_cache.invalidate()
+    if not snapshot:
+        return [page.is_element_present(locator) for locator in locators]
+    with page.snapshot_mode():
+        return [page.is_element_present(locator) for locator in locators]
+
+
+def get_element_with_probe(page, locator):
+    """
+    Cache hit checked against its locator in the browser, the safest but slowest cache configuration
+
+    """
+    page.element_cache.probe = True
+    try:
+        return page.get_element(locator)
+    finally:
+        page.element_cache.probe = False
+
+
+def find_in_catalog(page, wanted="row 120"):
+    """
+    Walk a 10k row virtualized list until a row shows up, then abandon the stream
+
+    """
+    batches = page.iter_element_batches(("css selector", ".catalog .row"), fields=())
+    try:
+        for records in batches:
+            for record in records:
+                if record["key"] == wanted:
+                    return record["element"]
+    finally:
+        batches.close()
+
+
+def run_benchmarks(latency, repeat):
+    server = FakeWebDriverServer(latency=latency, page=FakePage(rows=200, log_entries=2000)).start()
+    driver = FakeChromeDriver(command_executor=server.url, options=webdriver.ChromeOptions())
+    page = Base(driver)
+    rows = ("css selector", "tr")
+    element = page.get_element(rows)
+    results = {}
+    try:
+        cases = [
+            ("suite_startup", bench_suite_startup(server)),
+            ("get_element_list", lambda: page.get_element_list(rows)),
+            ("get_element_list_texts", lambda: [row.text for row in page.get_element_list(rows)]),
+            ("snapshot_elements_texts", lambda: page.snapshot_elements(rows, ("text",))),
+            ("get_element_cached", lambda: page.get_element(rows)),
+            ("get_element_cached_probe", lambda: get_element_with_probe(page, rows)),
+            ("wait_for_element", lambda: (page.element_cache.invalidate(), page.wait_for_element(rows))),
+            ("wait_for_element_visible", lambda: page.wait_for_element_visible(rows)),
+            ("page_check", lambda: page_check(page, False)),
+            ("page_check_snapshot", lambda: page_check(page, True)),
+            ("iter_elements_early_stop", lambda: find_in_catalog(page)),
+            ("wrap_element_text", lambda: element.text),
+            ("send_keys", lambda: element.send_keys("benchmark text")),
+            ("send_keys_delay", lambda: element.send_keys("benchmark", delay=0.001)),
+            ("filter_network_request", lambda: page.filter_network_request()),
+        ]
+        for name, function in cases:
+            requests = server.requests
+            results[name] = timed(function, repeat)
+            results[name]["requests"] = (server.requests - requests) // repeat
+    finally:
+        driver.quit()
+        server.stop()
+
+    wrapped = WrapWebElement(FakeParent(), WebElement(FakeParent(), "fake-id"), ("id", "fake"))
+    results["wrap_attribute_access"] = {"median_ns": measure("wrapped.text", {"wrapped": wrapped}, number=50000),
+                                        "repeat": 5}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print results next to the baseline
+    :return: Names of benchmarks slower than the baseline by more than threshold
+    :rtype: list
+
+    """
+    regressions = []
+    print("{:<28} {:>12} {:>12} {:>9} {:>9}".format("benchmark", "current", "baseline", "ratio", "requests"))
+    for name, result in results.items():
+        # Minimum is the least noisy statistic on shared machines
+        key = "min_ms" if "min_ms" in result else "median_ns"
+        current = result[key]
+        previous = baseline.get(name, {}).get(key)
+        ratio = current / previous if previous else None
+        if ratio is not None and ratio > 1 + threshold:
+            regressions.append(name)
+        print("{:<28} {:>10.3f}{} {:>12} {:>9} {:>9}".format(
+            name, current, key[-2:], "{:.3f}".format(previous) if previous else "-",
+            "{:.2f}x".format(ratio) if ratio else "-", result.get("requests", "-")))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the framework against a fake WebDriver server")
+    parser.add_argument("--latency", type=float, default=0.002, help="Seconds per fake WebDriver request")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per benchmark")
+    parser.add_argument("--threshold", type=float, default=0.3, help="Allowed slowdown against the baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with 1 when a benchmark regressed")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.latency, args.repeat)
+    report = {"meta": {"date": datetime.datetime.now().isoformat(timespec="seconds"), "latency": args.latency,
+                       "python": platform.python_version(), "machine": platform.machine()},
+              "results": results}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, "latest.json"), "w") as latest_file:
+        json.dump(report, latest_file, indent=1)
+
+    baseline_path = os.path.join(RESULTS_DIR, "baseline.json")
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["meta"]["latency"] != args.latency:
+            print("Baseline was recorded with latency {}, ratios are not comparable".format(baseline["meta"]["latency"]))
+    regressions = compare(results, baseline.get("results", {}), args.threshold)
+    if args.save_baseline:
+        with open(baseline_path, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=1)
+    if regressions:
+        print("Regressions :: {}".format(", ".join(regressions)))
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())